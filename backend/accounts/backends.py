@@ -0,0 +1,24 @@
+"""
+Authentication backend for HMS.
+
+Every API view reads request.user.profile (role checks in the permission
+classes, doctor/patient branches in the views). The stock ModelBackend
+loads the session user with a plain SELECT, so the first profile access
+costs a second query. This backend loads the user and profile in one
+joined query; later reads of request.user.profile come from that row.
+"""
+
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth import get_user_model
+
+
+class ProfileModelBackend(ModelBackend):
+    """ModelBackend that fetches the user's profile together with the user."""
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,126 @@
+"""
+In-process doctor directory.
+
+Holds every doctor as a ready-to-send row (the DoctorListSerializer shape),
+ordered by name, plus two indexes:
+    - by specialization (case-insensitive), and
+    - a sorted list of lower-cased name tokens (first name, last name,
+      username) for prefix search with bisection.
+
+The directory is loaded with one query on first use and dropped whenever a
+profile or a user's name changes (see accounts.signals). With several
+worker processes, invalidation bumps a generation counter in the shared
+cache and each process reloads when it sees the counter move.
+"""
+
+from bisect import bisect_left
+from django.core.cache import cache
+from django.db import transaction
+import threading
+
+GENERATION_KEY = 'accounts:doctor_directory:generation'
+
+
+def _normalize(value):
+    return (value or '').strip().lower()
+
+
+class DoctorDirectory:
+    """Searchable, cached list of doctors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._generation = None
+        self._rows = []
+        self._by_specialization = {}
+        # sorted (token, row position)
+        self._tokens = []
+
+    def load(self):
+        from django.contrib.auth.models import User
+
+        generation = cache.get(GENERATION_KEY)
+        doctors = User.objects.filter(
+            profile__role='DOCTOR'
+        ).order_by('first_name', 'last_name', 'id').values_list(
+            'id', 'username', 'first_name', 'last_name', 'profile__specialization'
+        )
+
+        rows, by_specialization, tokens = [], {}, []
+        for position, (user_id, username, first_name, last_name, specialization) in enumerate(doctors):
+            rows.append({
+                'id': user_id,
+                'username': username,
+                'full_name': f"{first_name} {last_name}".strip() or username,
+                'specialization': specialization,
+            })
+            by_specialization.setdefault(_normalize(specialization), []).append(position)
+            for token in {_normalize(first_name), _normalize(last_name), _normalize(username)}:
+                if token:
+                    tokens.append((token, position))
+        tokens.sort()
+
+        with self._lock:
+            self._rows, self._by_specialization, self._tokens = rows, by_specialization, tokens
+            self._generation = generation
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded or self._generation != cache.get(GENERATION_KEY):
+            self.load()
+
+    def invalidate(self):
+        """Drop the directory here and, after commit, in every other process."""
+        self._loaded = False
+
+        def bump():
+            try:
+                cache.incr(GENERATION_KEY)
+            except ValueError:
+                cache.add(GENERATION_KEY, 1, None)
+
+        transaction.on_commit(bump)
+
+    @staticmethod
+    def _prefix_matches(tokens, prefix):
+        """Row positions with a name token starting with prefix."""
+        i = bisect_left(tokens, (prefix,))
+        matches = set()
+        while i < len(tokens) and tokens[i][0].startswith(prefix):
+            matches.add(tokens[i][1])
+            i += 1
+        return matches
+
+    def search(self, specialization=None, q=None):
+        """
+        Doctors ordered by name.
+
+        Args:
+            specialization: Exact specialization, case-insensitive
+            q: Name search; every word must prefix-match a first name,
+               last name or username
+
+        Returns:
+            list of dicts shaped like DoctorListSerializer output
+        """
+        self._ensure_loaded()
+        with self._lock:
+            rows, by_specialization, tokens = self._rows, self._by_specialization, self._tokens
+
+        positions = None
+        if specialization:
+            positions = set(by_specialization.get(_normalize(specialization), ()))
+
+        for word in _normalize(q).split():
+            matches = self._prefix_matches(tokens, word)
+            positions = matches if positions is None else positions & matches
+            if not positions:
+                return []
+
+        if positions is None:
+            return rows
+        return [rows[position] for position in sorted(positions)]
+
+
+doctor_directory = DoctorDirectory()
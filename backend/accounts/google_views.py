@@ -56,7 +56,9 @@ class GoogleCallbackView(APIView):
             # If prompt='consent' was used, we should get it.
             if credentials.refresh_token:
                 user_profile.google_refresh_token = credentials.refresh_token
-                user_profile.save(update_fields=['google_refresh_token'])
+                # Possibly a different Google account: next pull is a full resync
+                user_profile.google_sync_token = ''
+                user_profile.save(update_fields=['google_refresh_token', 'google_sync_token'])
                 logger.info(f"Google Calendar connected for {request.user.username} (Refresh Token saved)")
                 return redirect(f'{frontend_url}/settings?success=google_connected')
             else:
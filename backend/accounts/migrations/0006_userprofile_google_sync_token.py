@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_userprofile_google_refresh_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='google_sync_token',
+            field=models.CharField(blank=True, help_text='nextSyncToken from the last Google Calendar pull', max_length=512),
+        ),
+    ]
@@ -49,6 +49,11 @@ class UserProfile(models.Model):
         blank=True, 
         help_text="OAuth refresh token for Google Calendar"
     )
+    google_sync_token = models.CharField(
+        max_length=512,
+        blank=True,
+        help_text="nextSyncToken from the last Google Calendar pull"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
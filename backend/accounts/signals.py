@@ -1,13 +1,17 @@
 """
 Django signals for the accounts app.
-Handles automatic profile creation on user signup.
+Handles automatic profile creation on user signup and keeps the doctor
+directory current.
 """
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 import logging
 
+from .models import UserProfile
+from .directory import doctor_directory
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,3 +23,31 @@ def log_user_creation(sender, instance, created, **kwargs):
     """Log when a new user is created."""
     if created:
         logger.info(f"New user created: {instance.username}")
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_role(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred role is not loaded here
+    instance._loaded_role = instance.__dict__.get('role')
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def doctor_profile_changed(sender, instance, update_fields=None, **kwargs):
+    """New doctors, role and specialization changes show up in the directory."""
+    if update_fields and not {'role', 'specialization'} & set(update_fields):
+        return  # e.g. sync tokens
+    # A doctor who became a patient must leave the directory too
+    was_doctor = instance._loaded_role == 'DOCTOR'
+    if instance.is_doctor or was_doctor:
+        doctor_directory.invalidate()
+    instance._loaded_role = instance.role
+
+
+@receiver(post_save, sender=User)
+def doctor_name_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return  # The directory picks doctors up when their profile is saved
+    if update_fields and not {'first_name', 'last_name', 'username'} & set(update_fields):
+        return  # e.g. login only touches last_login
+    if hasattr(instance, 'profile') and instance.profile.is_doctor:
+        doctor_directory.invalidate()
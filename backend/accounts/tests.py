@@ -0,0 +1,76 @@
+"""
+Tests for the accounts app.
+"""
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .directory import doctor_directory
+from .models import UserProfile
+
+
+class ProfileModelBackendTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='patient', password='pw12345678')
+        UserProfile.objects.create(user=self.user, role='PATIENT')
+        self.client = APIClient()
+
+    def test_profile_loaded_with_session_user(self):
+        self.client.force_login(self.user, backend='accounts.backends.ProfileModelBackend')
+
+        # Session and user with profile; no separate profile lookup
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['profile']['role'], 'PATIENT')
+
+    def test_login_uses_profile_backend(self):
+        response = self.client.post(
+            '/api/auth/login/', {'username': 'patient', 'password': 'pw12345678'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.client.session['_auth_user_backend'], 'accounts.backends.ProfileModelBackend'
+        )
+
+    def test_signup_logs_in_with_profile_backend(self):
+        response = self.client.post('/api/auth/signup/', {
+            'username': 'newpatient', 'email': 'new@example.com',
+            'password': 'Xyzzy!12345', 'password_confirm': 'Xyzzy!12345',
+            'first_name': 'New', 'last_name': 'Patient', 'role': 'PATIENT',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.client.session['_auth_user_backend'], 'accounts.backends.ProfileModelBackend'
+        )
+
+    def test_model_backend_sessions_still_resolve(self):
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+
+        response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.status_code, 200)
+
+
+class DoctorDirectoryTests(TestCase):
+
+    def setUp(self):
+        doctor_directory.invalidate()
+        self.doctor = User.objects.create_user(username='doctor', password='pw12345678')
+        UserProfile.objects.create(user=self.doctor, role='DOCTOR', specialization='Cardiology')
+
+    def directory_ids(self):
+        return [doctor['id'] for doctor in doctor_directory.search()]
+
+    def test_role_change_leaves_directory(self):
+        self.assertIn(self.doctor.id, self.directory_ids())
+
+        profile = UserProfile.objects.get(user=self.doctor)
+        profile.role = 'PATIENT'
+        profile.save()
+        self.assertNotIn(self.doctor.id, self.directory_ids())
+
+        profile.role = 'DOCTOR'
+        profile.save(update_fields=['role'])
+        self.assertIn(self.doctor.id, self.directory_ids())
@@ -7,7 +7,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.models import User
+from django.conf import settings
+from django.db import transaction
 from django.middleware.csrf import get_token
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.utils.decorators import method_decorator
@@ -17,10 +18,10 @@ from .serializers import (
     SignupSerializer, 
     LoginSerializer, 
     UserSerializer,
-    DoctorListSerializer
 )
 from .permissions import IsPatient
-from services.email_client import send_email
+from .directory import doctor_directory
+from services.email_client import enqueue_email
 
 logger = logging.getLogger(__name__)
 
@@ -46,11 +47,11 @@ class SignupView(APIView):
         serializer = SignupSerializer(data=request.data)
         
         if serializer.is_valid():
-            user = serializer.save()
-            
-            # Send welcome email via Lambda
-            try:
-                send_email(
+            with transaction.atomic():
+                user = serializer.save()
+                
+                # Welcome email is delivered by the outbox worker after commit
+                enqueue_email(
                     action='SIGNUP_WELCOME',
                     recipient=user.email,
                     data={
@@ -58,12 +59,10 @@ class SignupView(APIView):
                         'role': user.profile.role
                     }
                 )
-            except Exception as e:
-                # Don't fail signup if email fails
-                logger.error(f"Failed to send welcome email: {e}")
             
-            # Auto-login the user to establish session
-            login(request, user)
+            # Auto-login the user to establish session (no authenticate()
+            # call here, so name the backend)
+            login(request, user, backend='accounts.backends.ProfileModelBackend')
             logger.info(f"New user registered and logged in: {user.username} as {user.profile.role}")
             
             return Response({
@@ -159,14 +158,45 @@ class CurrentUserView(APIView):
 
 
 class DoctorListView(APIView):
-    """List all doctors (for patients to browse)."""
+    """
+    List doctors (for patients to browse).
+    
+    Served from the in-memory doctor directory (accounts.directory).
+    
+    Query params:
+        specialization: Exact specialization, case-insensitive
+        q: Name search; each word prefix-matches a first name, last name or username
+        page, page_size: Pagination (default page_size DOCTOR_LIST_PAGE_SIZE)
+    
+    The total count is returned in X-Total-Count, the next page in Link.
+    """
     
     permission_classes = [IsAuthenticated, IsPatient]
     
     def get(self, request):
-        doctors = User.objects.filter(
-            profile__role='DOCTOR'
-        ).select_related('profile').order_by('first_name', 'last_name')
+        max_size = getattr(settings, 'DOCTOR_LIST_MAX_PAGE_SIZE', 500)
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get(
+                'page_size', getattr(settings, 'DOCTOR_LIST_PAGE_SIZE', 50)
+            )), 1), max_size)
+        except ValueError:
+            return Response(
+                {'error': 'page and page_size must be numbers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        doctors = doctor_directory.search(
+            specialization=request.query_params.get('specialization'),
+            q=request.query_params.get('q'),
+        )
         
-        serializer = DoctorListSerializer(doctors, many=True)
-        return Response(serializer.data)
+        start = (page - 1) * page_size
+        response = Response(doctors[start:start + page_size])
+        response['X-Total-Count'] = len(doctors)
+        if start + page_size < len(doctors):
+            query = request.query_params.copy()
+            query['page'] = page + 1
+            url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+            response['Link'] = f'<{url}>; rel="next"'
+        return response
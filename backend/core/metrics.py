@@ -0,0 +1,190 @@
+"""
+Per-endpoint query and latency metrics.
+
+QueryMetricsMiddleware installs a database execute wrapper for the duration
+of each request and records, per resolved URL name (e.g. slot_list_create,
+booking_list_create, ical_feed, admin:scheduling_booking_changelist):
+
+    - requests, per HTTP method
+    - SQL queries (total, max)
+    - time spent in SQL and in the whole view, in milliseconds (total, max)
+    - requests over the endpoint's budget in QUERY_BUDGETS
+
+Totals are per worker process, since the last restart or reset().
+They are served to staff at /api/metrics/, together with the in-process
+cache statistics (Google Calendar clients, availability index, email
+circuit breaker).
+
+With QUERY_METRICS_HEADERS (on by default when DEBUG), responses carry
+X-Query-Count, X-Query-Time-Ms and X-View-Time-Ms. Streaming responses
+(e.g. the iCal feed) run queries after the headers are sent; they are
+counted into the metrics but get no headers.
+
+core.testing.assert_query_budget() checks an endpoint against its budget.
+"""
+
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Savepoint statements depend on how deeply the caller nests transactions
+# (e.g. a test case's own atomic block), not on the endpoint, so they are not
+# counted as queries
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def is_query(sql):
+    return not sql.lstrip().upper().startswith(TRANSACTION_CONTROL)
+
+
+class QueryCounter:
+    """Database execute wrapper that counts and times queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += is_query(sql)
+
+    def wrap(self):
+        """Context manager installing this counter on every database connection."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+class EndpointMetrics:
+    """Thread-safe per-endpoint totals for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, name, method, queries, sql_seconds, view_seconds):
+        budget = query_budget(name, method)
+        over = budget is not None and queries > budget
+        if over:
+            logger.warning(f"{method} {name} ran {queries} queries, over its budget of {budget}")
+
+        with self._lock:
+            entry = self._endpoints.get((name, method))
+            if entry is None:
+                entry = self._endpoints[name, method] = {
+                    'requests': 0,
+                    'queries': 0,
+                    'max_queries': 0,
+                    'sql_ms': 0.0,
+                    'max_sql_ms': 0.0,
+                    'view_ms': 0.0,
+                    'max_view_ms': 0.0,
+                    'over_budget': 0,
+                }
+            entry['requests'] += 1
+            entry['queries'] += queries
+            entry['max_queries'] = max(entry['max_queries'], queries)
+            entry['sql_ms'] += sql_seconds * 1000
+            entry['max_sql_ms'] = max(entry['max_sql_ms'], sql_seconds * 1000)
+            entry['view_ms'] += view_seconds * 1000
+            entry['max_view_ms'] = max(entry['max_view_ms'], view_seconds * 1000)
+            entry['over_budget'] += over
+
+    def snapshot(self):
+        """{name: {method: totals plus per-request means and the budget}}, sorted by name."""
+        with self._lock:
+            entries = {key: dict(entry) for key, entry in self._endpoints.items()}
+
+        endpoints = {}
+        for (name, method), entry in sorted(entries.items()):
+            requests = entry['requests']
+            entry['mean_queries'] = round(entry['queries'] / requests, 2)
+            entry['mean_sql_ms'] = round(entry['sql_ms'] / requests, 3)
+            entry['mean_view_ms'] = round(entry['view_ms'] / requests, 3)
+            for key in ('sql_ms', 'max_sql_ms', 'view_ms', 'max_view_ms'):
+                entry[key] = round(entry[key], 3)
+            entry['budget'] = query_budget(name, method)
+            endpoints.setdefault(name, {})[method] = entry
+        return endpoints
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+endpoint_metrics = EndpointMetrics()
+
+
+def query_budget(name, method=None):
+    """
+    Maximum queries per request for an endpoint, or None if it has no budget.
+    A "METHOD name" entry in QUERY_BUDGETS overrides the entry for the name.
+    """
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    if method and f'{method} {name}' in budgets:
+        return budgets[f'{method} {name}']
+    return budgets.get(name)
+
+
+def cache_stats():
+    """Statistics of the in-process caches."""
+    from scheduling.availability_index import availability_index
+    from services.email_client import circuit_breaker
+    from services.google_calendar import GoogleCalendarService
+
+    return {
+        'google_calendar_clients': GoogleCalendarService.clients.stats(),
+        'availability_index': availability_index.stats(),
+        'email_circuit_breaker': circuit_breaker.stats(),
+    }
+
+
+class QueryMetricsMiddleware:
+    """Records query count, SQL time and view time per resolved URL name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.headers = getattr(settings, 'QUERY_METRICS_HEADERS', settings.DEBUG)
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with counter.wrap():
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            # 404s and requests answered by middleware
+            return response
+        name = match.view_name
+
+        if response.streaming:
+            response.streaming_content = self._streamed(
+                response.streaming_content, counter, started, name, request.method
+            )
+            return response
+
+        elapsed = time.perf_counter() - started
+        endpoint_metrics.record(name, request.method, counter.count, counter.seconds, elapsed)
+        if self.headers:
+            response['X-Query-Count'] = str(counter.count)
+            response['X-Query-Time-Ms'] = f'{counter.seconds * 1000:.1f}'
+            response['X-View-Time-Ms'] = f'{elapsed * 1000:.1f}'
+        return response
+
+    def _streamed(self, content, counter, started, name, method):
+        try:
+            with counter.wrap():
+                yield from content
+        finally:
+            endpoint_metrics.record(name, method, counter.count, counter.seconds, time.perf_counter() - started)
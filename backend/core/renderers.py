@@ -0,0 +1,123 @@
+"""
+Response renderers.
+
+FastJSONRenderer is the default renderer. It uses orjson when installed and
+falls back to DRF's JSONRenderer otherwise; either way the bytes are the
+same, because values orjson would format differently from DRF (datetimes,
+decimals, ...) are passed to DRF's encoder.
+
+The slot and booking list endpoints (LIST_RENDERERS) can also answer in two
+compact formats, chosen with the Accept header:
+
+    application/vnd.hms.columnar+json  one array per field instead of one
+                                       object per row: {"count": n,
+                                       "columns": {"id": [...], ...}}
+    application/msgpack                MessagePack (needs the msgpack package)
+
+Both can also be requested with ?format=columnar / ?format=msgpack.
+"""
+
+from rest_framework.renderers import JSONRenderer, BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+_encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer with byte-identical output, rendered by orjson if available."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Indented output (e.g. Accept: application/json; indent=4) stays with DRF
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=_encoder.default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            # e.g. integers beyond 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer, for JavaScript embedding
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+def columnar(data):
+    """
+    Turn lists of row objects into one list per field.
+
+    A list of dicts becomes {"count": n, "columns": {field: [values]}}, with
+    nested row objects (e.g. a booking's slot_details) split the same way.
+    In a dict response (e.g. {"doctor": {...}, "slots": [...]}) each list of
+    dicts is converted; anything else is returned unchanged.
+    """
+    if isinstance(data, list):
+        if not data or not all(isinstance(row, dict) for row in data):
+            return data
+        return {'count': len(data), 'columns': _columns(data)}
+    if isinstance(data, dict):
+        return {key: columnar(value) if isinstance(value, list) else value for key, value in data.items()}
+    return data
+
+
+def _columns(rows):
+    fields = list(dict.fromkeys(field for row in rows for field in row))
+
+    columns = {}
+    for field in fields:
+        values = [row.get(field) for row in rows]
+        if all(isinstance(value, dict) for value in values):
+            columns[field] = _columns(values)
+        else:
+            columns[field] = values
+    return columns
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    """JSON with one array per field for list responses."""
+
+    media_type = 'application/vnd.hms.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None and response.exception:
+            return super().render(data, accepted_media_type, renderer_context)
+        return super().render(columnar(data), accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """MessagePack; values msgpack cannot encode go through DRF's JSON encoder."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_encoder.default, use_bin_type=True)
+
+
+# Renderers for the slot and booking list endpoints; JSON stays the default
+LIST_RENDERERS = [FastJSONRenderer, ColumnarJSONRenderer]
+if msgpack is not None:
+    LIST_RENDERERS.append(MessagePackRenderer)
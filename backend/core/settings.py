@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the queries of the other middleware (session, user) are counted
+    'core.metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -51,6 +53,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Loads the session user together with their profile (one query instead of two).
+# ModelBackend stays listed so sessions created before it was added still resolve;
+# logins store ProfileModelBackend.
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -87,6 +97,15 @@ DATABASES = {
     }
 }
 
+# Cache - use a shared backend (e.g. django.core.cache.backends.redis.RedisCache)
+# when running more than one worker process
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'hms-default'),
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -126,7 +145,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.FastJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -134,6 +153,13 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
 }
 
+# List pagination (scheduling.pagination)
+LIST_PAGE_SIZE = 500  # Default ?page_size= for slot and booking lists
+LIST_MAX_PAGE_SIZE = 1000
+SLOT_LIST_MAX_DAYS = 366  # Widest date_from..date_to window for slot lists
+DOCTOR_LIST_PAGE_SIZE = 50  # Default ?page_size= for /api/auth/doctors/
+DOCTOR_LIST_MAX_PAGE_SIZE = 500
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = os.getenv(
     'CORS_ALLOWED_ORIGINS', 
@@ -142,6 +168,9 @@ CORS_ALLOWED_ORIGINS = os.getenv(
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Let the frontend read pagination headers
+CORS_EXPOSE_HEADERS = ['Link', 'X-Next-Cursor', 'X-Total-Count', 'X-Query-Count', 'X-Query-Time-Ms', 'X-View-Time-Ms']
+
 # CSRF Configuration for session-based auth with React frontend
 CSRF_TRUSTED_ORIGINS = os.getenv(
     'CSRF_TRUSTED_ORIGINS',
@@ -154,11 +183,93 @@ CSRF_COOKIE_HTTPONLY = False  # Allow JavaScript to read CSRF token
 
 # Email Service Configuration (Lambda endpoint)
 EMAIL_SERVICE_URL = os.getenv('EMAIL_SERVICE_URL', 'http://localhost:3000/dev/email')
+EMAIL_HTTP_POOL_SIZE = 10  # Keep-alive connections per worker process
+EMAIL_HTTP_CONNECT_TIMEOUT = 3
+EMAIL_HTTP_TIMEOUT = 10
+EMAIL_BATCH_HTTP_TIMEOUT = 30  # Read timeout for BATCH requests (the Lambda's own timeout)
+EMAIL_HTTP_RETRIES = int(os.getenv('EMAIL_HTTP_RETRIES', 2))  # On connection errors only; 5xx is retried by the outbox
+EMAIL_HTTP_BACKOFF_SECONDS = 0.5  # Retry n waits up to 0.5 * 2^(n-1) seconds (jittered)
+EMAIL_CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failures before calls short-circuit
+EMAIL_CIRCUIT_RESET_SECONDS = 30  # Time the circuit stays open before a trial call
+
+# iCal feed: rendered feeds are cached per change version for this long
+ICAL_FEED_CACHE_TTL = int(os.getenv('ICAL_FEED_CACHE_TTL', 300))
+ICAL_FEED_CACHE_MAX_BYTES = 1024 * 1024  # Larger feeds are streamed but not cached
+ICAL_FEED_CHUNK_SIZE = 500  # Rows fetched per round trip while streaming
+
+# Availability index (scheduling.availability_index)
+AVAILABILITY_INDEX_DAYS = 90  # How far ahead free slots are indexed
+AVAILABILITY_INDEX_MIN_RELOAD_SECONDS = 5  # Full-reload throttle when change records are missing
+NEXT_AVAILABLE_MAX_LIMIT = 50  # Max slots returned by /api/slots/next-available/
+
+# Bulk slot creation (scheduling.bulk)
+BULK_SLOT_MAX_SLOTS = 5000  # Max slots per /api/slots/bulk/ request
+BULK_SLOT_INSERT_BATCH = 500  # Rows per INSERT statement
+
+# Availability templates (scheduling.templates)
+AVAILABILITY_TEMPLATE_HORIZON_DAYS = 14  # Days ahead materialize_availability creates real slots for
+AVAILABILITY_TEMPLATE_LOOKAHEAD_DAYS = 90  # Days of virtual slots listed when no date_to is given
+
+# Appointment reminders (python manage.py send_reminders)
+REMINDER_WINDOW_HOURS = int(os.getenv('REMINDER_WINDOW_HOURS', 24))  # Remind about appointments starting this soon
+REMINDER_CHUNK_SIZE = 500  # Bookings claimed and queued per transaction
+
+# Doctor daily digest (python manage.py send_doctor_digests)
+DOCTOR_DIGEST_CACHE_TTL = 60 * 60 * 36  # Long enough to cover the next day
+
+# Per-endpoint query metrics (core.metrics, served at /api/metrics/)
+QUERY_METRICS_HEADERS = os.getenv('QUERY_METRICS_HEADERS', str(DEBUG)).lower() == 'true'  # X-Query-Count etc.
+# Maximum queries per request, by URL name or "METHOD name", including the
+# session and user lookups (savepoints are not counted). Requests over budget
+# are logged and counted; core/tests.py runs every endpoint against its budget
+# on cold caches. The numbers must not grow with the number of rows returned,
+# except that a cold-cache iCal feed adds one query per ICAL_FEED_CHUNK_SIZE
+# free slots.
+QUERY_BUDGETS = {
+    'login': 7,
+    'signup': 10,
+    'current-user': 3,
+    'doctor-list': 4,
+    'slot_list_create': 7,
+    'POST slot_list_create': 7,
+    'bulk_slot_create': 6,
+    'slot_detail': 5,
+    'DELETE slot_detail': 6,
+    'next_available_slots': 6,
+    'template_list_create': 4,
+    'POST template_list_create': 4,
+    'booking_list_create': 4,
+    'POST booking_list_create': 12,  # Booking a template occurrence materialises it first
+    'booking_detail': 4,
+    'doctor_digest': 4,
+    'doctor_slots': 8,
+    'ical_feed': 6,
+}
+
+# Outbox worker (python manage.py run_outbox_worker)
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))
+OUTBOX_BACKOFF_BASE_SECONDS = 5
+OUTBOX_BACKOFF_MAX_SECONDS = 3600
+OUTBOX_LEASE_SECONDS = 300
+OUTBOX_CONCURRENCY = {
+    'email': int(os.getenv('OUTBOX_EMAIL_CONCURRENCY', 4)),
+    'calendar_event': int(os.getenv('OUTBOX_CALENDAR_CONCURRENCY', 2)),
+}
+OUTBOX_COALESCE = {
+    # Emails per request to the email service's BATCH action; at most its EMAIL_MAX_BATCH_SIZE
+    'email': int(os.getenv('OUTBOX_EMAIL_BATCH_SIZE', 25)),
+}
 
 # Google Calendar Configuration
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 GOOGLE_REDIRECT_URI = os.getenv('GOOGLE_REDIRECT_URI')
+GOOGLE_TOKEN_URI = os.getenv('GOOGLE_TOKEN_URI', 'https://oauth2.googleapis.com/token')
+GOOGLE_HTTP_TIMEOUT = 10
+GOOGLE_API_ROOT_URL = os.getenv('GOOGLE_API_ROOT_URL')  # Override for a local fake Google server
+GOOGLE_CLIENT_CACHE_SIZE = int(os.getenv('GOOGLE_CLIENT_CACHE_SIZE', 256))  # Doctors kept per worker
+GOOGLE_SYNC_PAST_DAYS = 1  # Full calendar syncs start this many days back
 
 # Logging Configuration
 LOGGING = {
@@ -200,5 +311,10 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        'integrations': {
+            'handlers': ['console'],
+            'level': 'DEBUG',
+            'propagate': False,
+        },
     },
 }
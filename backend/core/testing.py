@@ -0,0 +1,69 @@
+"""
+Test helpers.
+
+Query budgets keep N+1 regressions (e.g. per-row name lookups in
+serializers or admin list pages) out of production:
+
+    from core.testing import assert_query_budget, max_queries
+
+    response = assert_query_budget(client, '/api/slots/?show_booked=true')
+    response = assert_query_budget(client, '/api/bookings/', method='post', data={...}, format='json')
+
+    with max_queries(3):
+        ...
+
+assert_query_budget() takes the budget from QUERY_BUDGETS for the URL name
+the path resolves to, so tests and the QueryMetricsMiddleware warnings use
+the same numbers.
+"""
+
+from contextlib import contextmanager
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from urllib.parse import urlsplit
+
+from .metrics import query_budget, is_query
+
+
+@contextmanager
+def max_queries(budget, label='Block'):
+    """
+    Fail if the block runs more than `budget` queries; lists them if it does.
+    Savepoint statements are not counted, as in QueryMetricsMiddleware.
+    """
+    with CaptureQueriesContext(connection) as context:
+        yield context
+
+    captured = [query['sql'] for query in context.captured_queries if is_query(query['sql'])]
+    if len(captured) > budget:
+        queries = '\n'.join(f"{number}. {sql}" for number, sql in enumerate(captured, 1))
+        raise AssertionError(f"{label} ran {len(captured)} queries, budget is {budget}:\n{queries}")
+
+
+def assert_query_budget(client, path, method='get', budget=None, **kwargs):
+    """
+    Make a request with a test client and fail if it exceeds its query budget.
+
+    Args:
+        client: django.test.Client or rest_framework.test.APIClient
+        path: Request path, optionally with a query string
+        method: Client method name ('get', 'post', ...)
+        budget: Override the QUERY_BUDGETS entry for the endpoint
+        **kwargs: Passed to the client method (data, format, ...)
+
+    Returns:
+        The response
+    """
+    name = resolve(urlsplit(path).path).view_name
+    if budget is None:
+        budget = query_budget(name, method.upper())
+    if budget is None:
+        raise AssertionError(f"No query budget for {name}; add it to QUERY_BUDGETS")
+
+    with max_queries(budget, label=f"{method.upper()} {path} ({name})"):
+        response = getattr(client, method)(path, **kwargs)
+        if response.streaming:
+            # Streaming views (e.g. the iCal feed) query while the body is read
+            response.streaming_content = [b''.join(response.streaming_content)]
+    return response
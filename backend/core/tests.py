@@ -0,0 +1,233 @@
+"""
+Query budget tests: every endpoint in QUERY_BUDGETS, with enough rows that
+an N+1 would show.
+"""
+
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.directory import doctor_directory
+from accounts.models import UserProfile
+from scheduling.availability_index import availability_index
+from scheduling.models import AvailabilitySlot, AvailabilityTemplate, Booking
+from scheduling.templates import virtual_id
+from .metrics import endpoint_metrics
+from .testing import assert_query_budget
+
+
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tomorrow = date.today() + timedelta(days=1)
+        cls.doctors = [cls.make_user(f'doctor{i}', 'DOCTOR', specialization='Cardiology') for i in range(3)]
+        cls.patients = [cls.make_user(f'patient{i}', 'PATIENT') for i in range(5)]
+        cls.doctor, cls.patient = cls.doctors[0], cls.patients[0]
+
+        for doctor in cls.doctors:
+            for hour in range(8, 18):
+                slot = AvailabilitySlot.objects.create(
+                    doctor=doctor, date=cls.tomorrow, start_time=time(hour), end_time=time(hour, 30)
+                )
+                if hour < 13:
+                    Booking.objects.create(patient=cls.patients[hour % 5], doctor=doctor, slot=slot)
+                    slot.is_booked = True
+                    slot.save(update_fields=['is_booked'])
+
+        cls.template = AvailabilityTemplate.objects.create(
+            doctor=cls.doctor, weekdays=list(range(7)), start_time=time(19), end_time=time(21),
+            slot_minutes=30, valid_from=date.today(),
+        )
+
+    @classmethod
+    def make_user(cls, username, role, **profile):
+        user = User.objects.create_user(
+            username=username, email=f'{username}@example.com', password='pw12345678',
+            first_name=username.title(), last_name='Test',
+        )
+        UserProfile.objects.create(user=user, role=role, **profile)
+        return user
+
+    def setUp(self):
+        # Cold caches: the budgets must hold on a miss
+        cache.clear()
+        doctor_directory.invalidate()
+        availability_index._loaded = False
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_login(user)
+        return client
+
+    def test_every_budget_is_tested(self):
+        tested = {
+            name[5:] for name in dir(self)
+            if name.startswith('test_') and name != 'test_every_budget_is_tested'
+        }
+        for key in settings.QUERY_BUDGETS:
+            name = key.split()[-1].replace('-', '_')
+            self.assertIn(name, tested, f'No test for the {key} budget')
+
+    # ==================== ACCOUNTS ====================
+
+    def test_login(self):
+        response = assert_query_budget(
+            APIClient(), '/api/auth/login/', method='post',
+            data={'username': 'patient1', 'password': 'pw12345678'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_signup(self):
+        response = assert_query_budget(
+            APIClient(), '/api/auth/signup/', method='post',
+            data={
+                'username': 'newpatient', 'email': 'new@example.com',
+                'password': 'Xyzzy!12345', 'password_confirm': 'Xyzzy!12345',
+                'first_name': 'New', 'last_name': 'Patient', 'role': 'PATIENT',
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_current_user(self):
+        response = assert_query_budget(self.client_for(self.doctor), '/api/auth/me/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_doctor_list(self):
+        response = assert_query_budget(self.client_for(self.patient), '/api/auth/doctors/')
+        self.assertEqual(len(response.json()), 3)
+
+    # ==================== SLOTS ====================
+
+    def test_slot_list_create(self):
+        client = self.client_for(self.doctor)
+        response = assert_query_budget(client, '/api/slots/?show_booked=true')
+        self.assertGreater(len(response.json()), 10)
+
+        response = assert_query_budget(self.client_for(self.patient), '/api/slots/?page_size=20')
+        self.assertEqual(len(response.json()), 20)
+
+        response = assert_query_budget(
+            client, '/api/slots/', method='post',
+            data={'date': str(self.tomorrow), 'start_time': '18:00', 'end_time': '18:30'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_bulk_slot_create(self):
+        response = assert_query_budget(
+            self.client_for(self.doctor), '/api/slots/bulk/', method='post',
+            data={
+                'date': str(self.tomorrow + timedelta(days=1)),
+                'slots': [{'start_time': f'{hour}:00', 'end_time': f'{hour}:30'} for hour in range(8, 16)],
+            },
+            format='json'
+        )
+        self.assertEqual(len(response.json()['created']), 8)
+
+    def test_slot_detail(self):
+        client = self.client_for(self.doctor)
+        slot = AvailabilitySlot.objects.filter(doctor=self.doctor, is_booked=False).first()
+
+        response = assert_query_budget(client, f'/api/slots/{slot.id}/')
+        self.assertEqual(response.status_code, 200)
+
+        response = assert_query_budget(client, f'/api/slots/{slot.id}/', method='delete')
+        self.assertEqual(response.status_code, 204)
+
+    def test_next_available_slots(self):
+        response = assert_query_budget(self.client_for(self.patient), '/api/slots/next-available/?limit=10')
+        self.assertEqual(response.json()['count'], 10)
+
+    def test_doctor_slots(self):
+        response = assert_query_budget(self.client_for(self.patient), f'/api/doctors/{self.doctor.id}/slots/')
+        self.assertGreater(len(response.json()['slots']), 5)
+
+    # ==================== TEMPLATES ====================
+
+    def test_template_list_create(self):
+        client = self.client_for(self.doctor)
+        response = assert_query_budget(client, '/api/templates/')
+        self.assertEqual(len(response.json()), 1)
+
+        response = assert_query_budget(
+            client, '/api/templates/', method='post',
+            data={
+                'weekdays': [0, 1, 2, 3, 4], 'start_time': '06:00', 'end_time': '07:00',
+                'slot_minutes': 30, 'valid_from': str(date.today()),
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    # ==================== BOOKINGS ====================
+
+    def test_booking_list_create(self):
+        response = assert_query_budget(self.client_for(self.doctor), '/api/bookings/')
+        self.assertEqual(len(response.json()), 5)
+
+        client = self.client_for(self.patient)
+        slot = AvailabilitySlot.objects.filter(doctor=self.doctor, is_booked=False).first()
+        response = assert_query_budget(
+            client, '/api/bookings/', method='post', data={'slot_id': slot.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+        # A template occurrence is materialised first
+        occurrence = virtual_id(self.template.id, self.tomorrow, time(19, 30))
+        response = assert_query_budget(
+            client, '/api/bookings/', method='post', data={'slot_id': occurrence}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_booking_detail(self):
+        booking = Booking.objects.filter(doctor=self.doctor).first()
+        for user in (self.doctor, booking.patient):
+            response = assert_query_budget(self.client_for(user), f'/api/bookings/{booking.id}/')
+            self.assertEqual(response.status_code, 200)
+
+    def test_doctor_digest(self):
+        response = assert_query_budget(self.client_for(self.doctor), '/api/bookings/digest/')
+        self.assertEqual(response.json()['count'], 5)
+
+    # ==================== INTEGRATIONS ====================
+
+    def test_ical_feed(self):
+        for user in (self.doctor, self.patient):
+            response = assert_query_budget(
+                APIClient(), f'/api/integrations/calendar/feed/{user.profile.ical_token}/'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'BEGIN:VEVENT', b''.join(response.streaming_content))
+
+
+class MetricsViewTests(TestCase):
+
+    def setUp(self):
+        endpoint_metrics.reset()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw12345678')
+
+    def test_staff_only(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/metrics/').status_code, 403)
+
+        client.force_login(self.admin)
+        response = client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('availability_index', response.json()['caches'])
+
+    def test_records_and_resets(self):
+        client = APIClient()
+        client.force_login(self.admin)
+        client.get('/api/metrics/')
+
+        endpoints = client.get('/api/metrics/').json()['endpoints']
+        self.assertEqual(endpoints['metrics']['GET']['requests'], 1)
+
+        self.assertEqual(client.delete('/api/metrics/').status_code, 204)
+        # Only the DELETE itself, recorded after the reset
+        self.assertEqual(list(client.get('/api/metrics/').json()['endpoints']['metrics']), ['DELETE'])
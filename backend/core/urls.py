@@ -6,6 +6,8 @@ API versioning with /api/v1/ prefix for future compatibility.
 from django.contrib import admin
 from django.urls import path, include
 
+from .views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     
@@ -13,4 +15,7 @@ urlpatterns = [
     path('api/auth/', include('accounts.urls')),
     path('api/', include('scheduling.urls')),
     path('api/integrations/', include('integrations.urls')),
+    
+    # Per-endpoint query/latency metrics (staff only)
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
 ]
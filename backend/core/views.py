@@ -0,0 +1,29 @@
+"""
+Operational endpoints.
+"""
+
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser
+
+from .metrics import endpoint_metrics, cache_stats
+
+
+class MetricsView(APIView):
+    """
+    GET: Per-endpoint query/latency metrics and cache statistics of this worker process
+    DELETE: Reset the endpoint metrics
+    """
+    
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response({
+            'endpoints': endpoint_metrics.snapshot(),
+            'caches': cache_stats(),
+        })
+    
+    def delete(self, request):
+        endpoint_metrics.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,25 @@
+"""
+Admin configuration for integrations app.
+"""
+
+from django.contrib import admin
+from django.utils import timezone
+from .models import OutboxMessage
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'attempts', 'available_at', 'created_at', 'processed_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['created_at', 'processed_at', 'claimed_by']
+    actions = ['requeue']
+    
+    @admin.action(description='Requeue selected messages')
+    def requeue(self, request, queryset):
+        updated = queryset.update(
+            status=OutboxMessage.STATUS_PENDING,
+            attempts=0,
+            available_at=timezone.now(),
+            claimed_by='',
+        )
+        self.message_user(request, f"{updated} message(s) requeued.")
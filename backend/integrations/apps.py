@@ -5,3 +5,7 @@ class IntegrationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'integrations'
     verbose_name = 'External Integrations'
+    
+    def ready(self):
+        # Import signals when app is ready
+        import integrations.signals  # noqa
@@ -0,0 +1,165 @@
+"""
+iCal feed generation.
+
+Free-slot VEVENTs are identical in every patient's feed, so each one is
+rendered once and kept in a shared fragment cache keyed by slot id. A
+patient feed is the patient's own bookings plus a concatenation of cached
+fragments; only cache misses touch the slots table beyond the id scan.
+Fragments are filled when a slot inside the feed window is created (slots
+further out are rendered on their first feed request) and evicted when a
+slot is booked, changed or deleted (see integrations.signals).
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from datetime import timezone as dt_timezone
+
+from . import ics
+
+FRONTEND_URL = "http://localhost:5178"
+
+# Bump when the fragment layout changes
+FRAGMENT_VERSION = 1
+FRAGMENT_KEY = 'ical:slot:v{}:{}'
+FRAGMENT_TTL = 60 * 60 * 24 * 8  # Free slots are only listed for the next 7 days
+FEED_WINDOW_DAYS = 7
+
+
+def _fragment_key(slot_id):
+    return FRAGMENT_KEY.format(FRAGMENT_VERSION, slot_id)
+
+
+def render_slot_event(slot):
+    """Render the FREE VEVENT for a slot. slot.doctor should be loaded."""
+    booking_url = f"{FRONTEND_URL}/patient" # Link to dashboard for booking
+    return ics.vevent(
+        uid=f"hms-slot-{slot.id}@hms.local",
+        # Fragments are shared and long-lived, so stamp them with the slot's creation time
+        dtstamp=slot.created_at.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ'),
+        start=ics.format_dt(slot.date, slot.start_time),
+        end=ics.format_dt(slot.date, slot.end_time),
+        summary=f"FREE: Slot with Dr. {slot.doctor.get_full_name() or slot.doctor.username}",
+        description=f"This slot is available for booking.\n\nBook now: {booking_url}",
+        url=booking_url,
+        status="TENTATIVE",
+    )
+
+
+def fill_slot_fragments(slots):
+    """Render and cache fragments for slots (with doctor loaded)."""
+    fragments = {_fragment_key(slot.id): render_slot_event(slot) for slot in slots}
+    cache.set_many(fragments, FRAGMENT_TTL)
+    return fragments
+
+
+def in_feed_window(slot):
+    """Whether patient feeds list this slot today (if it stays free)."""
+    today = timezone.now().date()
+    return today <= slot.date <= today + timezone.timedelta(days=FEED_WINDOW_DAYS)
+
+
+def evict_slot_fragments(slot_ids):
+    cache.delete_many([_fragment_key(slot_id) for slot_id in slot_ids])
+
+
+def slot_fragments(slot_ids):
+    """Fragments for slot_ids in order, rendering and caching any misses."""
+    from scheduling.models import AvailabilitySlot
+
+    keys = [_fragment_key(slot_id) for slot_id in slot_ids]
+    fragments = cache.get_many(keys)
+
+    missing = [slot_id for slot_id, key in zip(slot_ids, keys) if key not in fragments]
+    if missing:
+        fragments.update(fill_slot_fragments(
+            AvailabilitySlot.objects.filter(id__in=missing).select_related('doctor')
+        ))
+
+    # A slot deleted since the id scan has no fragment; skip it
+    return [fragments[key] for key in keys if key in fragments]
+
+
+def free_slots(doctor_ids=None, specialization=None):
+    """Free slots shown in patient feeds: the next 7 days, optionally filtered."""
+    from scheduling.models import AvailabilitySlot
+
+    now = timezone.now()
+    next_week = now + timezone.timedelta(days=FEED_WINDOW_DAYS)
+    slots = AvailabilitySlot.objects.filter(
+        is_booked=False,
+        is_blocked=False,
+        date__range=[now.date(), next_week.date()]
+    )
+    if doctor_ids:
+        slots = slots.filter(doctor_id__in=doctor_ids)
+    if specialization:
+        slots = slots.filter(doctor__profile__specialization__iexact=specialization)
+    return slots.order_by('date', 'start_time', 'id')
+
+
+def iter_feed(profile, doctor_ids=None, specialization=None):
+    """
+    Generate the ICS document for a profile in chunks of events.
+
+    Args:
+        profile: UserProfile owning the feed (with user loaded)
+        doctor_ids: Optional doctor ids to limit a patient's free slots to
+        specialization: Optional specialization to limit a patient's free slots to
+    """
+    from scheduling.models import Booking
+
+    user = profile.user
+    chunk_size = getattr(settings, 'ICAL_FEED_CHUNK_SIZE', 500)
+
+    # 1. Get confirmed bookings
+    if profile.is_doctor:
+        bookings = Booking.objects.filter(doctor=user).select_related('slot', 'patient')
+    else:
+        bookings = Booking.objects.filter(patient=user).select_related('slot', 'doctor')
+
+    # One DTSTAMP for the whole feed
+    dtstamp = timezone.now().strftime('%Y%m%dT%H%M%SZ')
+
+    yield ics.calendar_header(f"HMS Appointments - {user.username}")
+
+    # Add confirmed bookings
+    action_url = f"{FRONTEND_URL}/patient/bookings" if not profile.is_doctor else f"{FRONTEND_URL}/doctor/dashboard"
+    buffer = []
+    for b in bookings.iterator(chunk_size=chunk_size):
+        slot = b.slot
+        summary = f"Confirmed: Dr. {b.doctor.get_full_name() or b.doctor.username}" if not profile.is_doctor else f"Patient: {b.patient.get_full_name() or b.patient.username}"
+
+        description = b.notes if b.notes else "HMS Appointment"
+        description += f"\n\nManage this appointment: {action_url}"
+
+        buffer.append(ics.vevent(
+            uid=f"hms-booking-{b.id}@hms.local",
+            dtstamp=dtstamp,
+            start=ics.format_dt(slot.date, slot.start_time),
+            end=ics.format_dt(slot.date, slot.end_time),
+            summary=summary,
+            description=description,
+            url=action_url,
+            status="CONFIRMED",
+        ))
+        if len(buffer) >= 100:
+            yield ''.join(buffer)
+            buffer = []
+
+    # 2. For patients, also show available slots they can book
+    if not profile.is_doctor:
+        if buffer:
+            yield ''.join(buffer)
+            buffer = []
+
+        slot_ids = []
+        for slot_id in free_slots(doctor_ids, specialization).values_list('id', flat=True).iterator(chunk_size=chunk_size):
+            slot_ids.append(slot_id)
+            if len(slot_ids) >= chunk_size:
+                yield ''.join(slot_fragments(slot_ids))
+                slot_ids = []
+        buffer.extend(slot_fragments(slot_ids) if slot_ids else [])
+
+    buffer.append(ics.CALENDAR_FOOTER)
+    yield ''.join(buffer)
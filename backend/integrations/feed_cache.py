@@ -0,0 +1,116 @@
+"""
+Change versions and rendered-feed cache for the iCal feed.
+
+Every user has a version stamp that is bumped when one of their bookings
+changes. Patient feeds also list free slots, so they additionally depend on
+the slots stamps of the doctors they cover (the ?doctor filter, else the
+doctors of the ?specialization, else every doctor); a doctor's slots stamp
+is bumped whenever one of their slots is created, booked, blocked or
+deleted. A feed's ETag is derived from these stamps, which lets ICalFeedView
+answer conditional requests with 304 and serve rendered feeds from cache
+without touching the bookings or slots tables.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from datetime import date, datetime, time as dt_time
+import hashlib
+import time
+
+USER_KEY = 'ical:version:user:{}'
+SLOTS_KEY = 'ical:version:slots:doctor:{}'
+FEED_KEY = 'ical:feed:{}:{}'
+
+# Stamps must outlive rendered feeds; they are recreated on a miss anyway
+VERSION_TTL = 60 * 60 * 24 * 30
+
+
+def _stamp(key):
+    """Current stamp for key, initialising it to now if missing."""
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time(), VERSION_TTL)
+        value = cache.get(key)
+    return value
+
+
+def _bump(keys):
+    now = time.time()
+    # Set after commit, so a concurrent request cannot cache pre-commit data
+    # under the new version
+    transaction.on_commit(lambda: cache.set_many({key: now for key in keys}, VERSION_TTL))
+
+
+def bump_users(user_ids):
+    """Invalidate the feeds of these users."""
+    _bump([USER_KEY.format(user_id) for user_id in set(user_ids)])
+
+
+def bump_slots(doctor_ids):
+    """Invalidate the patient feeds covering these doctors (free slots changed)."""
+    _bump([SLOTS_KEY.format(doctor_id) for doctor_id in set(doctor_ids)])
+
+
+def _stamps(key_format, ids):
+    keys = {key_format.format(id_): id_ for id_ in ids}
+    found = cache.get_many(list(keys))
+    return {id_: found[key] if key in found else _stamp(key) for key, id_ in keys.items()}
+
+
+def user_stamps(user_ids):
+    """
+    Current stamps for several users, {user_id: stamp}, with one cache
+    round trip when they all exist. Other caches derived from a user's
+    bookings (e.g. the doctor digest) key on these too.
+    """
+    return _stamps(USER_KEY, user_ids)
+
+
+def slot_stamps(doctor_ids):
+    """Current slots stamps for several doctors, {doctor_id: stamp}."""
+    return _stamps(SLOTS_KEY, doctor_ids)
+
+
+def feed_version(profile, variant='', doctor_ids=None, specialization=None):
+    """
+    Return (etag, last_modified) for a profile's feed.
+
+    Args:
+        profile: UserProfile owning the feed
+        variant: Extra cache discriminator (e.g. query string filters)
+        doctor_ids: Doctors a patient's free slots are limited to
+        specialization: Specialization a patient's free slots are limited to
+
+    Returns:
+        tuple: (quoted ETag string, last-modified UNIX timestamp)
+    """
+    from accounts.directory import doctor_directory
+
+    stamp = _stamp(USER_KEY.format(profile.user_id))
+    parts = [str(profile.ical_token), variant, repr(stamp)]
+    last_modified = stamp
+
+    if not profile.is_doctor:
+        if not doctor_ids:
+            doctor_ids = [doctor['id'] for doctor in doctor_directory.search(specialization)]
+        stamps = slot_stamps(sorted(doctor_ids))
+        # The free-slot window moves every day
+        today = date.today()
+        parts.extend([repr(sorted(stamps.items())), today.isoformat()])
+        last_modified = max([last_modified, datetime.combine(today, dt_time.min).timestamp(), *stamps.values()])
+
+    etag = '"%s"' % hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return etag, int(last_modified)
+
+
+def get_feed(profile, etag):
+    return cache.get(FEED_KEY.format(profile.ical_token, etag))
+
+
+def set_feed(profile, etag, content):
+    cache.set(
+        FEED_KEY.format(profile.ical_token, etag),
+        content,
+        getattr(settings, 'ICAL_FEED_CACHE_TTL', 300)
+    )
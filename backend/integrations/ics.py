@@ -0,0 +1,78 @@
+"""
+Incremental ICS (RFC 5545) writer.
+
+Builds calendar documents one component at a time so feeds can be streamed
+instead of materialised in memory. Content lines are folded at 75 octets and
+TEXT values are escaped as they are written.
+"""
+
+from datetime import datetime
+
+CRLF = '\r\n'
+FOLD_OCTETS = 75
+
+
+def format_dt(day, tm):
+    """Format a date and time as a UTC DATE-TIME value."""
+    return datetime.combine(day, tm).strftime('%Y%m%dT%H%M%SZ')
+
+
+def escape_text(value):
+    """Escape a TEXT property value (RFC 5545 section 3.3.11)."""
+    return (
+        value.replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Fold a content line into CRLF-terminated chunks of at most 75 octets."""
+    if len(line) <= FOLD_OCTETS and line.isascii():
+        return line + CRLF
+
+    chunks = []
+    current, size, limit = [], 0, FOLD_OCTETS
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > limit:
+            chunks.append(''.join(current))
+            # Continuation lines start with a space, which counts toward the limit
+            current, size, limit = [], 0, FOLD_OCTETS - 1
+        current.append(char)
+        size += width
+    chunks.append(''.join(current))
+    return (CRLF + ' ').join(chunks) + CRLF
+
+
+def calendar_header(name):
+    return ''.join(fold(line) for line in [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//HMS//Hospital Management System//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(name)}",
+        "X-WR-TIMEZONE:UTC",
+    ])
+
+
+CALENDAR_FOOTER = fold("END:VCALENDAR")
+
+
+def vevent(uid, dtstamp, start, end, summary, description, url, status):
+    """Render one VEVENT component."""
+    return ''.join(fold(line) for line in [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART:{start}",
+        f"DTEND:{end}",
+        f"SUMMARY:{escape_text(summary)}",
+        f"DESCRIPTION:{escape_text(description)}",
+        f"URL;VALUE=URI:{url}",
+        f"STATUS:{status}",
+        "END:VEVENT",
+    ])
@@ -0,0 +1,59 @@
+"""
+Deliver queued emails.
+
+Drains the email messages of the outbox (see services.email_client.enqueue_email)
+with its own thread pool, sending up to --coalesce emails per request to the
+email service's BATCH action. Each message's delivery status is recorded on
+its outbox row. Calendar events are left to run_outbox_worker.
+
+Usage:
+    python manage.py run_email_worker
+    python manage.py run_email_worker --threads 8 --batch-size 400 --coalesce 100
+    python manage.py run_email_worker --once
+"""
+
+from django.core.management.base import BaseCommand
+import time
+
+from integrations.outbox import OutboxWorker, KIND_EMAIL
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process one batch and exit.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Messages claimed per round (default OUTBOX_BATCH_SIZE).')
+        parser.add_argument('--threads', type=int, default=None,
+                            help="Concurrent requests to the email service (default OUTBOX_CONCURRENCY['email']).")
+        parser.add_argument('--coalesce', type=int, default=None,
+                            help="Emails per request (default OUTBOX_COALESCE['email']).")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty.')
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(
+            batch_size=options['batch_size'],
+            kinds=[KIND_EMAIL],
+            concurrency={KIND_EMAIL: options['threads']} if options['threads'] else None,
+            coalesce={KIND_EMAIL: options['coalesce']} if options['coalesce'] else None,
+        )
+        self.stdout.write(
+            f"Email worker started: {worker.concurrency[KIND_EMAIL]} thread(s), "
+            f"up to {worker.coalesce[KIND_EMAIL]} email(s) per request"
+        )
+
+        try:
+            while True:
+                processed = worker.run_once()
+                if processed:
+                    self.stdout.write(f"Processed {processed} email(s)")
+                if options['once']:
+                    break
+                if not processed:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Email worker stopping...')
+        finally:
+            worker.shutdown()
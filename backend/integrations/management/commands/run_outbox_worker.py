@@ -0,0 +1,43 @@
+"""
+Drain the transactional outbox.
+
+Usage:
+    python manage.py run_outbox_worker
+    python manage.py run_outbox_worker --once --batch-size 100
+    python manage.py run_outbox_worker --kind email
+"""
+
+from django.core.management.base import BaseCommand
+import time
+
+from integrations.outbox import OutboxWorker, HANDLERS
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending outbox messages (emails, calendar events).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process one batch and exit.')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the outbox is empty.')
+        parser.add_argument('--kind', action='append', choices=sorted(HANDLERS),
+                            help='Only process these kinds (repeatable).')
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(batch_size=options['batch_size'], kinds=options['kind'])
+        self.stdout.write(f"Outbox worker started for: {', '.join(worker.kinds)}")
+
+        try:
+            while True:
+                processed = worker.run_once()
+                if processed:
+                    self.stdout.write(f"Processed {processed} outbox message(s)")
+                if options['once']:
+                    break
+                if not processed:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Outbox worker stopping...')
+        finally:
+            worker.shutdown()
@@ -0,0 +1,66 @@
+"""
+Push bookings that have no Google Calendar event yet to their doctors' calendars,
+and optionally pull doctors' busy time back to block overlapping slots.
+
+Usage:
+    python manage.py sync_google_calendar
+    python manage.py sync_google_calendar --doctor dr_smith
+    python manage.py sync_google_calendar --pull
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from services.google_calendar import GoogleCalendarService, BATCH_LIMIT
+
+
+class Command(BaseCommand):
+    help = 'Backfill Google Calendar events for bookings, using batch requests.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor', help='Username of a single doctor to sync.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_LIMIT,
+                            help=f'Inserts per batch request (max {BATCH_LIMIT}).')
+        parser.add_argument('--pull', action='store_true',
+                            help='Also pull busy time incrementally and block overlapping slots.')
+
+    def handle(self, *args, **options):
+        doctor = None
+        if options['doctor']:
+            try:
+                doctor = User.objects.select_related('profile').get(
+                    username=options['doctor'], profile__role='DOCTOR'
+                )
+            except User.DoesNotExist:
+                raise CommandError(f"Doctor '{options['doctor']}' not found.")
+
+        stats = GoogleCalendarService.sync_pending_bookings(
+            doctor=doctor, batch_size=options['batch_size']
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['created']} event(s) for {stats['doctors']} doctor(s); "
+            f"{stats['failed']} failed."
+        ))
+
+        if not options['pull']:
+            return
+
+        doctors = User.objects.filter(
+            profile__role='DOCTOR'
+        ).exclude(
+            profile__google_refresh_token=''
+        ).select_related('profile')
+        if doctor is not None:
+            doctors = doctors.filter(id=doctor.id)
+
+        for doc in doctors:
+            result = GoogleCalendarService.pull_busy_times(doc)
+            if result is None:
+                self.stdout.write(self.style.WARNING(f"Pull failed for {doc.username}"))
+                continue
+            self.stdout.write(
+                f"{doc.username}: {'full' if result['full'] else 'incremental'} pull, "
+                f"{result['changed']} changed event(s), {result['blocked']} slot(s) blocked, "
+                f"{result['unblocked']} unblocked"
+            )
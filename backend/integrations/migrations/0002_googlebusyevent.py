@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('integrations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoogleBusyEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='google_busy_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'google_busy_event',
+                'indexes': [models.Index(fields=['doctor', 'start'], name='google_busy_doctor__7c965b_idx')],
+                'unique_together': {('doctor', 'event_id')},
+            },
+        ),
+    ]
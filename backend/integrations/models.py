@@ -0,0 +1,85 @@
+"""
+Integration Models for HMS.
+Contains the transactional outbox for external side effects and
+busy time pulled from doctors' Google Calendars.
+"""
+
+from django.db import models
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+class OutboxMessage(models.Model):
+    """
+    A side effect (email, calendar event) recorded in the same transaction
+    as the change that caused it, and delivered later by the outbox worker.
+
+    Status flow:
+        PENDING -> DONE   when the handler succeeds
+        PENDING -> DEAD   after OUTBOX_MAX_ATTEMPTS failures (dead letter)
+    """
+
+    STATUS_PENDING = 'PENDING'
+    STATUS_DONE = 'DONE'
+    STATUS_DEAD = 'DEAD'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_DEAD, 'Dead letter'),
+    ]
+
+    kind = models.CharField(max_length=50, db_index=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Earliest time the worker may pick this message up"
+    )
+    claimed_by = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'outbox_message'
+        ordering = ['available_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class GoogleBusyEvent(models.Model):
+    """
+    A busy event from a doctor's Google Calendar.
+    
+    Kept so that availability slots can be unblocked again when the event
+    is moved or cancelled. Only upcoming events are stored.
+    """
+    
+    doctor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='google_busy_events'
+    )
+    event_id = models.CharField(max_length=255)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'google_busy_event'
+        unique_together = ['doctor', 'event_id']
+        indexes = [
+            models.Index(fields=['doctor', 'start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.doctor.username}: busy {self.start} - {self.end}"
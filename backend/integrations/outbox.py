@@ -0,0 +1,304 @@
+"""
+Transactional outbox for HMS.
+
+Views record side effects with enqueue()/enqueue_many() inside the same
+transaction.atomic() block as the booking or signup, so the HTTP response
+returns as soon as the transaction commits. The outbox worker
+(`python manage.py run_outbox_worker`) drains the table in batches.
+
+Delivery guarantees:
+    - At-least-once: a message is retried until its handler succeeds
+    - Exponential backoff with jitter between attempts
+    - Dead-lettered after OUTBOX_MAX_ATTEMPTS failures; a handler that
+      postpones a message (e.g. an open circuit breaker) does not use up
+      an attempt
+    - Per-kind concurrency limits (OUTBOX_CONCURRENCY)
+    - Kinds with a batch handler (emails) are coalesced: up to
+      OUTBOX_COALESCE[kind] messages are delivered by one handler call,
+      and each message still gets its own outcome
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+import logging
+import random
+import uuid
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+KIND_EMAIL = 'email'
+KIND_CALENDAR_EVENT = 'calendar_event'
+
+DEFAULT_CONCURRENCY = {
+    KIND_EMAIL: 4,
+    KIND_CALENDAR_EVENT: 2,
+}
+
+DEFAULT_COALESCE = {
+    KIND_EMAIL: 25,
+}
+
+UPDATE_FIELDS = ['status', 'attempts', 'available_at', 'claimed_by', 'last_error', 'processed_at']
+
+
+class Postpone(Exception):
+    """
+    Raised by a handler (or returned by a batch handler) when a message was
+    not attempted, e.g. because a circuit breaker refused the call. The
+    message is retried after `delay` seconds without counting an attempt.
+    """
+
+    def __init__(self, message, delay):
+        self.delay = delay
+        super().__init__(message)
+
+
+# ==================== PRODUCERS ====================
+
+def enqueue(kind, payload):
+    """
+    Record a side effect. Call inside the transaction that caused it.
+
+    Args:
+        kind: Handler kind (KIND_EMAIL, KIND_CALENDAR_EVENT)
+        payload: JSON-serialisable dict passed to the handler
+    """
+    return OutboxMessage.objects.create(kind=kind, payload=payload)
+
+
+def enqueue_many(messages):
+    """
+    Record several side effects with a single INSERT.
+
+    Args:
+        messages: Iterable of (kind, payload) tuples
+    """
+    return OutboxMessage.objects.bulk_create([
+        OutboxMessage(kind=kind, payload=payload)
+        for kind, payload in messages
+    ])
+
+
+def email_message(action, recipient, data=None):
+    """Build an outbox entry for services.email_client.send_email."""
+    return (KIND_EMAIL, {'action': action, 'recipient': recipient, 'data': data or {}})
+
+
+def calendar_event_message(booking):
+    """Build an outbox entry that creates the doctor's Google Calendar event."""
+    return (KIND_CALENDAR_EVENT, {'booking_id': booking.id})
+
+
+# ==================== HANDLERS ====================
+
+def _handle_email(payload):
+    from services.email_client import CircuitOpen, circuit_breaker, send_email
+
+    try:
+        sent = send_email(payload['action'], payload['recipient'], payload.get('data'))
+    except CircuitOpen as e:
+        raise Postpone(str(e), circuit_breaker.reset_seconds)
+    if not sent:
+        raise RuntimeError(f"Email service did not accept {payload['action']}")
+
+
+def _handle_email_batch(payloads):
+    from services.email_client import CircuitOpen, circuit_breaker, send_email_batch
+
+    errors = send_email_batch([
+        {'action': p['action'], 'recipient': p['recipient'], 'data': p.get('data') or {}}
+        for p in payloads
+    ])
+    return [
+        Postpone(str(error), circuit_breaker.reset_seconds) if isinstance(error, CircuitOpen) else error
+        for error in errors
+    ]
+
+
+def _handle_calendar_event(payload):
+    from scheduling.models import Booking
+    from services.google_calendar import GoogleCalendarService
+
+    try:
+        booking = Booking.objects.select_related(
+            'doctor', 'doctor__profile', 'patient', 'slot'
+        ).get(id=payload['booking_id'])
+    except Booking.DoesNotExist:
+        logger.info(f"Booking {payload['booking_id']} no longer exists, skipping calendar event")
+        return
+
+    if booking.google_event_id:
+        return
+
+    # Raises on HTTP and credential errors, so the message is retried
+    GoogleCalendarService.insert_event(booking)
+
+
+HANDLERS = {
+    KIND_EMAIL: _handle_email,
+    KIND_CALENDAR_EVENT: _handle_calendar_event,
+}
+
+# Deliver several payloads at once; return one error (None on success) per payload
+BATCH_HANDLERS = {
+    KIND_EMAIL: _handle_email_batch,
+}
+
+
+# ==================== WORKER ====================
+
+class OutboxWorker:
+    """
+    Claims due messages in batches and runs their handlers.
+
+    Claiming is a conditional UPDATE that stamps claimed_by and pushes
+    available_at forward by the lease, so several workers can run side by
+    side without double-delivering, on SQLite and PostgreSQL alike.
+    """
+
+    def __init__(self, batch_size=None, kinds=None, concurrency=None, coalesce=None):
+        self.batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 50)
+        self.max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+        self.backoff_base = getattr(settings, 'OUTBOX_BACKOFF_BASE_SECONDS', 5)
+        self.backoff_max = getattr(settings, 'OUTBOX_BACKOFF_MAX_SECONDS', 3600)
+        self.lease_seconds = getattr(settings, 'OUTBOX_LEASE_SECONDS', 300)
+        self.kinds = list(kinds or HANDLERS)
+
+        self.concurrency = concurrency = {
+            **DEFAULT_CONCURRENCY,
+            **getattr(settings, 'OUTBOX_CONCURRENCY', {}),
+            **(concurrency or {}),
+        }
+        self.coalesce = {
+            **DEFAULT_COALESCE,
+            **getattr(settings, 'OUTBOX_COALESCE', {}),
+            **(coalesce or {}),
+        }
+        self.executors = {
+            kind: ThreadPoolExecutor(
+                max_workers=concurrency.get(kind, 1),
+                thread_name_prefix=f'outbox-{kind}'
+            )
+            for kind in self.kinds
+        }
+
+    def claim(self):
+        """Claim up to batch_size due messages for this worker."""
+        now = timezone.now()
+        token = uuid.uuid4().hex
+
+        due = OutboxMessage.objects.filter(
+            status=OutboxMessage.STATUS_PENDING,
+            kind__in=self.kinds,
+            available_at__lte=now,
+        )
+        ids = list(due.values_list('id', flat=True)[:self.batch_size])
+        if not ids:
+            return []
+
+        due.filter(id__in=ids).update(
+            claimed_by=token,
+            available_at=now + timedelta(seconds=self.lease_seconds),
+        )
+        return list(OutboxMessage.objects.filter(id__in=ids, claimed_by=token))
+
+    def backoff(self, attempts):
+        """Delay before the next attempt: base * 2^(attempts-1), capped, jittered down to half."""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return timedelta(seconds=random.uniform(delay / 2, delay))
+
+    def record(self, message, error):
+        """Apply one delivery attempt's outcome (error is None on success) to a message."""
+        message.claimed_by = ''
+
+        if isinstance(error, Postpone):
+            # Not attempted: try again once the delay is over, up to half again later to spread the load
+            message.last_error = str(error)[:2000]
+            message.available_at = timezone.now() + timedelta(seconds=random.uniform(error.delay, error.delay * 1.5))
+            logger.info(f"Outbox message {message} postponed until {message.available_at}: {error}")
+            return
+
+        message.attempts += 1
+
+        if error is not None:
+            message.last_error = str(error)[:2000]
+            if message.attempts >= self.max_attempts:
+                message.status = OutboxMessage.STATUS_DEAD
+                message.processed_at = timezone.now()
+                logger.error(f"Outbox message {message} dead-lettered: {error}")
+            else:
+                message.available_at = timezone.now() + self.backoff(message.attempts)
+                logger.warning(
+                    f"Outbox message {message} failed (attempt {message.attempts}), "
+                    f"retrying at {message.available_at}: {error}"
+                )
+        else:
+            message.status = OutboxMessage.STATUS_DONE
+            message.processed_at = timezone.now()
+            message.last_error = ''
+
+    def process(self, message):
+        """Run one message's handler and record the outcome."""
+        handler = HANDLERS[message.kind]
+
+        try:
+            handler(message.payload)
+        except Exception as e:
+            self.record(message, e)
+        else:
+            self.record(message, None)
+
+        try:
+            message.save(update_fields=UPDATE_FIELDS)
+        finally:
+            # Handlers run on pool threads, each with its own connection
+            connections.close_all()
+        return message.status
+
+    def process_batch(self, messages):
+        """Deliver messages of one kind with a single batch handler call and record each outcome."""
+        handler = BATCH_HANDLERS[messages[0].kind]
+
+        try:
+            errors = handler([message.payload for message in messages])
+        except Exception as e:
+            errors = [e] * len(messages)
+
+        for message, error in zip(messages, errors):
+            self.record(message, error)
+
+        try:
+            OutboxMessage.objects.bulk_update(messages, UPDATE_FIELDS)
+        finally:
+            connections.close_all()
+        return [message.status for message in messages]
+
+    def run_once(self):
+        """Claim and process one batch. Returns the number of messages processed."""
+        messages = self.claim()
+
+        futures = []
+        batched = {}
+        for message in messages:
+            if message.kind in BATCH_HANDLERS:
+                batched.setdefault(message.kind, []).append(message)
+            else:
+                futures.append(self.executors[message.kind].submit(self.process, message))
+
+        for kind, group in batched.items():
+            size = max(1, self.coalesce.get(kind, 1))
+            for i in range(0, len(group), size):
+                futures.append(self.executors[kind].submit(self.process_batch, group[i:i + size]))
+
+        for future in futures:
+            future.result()
+        return len(messages)
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
@@ -0,0 +1,73 @@
+"""
+Signal receivers for the integrations app.
+Keeps iCal feed versions and slot fragments in step with bookings,
+slots and names.
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+import logging
+
+from scheduling.models import AvailabilitySlot, Booking
+from scheduling.signals import slots_changed
+from . import feed, feed_cache
+
+logger = logging.getLogger(__name__)
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    """A booking appears in both participants' feeds and removes a free slot."""
+    feed_cache.bump_users([instance.patient_id, instance.doctor_id])
+    feed_cache.bump_slots([instance.doctor_id])
+    feed.evict_slot_fragments([instance.slot_id])
+
+
+@receiver(post_save, sender=AvailabilitySlot)
+def slot_saved(sender, instance, created, **kwargs):
+    feed_cache.bump_slots([instance.doctor_id])
+    if created:
+        # Slots beyond the feed window are rendered when they first enter it
+        if feed.in_feed_window(instance) and not (instance.is_booked or instance.is_blocked):
+            feed.fill_slot_fragments([instance])
+    else:
+        feed.evict_slot_fragments([instance.id])
+
+
+@receiver(post_delete, sender=AvailabilitySlot)
+def slot_deleted(sender, instance, **kwargs):
+    feed_cache.bump_slots([instance.doctor_id])
+    feed.evict_slot_fragments([instance.id])
+
+
+@receiver(slots_changed)
+def slots_changed_in_bulk(sender, doctor_ids, slot_ids=None, **kwargs):
+    feed_cache.bump_slots(doctor_ids)
+    if slot_ids:
+        feed.evict_slot_fragments(slot_ids)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    """Names appear in the feeds of everyone the user has bookings with."""
+    if created:
+        return
+    
+    # e.g. login only touches last_login
+    if update_fields and not {'first_name', 'last_name', 'username'} & set(update_fields):
+        return
+    
+    counterparts = set(
+        Booking.objects.filter(patient=instance).values_list('doctor_id', flat=True)
+    ) | set(
+        Booking.objects.filter(doctor=instance).values_list('patient_id', flat=True)
+    )
+    feed_cache.bump_users(counterparts | {instance.id})
+    
+    # Free-slot fragments carry the doctor's name
+    if hasattr(instance, 'profile') and instance.profile.is_doctor:
+        feed_cache.bump_slots([instance.id])
+        feed.evict_slot_fragments(
+            AvailabilitySlot.objects.filter(doctor=instance, is_booked=False).values_list('id', flat=True)
+        )
@@ -0,0 +1,208 @@
+"""
+Tests for the integrations app.
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from rest_framework.test import APIClient
+
+from accounts.models import UserProfile
+from scheduling.models import AvailabilitySlot, Booking
+from services.tests import FakeGoogle, FakeGoogleMixin
+from . import feed
+from .models import OutboxMessage
+from services.email_client import circuit_breaker
+from .outbox import OutboxWorker, KIND_CALENDAR_EVENT, KIND_EMAIL, calendar_event_message, email_message, enqueue
+
+
+def make_user(username, role, **profile):
+    user = User.objects.create_user(
+        username=username, email=f'{username}@example.com', password='pw12345678',
+        first_name=username.title(), last_name='Test',
+    )
+    UserProfile.objects.create(user=user, role=role, **profile)
+    return user
+
+
+class CalendarEventOutboxTests(FakeGoogleMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.doctor = make_user('doctor', 'DOCTOR', google_refresh_token='refresh-token')
+        patient = make_user('patient', 'PATIENT')
+        slot = AvailabilitySlot.objects.create(
+            doctor=self.doctor, date=date.today() + timedelta(days=1),
+            start_time=time(9), end_time=time(9, 30), is_booked=True
+        )
+        self.booking = Booking.objects.create(patient=patient, doctor=self.doctor, slot=slot)
+        self.message = enqueue(*calendar_event_message(self.booking))
+
+        self.worker = OutboxWorker(kinds=[KIND_CALENDAR_EVENT])
+        self.addCleanup(self.worker.shutdown)
+
+    def process(self):
+        self.worker.process(self.message)
+        self.message.refresh_from_db()
+        self.booking.refresh_from_db()
+
+    def assert_retried(self):
+        self.assertEqual(self.message.status, OutboxMessage.STATUS_PENDING)
+        self.assertEqual(self.message.attempts, 1)
+        self.assertNotEqual(self.message.last_error, '')
+        self.assertEqual(self.booking.google_event_id, '')
+
+    def test_event_created(self):
+        self.process()
+
+        self.assertEqual(self.message.status, OutboxMessage.STATUS_DONE)
+        self.assertTrue(self.booking.google_event_id.startswith('ev'))
+
+    def test_server_error_is_retried(self):
+        FakeGoogle.failing = {self.booking.id}
+        FakeGoogle.failing_status = 500
+        self.process()
+        self.assert_retried()
+
+        FakeGoogle.failing = set()
+        self.message.available_at = self.message.created_at
+        self.process()
+        self.assertEqual(self.message.status, OutboxMessage.STATUS_DONE)
+        self.assertEqual(self.message.attempts, 2)
+        self.assertTrue(self.booking.google_event_id.startswith('ev'))
+
+    def test_token_error_is_retried(self):
+        FakeGoogle.token_status = 400
+        self.process()
+        self.assert_retried()
+
+    def test_unconnected_doctor_is_done(self):
+        self.doctor.profile.google_refresh_token = ''
+        self.doctor.profile.save(update_fields=['google_refresh_token'])
+        self.process()
+
+        self.assertEqual(self.message.status, OutboxMessage.STATUS_DONE)
+        self.assertEqual(self.booking.google_event_id, '')
+
+
+class ICalFeedTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.cardiologist = make_user('cardio', 'DOCTOR', specialization='Cardiology')
+        self.dermatologist = make_user('derma', 'DOCTOR', specialization='Dermatology')
+        self.patient = make_user('patient', 'PATIENT')
+        self.client = APIClient()
+
+    def url(self, query=''):
+        return f'/api/integrations/calendar/feed/{self.patient.profile.ical_token}/{query}'
+
+    def etag(self, query=''):
+        response = self.client.get(self.url(query))
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            b''.join(response.streaming_content)  # Finish the render so it is cached
+        return response['ETag']
+
+    def add_slot(self, doctor):
+        with self.captureOnCommitCallbacks(execute=True):
+            AvailabilitySlot.objects.create(
+                doctor=doctor, date=date.today() + timedelta(days=1),
+                start_time=time(9), end_time=time(9, 30)
+            )
+
+    def test_not_modified_carries_etag(self):
+        etag = self.etag()
+
+        response = self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('Last-Modified', response)
+
+    def test_last_modified_is_not_before_today(self):
+        start_of_today = datetime.combine(date.today(), time.min).timestamp()
+        response = self.client.get(self.url())
+
+        self.assertGreaterEqual(parse_http_date(response['Last-Modified']), int(start_of_today))
+
+    def test_slot_changes_only_invalidate_covering_feeds(self):
+        everyone = self.etag()
+        cardiology = self.etag('?specialization=cardiology')
+        cardiologist = self.etag(f'?doctor={self.cardiologist.id}')
+        dermatologist = self.etag(f'?doctor={self.dermatologist.id}')
+
+        self.add_slot(self.dermatologist)
+
+        self.assertNotEqual(self.etag(), everyone)
+        self.assertNotEqual(self.etag(f'?doctor={self.dermatologist.id}'), dermatologist)
+        self.assertEqual(self.etag('?specialization=cardiology'), cardiology)
+        self.assertEqual(self.etag(f'?doctor={self.cardiologist.id}'), cardiologist)
+
+
+class SlotFragmentTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = make_user('doctor', 'DOCTOR')
+
+    def create(self, days):
+        return AvailabilitySlot.objects.create(
+            doctor=self.doctor, date=date.today() + timedelta(days=days),
+            start_time=time(9), end_time=time(9, 30)
+        )
+
+    def cached(self, slot):
+        return cache.get(feed._fragment_key(slot.id)) is not None
+
+    def test_only_slots_in_feed_window_are_filled_on_create(self):
+        soon = self.create(1)
+        later = self.create(feed.FEED_WINDOW_DAYS + 30)
+
+        self.assertTrue(self.cached(soon))
+        self.assertFalse(self.cached(later))
+
+    def test_later_slots_are_filled_when_listed(self):
+        slot = self.create(feed.FEED_WINDOW_DAYS + 30)
+
+        self.assertEqual(len(feed.slot_fragments([slot.id])), 1)
+        self.assertTrue(self.cached(slot))
+
+
+@override_settings(EMAIL_SERVICE_URL='http://127.0.0.1:9/')
+class EmailOutboxTests(TestCase):
+
+    def setUp(self):
+        self.messages = [
+            enqueue(*email_message('SIGNUP_WELCOME', f'user{i}@example.com', {'name': 'User'}))
+            for i in range(3)
+        ]
+        self.worker = OutboxWorker(kinds=[KIND_EMAIL])
+        self.addCleanup(self.worker.shutdown)
+
+        # Open the circuit, as after an outage
+        for _ in range(circuit_breaker.threshold):
+            circuit_breaker.record_failure()
+        self.addCleanup(circuit_breaker.record_success)
+
+    def assert_postponed(self, message):
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.STATUS_PENDING)
+        self.assertEqual(message.attempts, 0)
+        self.assertEqual(message.claimed_by, '')
+        self.assertIn('circuit open', message.last_error)
+        self.assertGreaterEqual(message.available_at, timezone.now() + timedelta(seconds=circuit_breaker.reset_seconds - 1))
+
+    def test_open_circuit_does_not_use_up_attempts(self):
+        self.worker.max_attempts = 1
+        self.worker.process_batch(self.messages)
+
+        for message in self.messages:
+            self.assert_postponed(message)
+
+    def test_open_circuit_postpones_single_messages(self):
+        self.worker.process(self.messages[0])
+        self.assert_postponed(self.messages[0])
@@ -8,110 +8,80 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import redirect, get_object_or_404
 from django.conf import settings
-from django.http import HttpResponse
-from django.utils import timezone
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 import logging
 import secrets
 
+from . import feed, feed_cache
+
 logger = logging.getLogger(__name__)
 
 
 class ICalFeedView(APIView):
-    """Serve calendar feed in ICS format."""
+    """
+    Serve calendar feed in ICS format.
+    
+    Supports If-None-Match / If-Modified-Since (304) and caches rendered
+    feeds per change version; see integrations.feed_cache. Patient feeds
+    accept ?doctor=<id>[,<id>...] and ?specialization=<name> filters.
+    """
     
     permission_classes = []  # Publicly accessible via unique token
     
     def get(self, request, token):
         from accounts.models import UserProfile
-        from scheduling.models import Booking, AvailabilitySlot
         
         # Get profile by token
-        profile = get_object_or_404(UserProfile, ical_token=token)
-        user = profile.user
-        base_url = "http://localhost:5178" # Frontend URL
+        profile = get_object_or_404(UserProfile.objects.select_related('user'), ical_token=token)
         
-        # 1. Get confirmed bookings
-        if profile.is_doctor:
-            bookings = Booking.objects.filter(doctor=user).select_related('slot', 'patient')
-        else:
-            bookings = Booking.objects.filter(patient=user).select_related('slot', 'doctor')
-            
-        # 2. For patients, also show available slots they can book
-        available_slots = []
-        if not profile.is_doctor:
-            # Show next 7 days of available slots
-            now = timezone.now()
-            next_week = now + timezone.timedelta(days=7)
-            available_slots = AvailabilitySlot.objects.filter(
-                is_booked=False,
-                date__range=[now.date(), next_week.date()]
-            ).select_related('doctor')
-
-        # Build ICS content
-        def format_dt(dt, tm):
-            combined = timezone.datetime.combine(dt, tm)
-            return combined.strftime('%Y%m%dT%H%M%SZ')
-
-        lines = [
-            "BEGIN:VCALENDAR",
-            "VERSION:2.0",
-            "PRODID:-//HMS//Hospital Management System//EN",
-            "CALSCALE:GREGORIAN",
-            "METHOD:PUBLISH",
-            f"X-WR-CALNAME:HMS Appointments - {user.username}",
-            "X-WR-TIMEZONE:UTC",
-        ]
+        # Patients can narrow the free slots: ?doctor=1,2 and/or ?specialization=...
+        doctor_ids = sorted({
+            int(value) for value in request.query_params.get('doctor', '').split(',')
+            if value.strip().isdigit()
+        })
+        specialization = request.query_params.get('specialization', '').strip()
+        variant = f"{','.join(map(str, doctor_ids))}|{specialization.lower()}"
         
-        # Add confirmed bookings
-        for b in bookings:
-            slot = b.slot
-            start = format_dt(slot.date, slot.start_time)
-            end = format_dt(slot.date, slot.end_time)
-            
-            summary = f"Confirmed: Dr. {b.doctor.get_full_name() or b.doctor.username}" if not profile.is_doctor else f"Patient: {b.patient.get_full_name() or b.patient.username}"
-            
-            description = b.notes if b.notes else "HMS Appointment"
-            action_url = f"{base_url}/patient/bookings" if not profile.is_doctor else f"{base_url}/doctor/dashboard"
-            description += f"\n\nManage this appointment: {action_url}"
-            
-            lines.extend([
-                "BEGIN:VEVENT",
-                f"UID:hms-booking-{b.id}@hms.local",
-                f"DTSTAMP:{timezone.now().strftime('%Y%m%dT%H%M%SZ')}",
-                f"DTSTART:{start}",
-                f"DTEND:{end}",
-                f"SUMMARY:{summary}",
-                f"DESCRIPTION:{description}",
-                f"URL;VALUE=URI:{action_url}",
-                "STATUS:CONFIRMED",
-                "END:VEVENT",
-            ])
-            
-        # Add available slots for patients
-        for s in available_slots:
-            start = format_dt(s.date, s.start_time)
-            end = format_dt(s.date, s.end_time)
-            
-            summary = f"FREE: Slot with Dr. {s.doctor.get_full_name() or s.doctor.username}"
-            booking_url = f"{base_url}/patient" # Link to dashboard for booking
-            description = f"This slot is available for booking.\n\nBook now: {booking_url}"
-            
-            lines.extend([
-                "BEGIN:VEVENT",
-                f"UID:hms-slot-{s.id}@hms.local",
-                f"DTSTAMP:{timezone.now().strftime('%Y%m%dT%H%M%SZ')}",
-                f"DTSTART:{start}",
-                f"DTEND:{end}",
-                f"SUMMARY:{summary}",
-                f"DESCRIPTION:{description}",
-                f"URL;VALUE=URI:{booking_url}",
-                "STATUS:TENTATIVE",
-                "END:VEVENT",
-            ])
-            
-        lines.append("END:VCALENDAR")
+        # Answer conditional requests from the change version alone
+        etag, last_modified = feed_cache.feed_version(profile, variant, doctor_ids, specialization)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            # Clients revalidate with the ETag of the 304, so it must carry one
+            not_modified['ETag'] = etag
+            not_modified['Last-Modified'] = http_date(last_modified)
+            return not_modified
+        
+        content = feed_cache.get_feed(profile, etag)
+        if content is not None:
+            response = HttpResponse(content, content_type='text/calendar')
+        else:
+            response = StreamingHttpResponse(
+                self.cache_as_streamed(
+                    feed.iter_feed(profile, doctor_ids, specialization), profile, etag
+                ),
+                content_type='text/calendar'
+            )
         
-        content = "\r\n".join(lines)
-        response = HttpResponse(content, content_type='text/calendar')
         response['Content-Disposition'] = f'attachment; filename="hms_calendar.ics"'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
         return response
+    
+    @staticmethod
+    def cache_as_streamed(chunks, profile, etag):
+        """Pass chunks through, caching the whole feed if it stays small enough."""
+        limit = getattr(settings, 'ICAL_FEED_CACHE_MAX_BYTES', 1024 * 1024)
+        parts, size = [], 0
+        
+        for chunk in chunks:
+            yield chunk
+            if parts is not None:
+                size += len(chunk)
+                parts.append(chunk)
+                if size > limit:
+                    parts = None
+        
+        if parts is not None:
+            feed_cache.set_feed(profile, etag, ''.join(parts))
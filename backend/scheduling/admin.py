@@ -3,13 +3,13 @@ Admin configuration for scheduling app.
 """
 
 from django.contrib import admin
-from .models import AvailabilitySlot, Booking
+from .models import AvailabilitySlot, AvailabilityTemplate, Booking
 
 
 @admin.register(AvailabilitySlot)
 class AvailabilitySlotAdmin(admin.ModelAdmin):
-    list_display = ['doctor', 'date', 'start_time', 'end_time', 'is_booked', 'created_at']
-    list_filter = ['is_booked', 'date', 'doctor']
+    list_display = ['doctor', 'date', 'start_time', 'end_time', 'is_booked', 'is_blocked', 'created_at']
+    list_filter = ['is_booked', 'is_blocked', 'date', 'doctor']
     search_fields = ['doctor__username', 'doctor__first_name', 'doctor__last_name']
     date_hierarchy = 'date'
     readonly_fields = ['created_at']
@@ -19,7 +19,28 @@ class AvailabilitySlotAdmin(admin.ModelAdmin):
             'fields': ('doctor', 'date', 'start_time', 'end_time')
         }),
         ('Status', {
-            'fields': ('is_booked',)
+            'fields': ('is_booked', 'is_blocked')
+        }),
+        ('Metadata', {
+            'fields': ('created_at',),
+            'classes': ('collapse',)
+        }),
+    )
+
+
+@admin.register(AvailabilityTemplate)
+class AvailabilityTemplateAdmin(admin.ModelAdmin):
+    list_display = ['doctor', 'weekdays', 'start_time', 'end_time', 'slot_minutes', 'valid_from', 'valid_until', 'is_active']
+    list_filter = ['is_active', 'doctor']
+    search_fields = ['doctor__username', 'doctor__first_name', 'doctor__last_name']
+    readonly_fields = ['created_at']
+    
+    fieldsets = (
+        (None, {
+            'fields': ('doctor', 'weekdays', 'start_time', 'end_time', 'slot_minutes', 'interval_minutes')
+        }),
+        ('Validity', {
+            'fields': ('valid_from', 'valid_until', 'exceptions', 'is_active')
         }),
         ('Metadata', {
             'fields': ('created_at',),
@@ -5,3 +5,7 @@ class SchedulingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scheduling'
     verbose_name = 'Appointment Scheduling'
+    
+    def ready(self):
+        # Import signals when app is ready
+        import scheduling.signals  # noqa
@@ -0,0 +1,463 @@
+"""
+In-process availability index for fast free-slot search.
+
+Keeps, per doctor per day, bitmaps of the day's 96 quarter-hours:
+    starts - quarters where a free slot starts
+    free   - quarters covered by free slots
+    busy   - quarters covered by booked or blocked slots
+plus a map from start quarter to the slot itself. Days are grouped by
+specialization, so "first N free slots for specialization S after T" only
+visits doctors of S, and "is doctor D free at T" is a single bit test.
+
+The index is a candidate generator: it is loaded from the database on first
+use, kept current by the receivers in scheduling.signals, and callers that
+return slots to users confirm them against the database. With several worker
+processes, every mutation bumps a generation counter in the shared cache and
+stores a change record under the new generation: the (doctor, day) pairs it
+touched, or (doctor, None) for all of a doctor's days. A process that sees
+the counter move reloads only the doctor-days in the records it missed (one
+query). If a record is missing, e.g. expired, it falls back to a full reload
+(at most once every AVAILABILITY_INDEX_MIN_RELOAD_SECONDS). When the date
+changes, past days are dropped and the horizon is extended by the days it
+gained.
+"""
+
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+from heapq import merge
+from itertools import islice
+import threading
+import time as clock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+QUARTER_MINUTES = 15
+QUARTERS_PER_DAY = 24 * 60 // QUARTER_MINUTES
+ALL_QUARTERS = (1 << QUARTERS_PER_DAY) - 1
+GENERATION_KEY = 'availability:index:generation'
+CHANGE_KEY = 'availability:index:change:{}'
+CHANGE_TTL = 60 * 60
+# Further behind than this, a full reload is cheaper than replaying records
+MAX_REPLAY = 200
+
+
+def quarter_of(tm):
+    return (tm.hour * 60 + tm.minute) // QUARTER_MINUTES
+
+
+def quarter_span(start_time, end_time):
+    """Bitmask of the quarters covered by [start_time, end_time)."""
+    first = quarter_of(start_time)
+    end_minutes = end_time.hour * 60 + end_time.minute
+    last = max(first + 1, -(-end_minutes // QUARTER_MINUTES))  # ceil
+    return ((1 << last) - 1) ^ ((1 << first) - 1)
+
+
+def window_mask(time_from=None, time_to=None):
+    """Bitmask of start quarters within [time_from, time_to)."""
+    mask = ALL_QUARTERS
+    if time_from is not None:
+        # Keep the quarter containing time_from; exact times are checked later
+        mask &= ~((1 << quarter_of(time_from)) - 1)
+    if time_to is not None:
+        mask &= (1 << -(-(time_to.hour * 60 + time_to.minute) // QUARTER_MINUTES)) - 1
+    return mask
+
+
+def iter_bits(bits):
+    """Yield set bit positions, lowest first."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class DayAvailability:
+    """One doctor's availability on one day."""
+
+    __slots__ = ('starts', 'free', 'busy', 'slots')
+
+    def __init__(self):
+        self.starts = 0
+        self.free = 0
+        self.busy = 0
+        # start quarter -> (slot_id, start_time, end_time, available)
+        self.slots = {}
+
+    def rebuild(self):
+        self.starts = self.free = self.busy = 0
+        for quarter, (_, start_time, end_time, available) in self.slots.items():
+            span = quarter_span(start_time, end_time)
+            if available:
+                self.starts |= 1 << quarter
+                self.free |= span
+            else:
+                self.busy |= span
+
+
+class AvailabilityIndex:
+    """Bitmap index over upcoming availability slots."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._loaded_at = 0
+        self._generation = None
+        self._today = None
+        # date -> specialization -> doctor_id -> DayAvailability
+        self._days = {}
+        self._dates = []
+        self._specialization = {}
+        # slot_id -> (doctor_id, date, start quarter)
+        self._slots = {}
+
+    # ==================== LOADING ====================
+
+    @property
+    def horizon_days(self):
+        return getattr(settings, 'AVAILABILITY_INDEX_DAYS', 90)
+
+    @staticmethod
+    def _rows(slots):
+        return slots.values_list('id', 'doctor_id', 'date', 'start_time', 'end_time', 'is_booked', 'is_blocked')
+
+    def _put_rows(self, rows):
+        touched = set()
+        for slot_id, doctor_id, day, start_time, end_time, is_booked, is_blocked in rows:
+            if slot_id in self._slots:
+                # Moved to another day since it was indexed
+                self._drop(slot_id)
+            touched.add(self._put(slot_id, doctor_id, day, start_time, end_time, not (is_booked or is_blocked)))
+        for entry in touched:
+            entry.rebuild()
+
+    def load(self):
+        """(Re)build the index from the database: two queries."""
+        from accounts.models import UserProfile
+        from .models import AvailabilitySlot
+
+        # Read the generation first: changes committed during the load are
+        # then replayed rather than missed
+        generation = cache.get(GENERATION_KEY)
+        today = date.today()
+        specialization = dict(
+            UserProfile.objects.filter(role='DOCTOR').values_list('user_id', 'specialization')
+        )
+        rows = self._rows(AvailabilitySlot.objects.filter(
+            date__gte=today,
+            date__lte=today + timedelta(days=self.horizon_days),
+        ))
+
+        with self._lock:
+            self._days, self._dates, self._slots = {}, [], {}
+            self._specialization = {
+                doctor_id: (spec or '').strip().lower()
+                for doctor_id, spec in specialization.items()
+            }
+            self._put_rows(rows.iterator(chunk_size=2000))
+            self._loaded = True
+            self._loaded_at = clock.monotonic()
+            self._generation = generation
+            self._today = today
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+            return
+        if self._today != date.today():
+            self._roll(date.today())
+
+        current = cache.get(GENERATION_KEY)
+        if current != self._generation and not self._catch_up(current):
+            min_age = getattr(settings, 'AVAILABILITY_INDEX_MIN_RELOAD_SECONDS', 5)
+            if clock.monotonic() - self._loaded_at >= min_age:
+                self.load()
+
+    def _roll(self, today):
+        """Drop days before today and index the days the horizon gained."""
+        from .models import AvailabilitySlot
+
+        horizon = timedelta(days=self.horizon_days)
+        if today < self._today or today - self._today > horizon:
+            self.load()
+            return
+
+        rows = self._rows(AvailabilitySlot.objects.filter(
+            date__gt=self._today + horizon,
+            date__lte=today + horizon,
+        ))
+        past = self._dates[:bisect_left(self._dates, today)]
+        for day in past:
+            for doctors in self._days.pop(day).values():
+                for entry in doctors.values():
+                    for slot_id, _, _, _ in entry.slots.values():
+                        self._slots.pop(slot_id, None)
+        del self._dates[:len(past)]
+        self._put_rows(rows)
+        self._today = today
+
+    def _catch_up(self, current):
+        """
+        Apply the change records of generations after ours up to current.
+
+        Returns False, changing nothing, if a full reload is needed instead.
+        """
+        from accounts.models import UserProfile
+        from .models import AvailabilitySlot
+
+        base = self._generation or 0
+        if current is None or not 0 < current - base <= MAX_REPLAY:
+            return False
+        keys = [CHANGE_KEY.format(generation) for generation in range(base + 1, current + 1)]
+        records = cache.get_many(keys)
+        if len(records) != len(keys):
+            return False
+
+        doctors, days = set(), set()
+        for changes in records.values():
+            for doctor_id, day in changes:
+                if day is None:
+                    doctors.add(doctor_id)
+                else:
+                    days.add((doctor_id, day))
+        days = {(doctor_id, day) for doctor_id, day in days if doctor_id not in doctors}
+
+        horizon = Q(date__gte=self._today, date__lte=self._today + timedelta(days=self.horizon_days))
+        scope = Q(doctor_id__in=doctors)
+        for doctor_id, day in days:
+            scope |= Q(doctor_id=doctor_id, date=day)
+        rows = list(self._rows(AvailabilitySlot.objects.filter(horizon & scope)))
+        if doctors:
+            for doctor_id, spec in UserProfile.objects.filter(user_id__in=doctors).values_list('user_id', 'specialization'):
+                self._move(doctor_id, spec)
+
+        for doctor_id in doctors:
+            for day in self._dates:
+                self._clear(doctor_id, day)
+        for doctor_id, day in days:
+            self._clear(doctor_id, day)
+        self._put_rows(rows)
+        self._generation = current
+        return True
+
+    def _changed(self, changes):
+        """
+        Tell other processes which doctor-days changed: a set of
+        (doctor_id, date) pairs, or (doctor_id, None) for all of a doctor's days.
+        """
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            generation = 1 if cache.add(GENERATION_KEY, 1, None) else cache.incr(GENERATION_KEY)
+        cache.set(CHANGE_KEY.format(generation), list(changes), CHANGE_TTL)
+
+        # If another process changed slots since our last load or catch-up,
+        # keep our generation so the next read replays its records too
+        if self._loaded and generation == (self._generation or 0) + 1:
+            self._generation = generation
+
+    # ==================== MUTATION ====================
+
+    def _day(self, doctor_id, day):
+        per_spec = self._days.get(day)
+        if per_spec is None:
+            per_spec = self._days[day] = {}
+            insort(self._dates, day)
+        spec = self._specialization.get(doctor_id, '')
+        return per_spec.setdefault(spec, {}).setdefault(doctor_id, DayAvailability())
+
+    def _put(self, slot_id, doctor_id, day, start_time, end_time, available):
+        entry = self._day(doctor_id, day)
+        quarter = quarter_of(start_time)
+        entry.slots[quarter] = (slot_id, start_time, end_time, available)
+        self._slots[slot_id] = (doctor_id, day, quarter)
+        return entry
+
+    def _drop(self, slot_id):
+        located = self._slots.pop(slot_id, None)
+        if located is None:
+            return None
+        doctor_id, day, quarter = located
+        entry = self._day(doctor_id, day)
+        entry.slots.pop(quarter, None)
+        entry.rebuild()
+        return located
+
+    def _clear(self, doctor_id, day):
+        """Forget a doctor's slots on one day."""
+        per_spec = self._days.get(day)
+        if per_spec is None:
+            return
+        entry = per_spec.get(self._specialization.get(doctor_id, ''), {}).get(doctor_id)
+        if entry is None:
+            return
+        for slot_id, _, _, _ in entry.slots.values():
+            self._slots.pop(slot_id, None)
+        entry.slots = {}
+        entry.rebuild()
+
+    def _move(self, doctor_id, specialization):
+        """Move a doctor's days to another specialization bucket."""
+        spec = (specialization or '').strip().lower()
+        old = self._specialization.get(doctor_id)
+        self._specialization[doctor_id] = spec
+        if old is None or old == spec:
+            return
+        for per_spec in self._days.values():
+            entry = per_spec.get(old, {}).pop(doctor_id, None)
+            if entry is not None:
+                per_spec.setdefault(spec, {})[doctor_id] = entry
+
+    def add_slots(self, slots):
+        """Index new or changed slots (model instances or equivalent objects)."""
+        with self._lock:
+            changes = {(slot.doctor_id, slot.date) for slot in slots}
+            if self._loaded:
+                horizon = self._today + timedelta(days=self.horizon_days)
+                for slot in slots:
+                    located = self._drop(slot.id)
+                    if located is not None:
+                        changes.add(located[:2])
+                    if self._today <= slot.date <= horizon:
+                        self._put(
+                            slot.id, slot.doctor_id, slot.date, slot.start_time, slot.end_time,
+                            not (slot.is_booked or slot.is_blocked)
+                        ).rebuild()
+            self._changed(changes)
+
+    def remove_slots(self, slots):
+        """Forget deleted slots (model instances or equivalent objects)."""
+        with self._lock:
+            if self._loaded:
+                for slot in slots:
+                    self._drop(slot.id)
+            self._changed({(slot.doctor_id, slot.date) for slot in slots})
+
+    def set_available(self, slot_id, available, doctor_id):
+        """Flip one of doctor_id's slots between free and booked/blocked."""
+        with self._lock:
+            located = self._slots.get(slot_id) if self._loaded else None
+            if located is None:
+                # Not indexed here: other processes re-read all the doctor's days
+                self._changed({(doctor_id, None)})
+                return
+            doctor_id, day, quarter = located
+            entry = self._day(doctor_id, day)
+            slot_id, start_time, end_time, _ = entry.slots[quarter]
+            entry.slots[quarter] = (slot_id, start_time, end_time, available)
+            entry.rebuild()
+            self._changed({(doctor_id, day)})
+
+    def refresh_doctors(self, doctor_ids):
+        """Reload some doctors' slots from the database after a bulk change."""
+        from .models import AvailabilitySlot
+
+        doctor_ids = set(doctor_ids)
+        with self._lock:
+            if self._loaded:
+                rows = list(self._rows(AvailabilitySlot.objects.filter(
+                    doctor_id__in=doctor_ids,
+                    date__gte=self._today,
+                    date__lte=self._today + timedelta(days=self.horizon_days),
+                )))
+                for doctor_id in doctor_ids:
+                    for day in self._dates:
+                        self._clear(doctor_id, day)
+                self._put_rows(rows)
+            self._changed({(doctor_id, None) for doctor_id in doctor_ids})
+
+    def set_specialization(self, doctor_id, specialization):
+        """Move a doctor's days to another specialization bucket."""
+        with self._lock:
+            old = self._specialization.get(doctor_id)
+            self._move(doctor_id, specialization)
+            if old != self._specialization[doctor_id]:
+                self._changed({(doctor_id, None)})
+
+    # ==================== QUERIES ====================
+
+    def is_free(self, doctor_id, at):
+        """True if one of the doctor's free slots covers datetime `at`."""
+        with self._lock:
+            self._ensure_loaded()
+            spec = self._specialization.get(doctor_id, '')
+            entry = self._days.get(at.date(), {}).get(spec, {}).get(doctor_id)
+            if entry is None:
+                return False
+            return bool(entry.free >> quarter_of(at.time()) & 1)
+
+    def first_free(self, n=10, after=None, specialization=None, doctor_ids=None,
+                   date_to=None, time_from=None, time_to=None):
+        """
+        The n earliest free slots starting at or after `after`.
+
+        Args:
+            n: Number of slots to return
+            after: datetime lower bound (default: now)
+            specialization: Only doctors with this specialization (case-insensitive)
+            doctor_ids: Only these doctors
+            date_to: Last date to consider (inclusive)
+            time_from, time_to: Only slots starting within this time-of-day window
+
+        Returns:
+            list of (date, start_time, doctor_id, slot_id), ordered by start
+        """
+        after = after or datetime.now()
+        spec = specialization.strip().lower() if specialization else None
+        doctor_ids = set(doctor_ids) if doctor_ids else None
+        window = window_mask(time_from, time_to)
+        results = []
+
+        with self._lock:
+            self._ensure_loaded()
+            for day in self._dates[bisect_left(self._dates, after.date()):]:
+                if date_to is not None and day > date_to:
+                    break
+
+                mask = window
+                if day == after.date():
+                    mask &= ~((1 << quarter_of(after.time())) - 1)
+
+                per_spec = self._days[day]
+                buckets = [per_spec.get(spec, {})] if spec is not None else per_spec.values()
+                streams = []
+                for doctors in buckets:
+                    for doctor_id, entry in doctors.items():
+                        bits = entry.starts & mask
+                        if not bits or (doctor_ids is not None and doctor_id not in doctor_ids):
+                            continue
+                        streams.append(self._day_stream(day, doctor_id, entry, bits, after, time_from, time_to))
+
+                # k-way merge of the per-doctor streams, which are already sorted
+                results.extend(islice(merge(*streams), n - len(results)))
+                if len(results) >= n:
+                    break
+
+        return results
+
+    @staticmethod
+    def _day_stream(day, doctor_id, entry, bits, after, time_from, time_to):
+        for quarter in iter_bits(bits):
+            slot_id, start_time, _, _ = entry.slots[quarter]
+            # Bits are quarter-aligned; check exact times for unaligned slots
+            if day == after.date() and start_time < after.time():
+                continue
+            if time_from is not None and start_time < time_from:
+                continue
+            if time_to is not None and start_time >= time_to:
+                continue
+            yield (day, start_time, doctor_id, slot_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': self._loaded,
+                'days': len(self._dates),
+                'slots': len(self._slots),
+                'doctors': len(self._specialization),
+            }
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,124 @@
+"""
+Booking engine for HMS.
+
+Claims a slot with a single conditional UPDATE (compare-and-set) instead of
+SELECT ... FOR UPDATE, so the behaviour is identical on SQLite (which ignores
+row locks) and PostgreSQL.
+
+Query budget for a successful booking: at most 3 statements
+(not counting BEGIN/COMMIT).
+    1. UPDATE availability_slot SET is_booked = true
+       WHERE id = %s AND is_booked = false AND <slot not in the past>
+    2. SELECT the claimed slot joined with its doctor
+    3. INSERT INTO booking
+
+A failed claim costs one extra SELECT to report why the slot was rejected.
+Claiming a virtual slot from an availability template first materialises it
+(see scheduling.templates), which adds a few statements.
+"""
+
+from django.db import transaction, IntegrityError
+from django.db.models import Q
+from datetime import datetime
+import logging
+
+from .models import AvailabilitySlot, Booking
+from .templates import materialize_occurrence
+
+logger = logging.getLogger(__name__)
+
+BOOKING_QUERY_BUDGET = 3
+
+
+class BookingError(Exception):
+    """Base class for booking failures. Carries a user-facing message."""
+
+    message = 'Slot is no longer available.'
+
+    def __init__(self, message=None):
+        super().__init__(message or self.message)
+        self.message = message or self.message
+
+
+class SlotNotFound(BookingError):
+    message = 'Slot not found.'
+
+
+class SlotAlreadyBooked(BookingError):
+    message = 'Slot is no longer available.'
+
+
+class SlotInPast(BookingError):
+    message = 'Cannot book a slot in the past.'
+
+
+def _bookable(now):
+    """Filter matching slots that start now or later."""
+    return Q(date__gt=now.date()) | Q(date=now.date(), start_time__gte=now.time())
+
+
+def _diagnose(slot_id):
+    """Explain why the conditional UPDATE did not claim the slot."""
+    slot = AvailabilitySlot.objects.filter(id=slot_id).values('is_booked', 'is_blocked').first()
+    if slot is None:
+        return SlotNotFound()
+    if slot['is_booked'] or slot['is_blocked']:
+        return SlotAlreadyBooked()
+    return SlotInPast()
+
+
+def book_slot(patient, slot_id, notes=''):
+    """
+    Atomically claim a slot and create the booking for a patient.
+
+    Args:
+        patient: User making the booking
+        slot_id: Primary key of the AvailabilitySlot to claim, or a virtual
+            template slot id ("tpl-...")
+        notes: Optional notes from the patient
+
+    Returns:
+        Booking: The created booking, with patient, doctor and slot cached
+
+    Raises:
+        SlotNotFound, SlotAlreadyBooked, SlotInPast: If the slot cannot be claimed
+    """
+    now = datetime.now()
+
+    # savepoint=False keeps the budget intact when called inside an outer atomic block
+    with transaction.atomic(savepoint=False):
+        if isinstance(slot_id, str):
+            slot_id = materialize_occurrence(slot_id)
+            if slot_id is None:
+                raise SlotNotFound()
+
+        claimed = AvailabilitySlot.objects.filter(
+            _bookable(now),
+            id=slot_id,
+            is_booked=False,
+            is_blocked=False,
+        ).update(is_booked=True)
+
+        if not claimed:
+            raise _diagnose(slot_id)
+
+        slot = AvailabilitySlot.objects.select_related('doctor').get(id=slot_id)
+
+        try:
+            booking = Booking.objects.create(
+                patient=patient,
+                doctor=slot.doctor,
+                slot=slot,
+                notes=notes
+            )
+        except IntegrityError:
+            # OneToOne on booking.slot is the last line of defence
+            raise SlotAlreadyBooked()
+
+    logger.info(
+        f"Booking created: {booking.id} - "
+        f"{patient.username} with Dr. {slot.doctor.username} "
+        f"on {slot.date} at {slot.start_time}"
+    )
+
+    return booking
@@ -0,0 +1,198 @@
+"""
+Set-based slot creation.
+
+Creates many availability slots for one doctor with a constant number of
+queries: a per-doctor lock (see scheduling.overlap.lock_doctor), one read of
+the existing slots in the date range, one bulk INSERT (per
+BULK_SLOT_INSERT_BATCH rows) and one read back of the created rows. Holding
+the lock, no other request can create slots for the doctor between the
+overlap check and the read back. Everything else - time parsing, duration limits, overlap detection (see
+scheduling.overlap) - happens in memory.
+
+Slots are given either as explicit candidates or as a weekly recurrence
+rule, e.g. Mon-Fri 09:00-17:00 every 20 minutes for 12 weeks:
+
+    expand_recurrence(
+        start_date=date(2025, 1, 6), weeks=12, weekdays=[0, 1, 2, 3, 4],
+        start_time=time(9), end_time=time(17), slot_minutes=20,
+    )
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from datetime import date, datetime, timedelta
+import logging
+
+from .models import AvailabilitySlot
+from .overlap import OverlapChecker, lock_doctor
+from .signals import slots_changed
+
+logger = logging.getLogger(__name__)
+
+MIN_SLOT_MINUTES = 15
+MAX_SLOT_MINUTES = 240  # 4 hours
+
+
+class BulkSlotError(Exception):
+    """The request as a whole cannot be processed."""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(message)
+
+
+def expand_recurrence(start_date, weeks, weekdays, start_time, end_time,
+                      slot_minutes, interval_minutes=None):
+    """
+    Expand a weekly rule into (label, date, start_time, end_time) candidates.
+
+    Args:
+        start_date: First day of the rule
+        weeks: Number of weeks the rule runs for
+        weekdays: Days to fill, 0=Monday ... 6=Sunday
+        start_time, end_time: Daily window; the last slot ends by end_time
+        slot_minutes: Length of each slot
+        interval_minutes: Minutes between slot starts (default: slot_minutes)
+    """
+    interval = timedelta(minutes=interval_minutes or slot_minutes)
+    length = timedelta(minutes=slot_minutes)
+    weekdays = set(weekdays)
+
+    # The daily pattern is the same every day, so build it once
+    day_pattern = []
+    start = datetime.combine(date.min, start_time)
+    window_end = datetime.combine(date.min, end_time)
+    while start + length <= window_end:
+        day_pattern.append((start.time(), (start + length).time()))
+        start += interval
+
+    for offset in range(weeks * 7):
+        day = start_date + timedelta(days=offset)
+        if day.weekday() not in weekdays:
+            continue
+        for slot_start, slot_end in day_pattern:
+            yield (f"{day} {slot_start:%H:%M}", day, slot_start, slot_end)
+
+
+def explicit_candidates(day, slots):
+    """
+    Turn the legacy [{'start_time': 'HH:MM', 'end_time': 'HH:MM'}, ...] payload
+    into candidates, collecting parse errors instead of raising.
+    """
+    candidates, errors = [], []
+    for i, slot_data in enumerate(slots):
+        try:
+            start_time = datetime.strptime(slot_data['start_time'], '%H:%M').time()
+            end_time = datetime.strptime(slot_data['end_time'], '%H:%M').time()
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append(f"Slot {i+1}: {str(e)}")
+            continue
+        candidates.append((f"Slot {i+1}", day, start_time, end_time))
+    return candidates, errors
+
+
+def _check(day, start_time, end_time, now):
+    """Return why a candidate is invalid, or None."""
+    if end_time <= start_time:
+        return "End time must be after start time."
+
+    minutes = (datetime.combine(day, end_time) - datetime.combine(day, start_time)).total_seconds() / 60
+    if minutes < MIN_SLOT_MINUTES:
+        return f"Slot must be at least {MIN_SLOT_MINUTES} minutes long."
+    if minutes > MAX_SLOT_MINUTES:
+        return "Slot cannot exceed 4 hours."
+
+    if datetime.combine(day, start_time) < now:
+        return "Cannot create slots in the past."
+    return None
+
+
+def create_slots(doctor, candidates):
+    """
+    Validate and insert candidate slots for a doctor.
+
+    Args:
+        doctor: User creating the slots
+        candidates: iterable of (label, date, start_time, end_time)
+
+    Returns:
+        tuple: (created slots ordered by date and start time, list of error strings)
+
+    Raises:
+        BulkSlotError: More candidates than BULK_SLOT_MAX_SLOTS
+    """
+    max_slots = getattr(settings, 'BULK_SLOT_MAX_SLOTS', 5000)
+    candidates = list(candidates)
+    if len(candidates) > max_slots:
+        raise BulkSlotError(f"At most {max_slots} slots can be created at once (got {len(candidates)}).")
+    if not candidates:
+        return [], []
+
+    first_day = min(c[1] for c in candidates)
+    last_day = max(c[1] for c in candidates)
+
+    now = datetime.now()
+    errors, valid = [], []
+    for label, day, start_time, end_time in candidates:
+        problem = _check(day, start_time, end_time, now)
+        if problem:
+            errors.append(f"{label}: {problem}")
+        else:
+            valid.append((label, day, start_time, end_time))
+    if not valid:
+        return [], errors
+
+    with transaction.atomic():
+        # 1. No other slot creation for this doctor until commit
+        lock_doctor(doctor)
+
+        # 2. Existing slots for the whole range in one query; check overlaps in memory
+        checker = OverlapChecker(doctor, first_day, last_day)
+        new_slots = []
+        for label, day, start_time, end_time in valid:
+            problem = checker.claim(day, start_time, end_time)
+            if problem:
+                errors.append(f"{label}: {problem}")
+                continue
+            new_slots.append(AvailabilitySlot(
+                doctor=doctor, date=day, start_time=start_time, end_time=end_time
+            ))
+
+        if not new_slots:
+            return [], errors
+
+        # 3. Insert; the unique constraint turns start times taken by a writer
+        # that does not take the lock (e.g. the admin) into skipped rows
+        inserted_at = timezone.now()
+        AvailabilitySlot.objects.bulk_create(
+            new_slots,
+            batch_size=getattr(settings, 'BULK_SLOT_INSERT_BATCH', 500),
+            ignore_conflicts=True,
+        )
+
+        # 4. Read back ids (bulk_create with ignore_conflicts does not set them)
+        wanted = {(s.date, s.start_time): s.end_time for s in new_slots}
+        created = [
+            slot for slot in AvailabilitySlot.objects.filter(
+                doctor=doctor,
+                date__range=(first_day, last_day),
+                created_at__gte=inserted_at,
+            ).select_related('doctor').order_by('date', 'start_time')
+            if wanted.get((slot.date, slot.start_time)) == slot.end_time
+        ]
+
+        lost = len(new_slots) - len(created)
+        if lost:
+            errors.append(f"{lost} slot(s) were created concurrently by another request and skipped.")
+
+        if created:
+            # bulk_create sends no post_save; tell the caches and index directly
+            slots_changed.send(
+                sender=AvailabilitySlot,
+                doctor_ids=[doctor.id],
+                slot_ids=[slot.id for slot in created],
+            )
+
+    logger.info(f"Bulk created {len(created)} slots for {doctor.username} ({len(errors)} skipped)")
+    return created, errors
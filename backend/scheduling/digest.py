@@ -0,0 +1,170 @@
+"""
+Daily schedule digest for doctors.
+
+A digest is a doctor's appointments for one day:
+
+    {"doctor": id, "doctor_name": str, "date": "YYYY-MM-DD", "count": n,
+     "appointments": [{"booking", "start_time", "end_time", "patient",
+                       "patient_name", "notes"}, ...]}
+
+Digests for every doctor are built from one query over the day's bookings
+joined to their slot and patient, ordered by doctor and grouped in Python.
+Each digest is cached under the doctor's booking stamp from
+integrations.feed_cache, which every booking and name change bumps, so the
+dashboard endpoint serves the same digest the nightly email was built from
+until the doctor's schedule actually changes.
+
+`manage.py send_doctor_digests` builds and caches tomorrow's digests and
+queues a DOCTOR_DAILY_DIGEST email for each doctor with appointments.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from itertools import groupby
+from operator import itemgetter
+import logging
+
+from accounts.directory import doctor_directory
+from integrations import feed_cache
+from integrations.outbox import enqueue_many, email_message
+from .models import Booking
+from .rows import full_name
+
+logger = logging.getLogger(__name__)
+
+DIGEST_ACTION = 'DOCTOR_DAILY_DIGEST'
+DIGEST_KEY = 'scheduling:digest:{}:{}:{}'
+
+DIGEST_VALUES = (
+    'doctor_id', 'doctor__email', 'doctor__first_name', 'doctor__last_name', 'doctor__username',
+    'id', 'slot__start_time', 'slot__end_time',
+    'patient_id', 'patient__first_name', 'patient__last_name', 'patient__username',
+    'notes',
+)
+
+doctor_of = itemgetter(0)
+
+
+def _key(doctor_id, day, stamp):
+    return DIGEST_KEY.format(doctor_id, day.isoformat(), stamp)
+
+
+def build_digests(day, doctor_ids=None):
+    """
+    Build digests with a single query.
+
+    Args:
+        day: Date of the schedule
+        doctor_ids: Only these doctors (default: every doctor with bookings that day)
+
+    Returns:
+        tuple: ({doctor_id: digest}, {doctor_id: email})
+    """
+    bookings = Booking.objects.filter(slot__date=day)
+    if doctor_ids is not None:
+        bookings = bookings.filter(doctor_id__in=doctor_ids)
+    rows = bookings.order_by('doctor_id', 'slot__start_time', 'id').values_list(*DIGEST_VALUES)
+
+    digests, emails = {}, {}
+    for doctor_id, group in groupby(rows.iterator(), key=doctor_of):
+        group = list(group)
+        first = group[0]
+        emails[doctor_id] = first[1]
+        digests[doctor_id] = {
+            'doctor': doctor_id,
+            'doctor_name': full_name(first[2], first[3], first[4]),
+            'date': day.isoformat(),
+            'count': len(group),
+            'appointments': [
+                {
+                    'booking': row[5],
+                    'start_time': row[6].isoformat(),
+                    'end_time': row[7].isoformat(),
+                    'patient': row[8],
+                    'patient_name': full_name(row[9], row[10], row[11]),
+                    'notes': row[12],
+                }
+                for row in group
+            ],
+        }
+    return digests, emails
+
+
+def empty_digest(doctor, day):
+    return {
+        'doctor': doctor.id,
+        'doctor_name': doctor.get_full_name() or doctor.username,
+        'date': day.isoformat(),
+        'count': 0,
+        'appointments': [],
+    }
+
+
+def get_digest(doctor, day):
+    """A doctor's digest for a day, from cache while their bookings are unchanged."""
+    # Read the stamp before the bookings, so a concurrent change cannot be
+    # cached under the new stamp
+    stamp = feed_cache.user_stamps([doctor.id])[doctor.id]
+    key = _key(doctor.id, day, stamp)
+
+    digest = cache.get(key)
+    if digest is None:
+        digests, _ = build_digests(day, [doctor.id])
+        digest = digests.get(doctor.id) or empty_digest(doctor, day)
+        cache.set(key, digest, getattr(settings, 'DOCTOR_DIGEST_CACHE_TTL', 60 * 60 * 36))
+    return digest
+
+
+def send_digests(day, dry_run=False):
+    """
+    Build, cache and queue the digest email for every doctor with bookings on `day`.
+
+    Returns:
+        dict: {'doctors': n, 'appointments': n}
+    """
+    # Stamps first, see get_digest(); the doctor ids come from the cached directory
+    stamps = feed_cache.user_stamps([doctor['id'] for doctor in doctor_directory.search()])
+    digests, emails = build_digests(day)
+
+    stats = {
+        'doctors': len(digests),
+        'appointments': sum(digest['count'] for digest in digests.values()),
+    }
+    if dry_run:
+        return stats
+
+    cache.set_many(
+        {
+            _key(doctor_id, day, stamps[doctor_id]): digest
+            for doctor_id, digest in digests.items()
+            if doctor_id in stamps
+        },
+        getattr(settings, 'DOCTOR_DIGEST_CACHE_TTL', 60 * 60 * 36)
+    )
+
+    messages = [
+        email_message(
+            action=DIGEST_ACTION,
+            recipient=emails[doctor_id],
+            data={
+                'doctor_name': digest['doctor_name'],
+                'date': digest['date'],
+                'appointments': [
+                    {
+                        'time': appointment['start_time'],
+                        'patient_name': appointment['patient_name'],
+                        'notes': appointment['notes'],
+                    }
+                    for appointment in digest['appointments']
+                ],
+            }
+        )
+        for doctor_id, digest in digests.items()
+        if emails[doctor_id]
+    ]
+    with transaction.atomic():
+        enqueue_many(messages)
+
+    logger.info(f"Doctor digests for {day}: {stats}, {len(messages)} email(s) queued")
+    return stats
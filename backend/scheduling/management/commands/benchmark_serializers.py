@@ -0,0 +1,105 @@
+"""
+Compare the lean list path (scheduling.rows) with the DRF serializers.
+
+Creates a doctor, a patient and N slots and bookings inside a transaction,
+checks that both paths render byte-identical JSON, prints rows per second
+for each, and rolls everything back.
+
+Usage:
+    python manage.py benchmark_serializers
+    python manage.py benchmark_serializers --rows 10000 --repeat 5
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from datetime import date, time, timedelta
+import time as clock
+
+from accounts.models import UserProfile
+from scheduling.models import AvailabilitySlot, Booking
+from scheduling.rows import SLOT_VALUES, BOOKING_VALUES, RowFormatter
+from scheduling.serializers import SlotSerializer, BookingSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark serializer vs. lean .values() rendering of slot and booking lists.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Slots and bookings to create.')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per path; the best is reported.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['rows'], options['repeat'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def run(self, rows, repeat):
+        doctor = User.objects.create(username='benchmark_doctor', first_name='Bench', last_name='Mark')
+        UserProfile.objects.create(user=doctor, role='DOCTOR', specialization='Benchmarks')
+        patient = User.objects.create(username='benchmark_patient')
+        UserProfile.objects.create(user=patient, role='PATIENT')
+
+        start = date.today() + timedelta(days=1)
+        per_day = 40  # 15-minute slots from 08:00
+        AvailabilitySlot.objects.bulk_create([
+            AvailabilitySlot(
+                doctor=doctor,
+                date=start + timedelta(days=i // per_day),
+                start_time=time(8 + i % per_day // 4, i % 4 * 15),
+                end_time=time(8 + i % per_day // 4, i % 4 * 15 + 14),
+                is_booked=True,
+            )
+            for i in range(rows)
+        ], batch_size=500)
+        slot_ids = list(AvailabilitySlot.objects.filter(doctor=doctor).values_list('id', flat=True))
+        Booking.objects.bulk_create([
+            Booking(patient=patient, doctor=doctor, slot_id=slot_id, notes='Benchmark')
+            for slot_id in slot_ids
+        ], batch_size=500)
+
+        slots = AvailabilitySlot.objects.filter(doctor=doctor).order_by('date', 'start_time', 'id')
+        bookings = Booking.objects.filter(patient=patient).order_by('slot__date', 'slot__start_time', 'id')
+        render = JSONRenderer().render
+
+        cases = [
+            ('slots', 
+             lambda: render(SlotSerializer(slots.select_related('doctor', 'doctor__profile'), many=True).data),
+             lambda: render(RowFormatter().slots(slots.values(*SLOT_VALUES)))),
+            ('bookings',
+             lambda: render(BookingSerializer(bookings.select_related(
+                 'patient', 'patient__profile', 'doctor', 'doctor__profile', 'slot'
+             ), many=True).data),
+             lambda: render(RowFormatter().bookings(bookings.values(*BOOKING_VALUES)))),
+        ]
+
+        for name, serializer_path, lean_path in cases:
+            serializer_best, serializer_output = self.measure(serializer_path, repeat)
+            lean_best, lean_output = self.measure(lean_path, repeat)
+            if serializer_output != lean_output:
+                raise CommandError(f"{name}: lean output differs from the serializer output")
+
+            self.stdout.write(
+                f"{name:9} {rows} rows, {len(lean_output)} bytes, identical output\n"
+                f"  serializer: {serializer_best * 1000:8.1f} ms  {rows / serializer_best:10.0f} rows/s\n"
+                f"  lean:       {lean_best * 1000:8.1f} ms  {rows / lean_best:10.0f} rows/s  "
+                f"({serializer_best / lean_best:.1f}x)"
+            )
+
+    @staticmethod
+    def measure(path, repeat):
+        best, output = None, None
+        for _ in range(repeat):
+            started = clock.perf_counter()
+            output = path()
+            elapsed = clock.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
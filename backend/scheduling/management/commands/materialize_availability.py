@@ -0,0 +1,40 @@
+"""
+Create real availability slots from recurring templates for the next few days.
+
+Slots further ahead stay virtual and are computed at query time. Run this
+daily (e.g. from cron) so the horizon keeps rolling forward.
+
+Usage:
+    python manage.py materialize_availability
+    python manage.py materialize_availability --days 21 --doctor dr_smith
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduling.templates import materialize
+
+
+class Command(BaseCommand):
+    help = 'Materialise availability template occurrences within the rolling horizon.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctor', help='Username of a single doctor.')
+        parser.add_argument('--days', type=int,
+                            default=getattr(settings, 'AVAILABILITY_TEMPLATE_HORIZON_DAYS', 14),
+                            help='Horizon in days (default: AVAILABILITY_TEMPLATE_HORIZON_DAYS).')
+
+    def handle(self, *args, **options):
+        doctor_ids = None
+        if options['doctor']:
+            try:
+                doctor_ids = [User.objects.get(username=options['doctor'], profile__role='DOCTOR').id]
+            except User.DoesNotExist:
+                raise CommandError(f"Doctor '{options['doctor']}' not found.")
+
+        stats = materialize(days=options['days'], doctor_ids=doctor_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {stats['created']} slot(s) for {stats['doctors']} doctor(s)."
+        ))
@@ -0,0 +1,39 @@
+"""
+Queue each doctor's daily schedule digest email.
+
+Builds the digests for every doctor with appointments on the day (default:
+tomorrow) with one query, caches them for the dashboard and queues one
+DOCTOR_DAILY_DIGEST email per doctor. Run nightly (e.g. from cron).
+
+Usage:
+    python manage.py send_doctor_digests
+    python manage.py send_doctor_digests --date 2025-01-06
+    python manage.py send_doctor_digests --dry-run
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from datetime import date, timedelta
+
+from scheduling.digest import send_digests
+
+
+class Command(BaseCommand):
+    help = "Queue doctors' daily schedule digest emails."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Schedule date, YYYY-MM-DD (default: tomorrow).')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be sent.')
+
+    def handle(self, *args, **options):
+        try:
+            day = date.fromisoformat(options['date']) if options['date'] else date.today() + timedelta(days=1)
+        except ValueError:
+            raise CommandError('Invalid date. Use YYYY-MM-DD.')
+
+        stats = send_digests(day, dry_run=options['dry_run'])
+
+        verb = 'Would queue' if options['dry_run'] else 'Queued'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} digests for {stats['doctors']} doctor(s), "
+            f"{stats['appointments']} appointment(s) on {day}."
+        ))
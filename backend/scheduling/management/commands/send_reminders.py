@@ -0,0 +1,42 @@
+"""
+Queue appointment reminder emails.
+
+Reminds each patient once about bookings starting within the window. Run it
+more often than the window is long (e.g. every 15 minutes from cron);
+bookings already reminded are skipped.
+
+Usage:
+    python manage.py send_reminders
+    python manage.py send_reminders --hours 48 --chunk-size 1000
+    python manage.py send_reminders --dry-run
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from scheduling.reminders import send_reminders
+
+
+class Command(BaseCommand):
+    help = 'Queue reminder emails for upcoming appointments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int,
+                            default=getattr(settings, 'REMINDER_WINDOW_HOURS', 24),
+                            help='Remind about appointments starting within this many hours '
+                                 '(default: REMINDER_WINDOW_HOURS).')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Bookings claimed per transaction (default: REMINDER_CHUNK_SIZE).')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be sent.')
+
+    def handle(self, *args, **options):
+        stats = send_reminders(
+            hours=options['hours'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+
+        verb = 'Would queue' if options['dry_run'] else 'Queued'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {stats['emails']} reminder email(s) for {stats['bookings']} booking(s)."
+        ))
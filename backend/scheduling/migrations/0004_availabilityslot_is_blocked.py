@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0003_booking_google_event_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='availabilityslot',
+            name='is_blocked',
+            field=models.BooleanField(default=False, help_text="Overlaps a busy event in the doctor's Google Calendar"),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('scheduling', '0004_availabilityslot_is_blocked'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.JSONField(default=list, help_text='Days of the week, 0=Monday ... 6=Sunday')),
+                ('start_time', models.TimeField(help_text='Start of the daily window')),
+                ('end_time', models.TimeField(help_text='End of the daily window; the last slot ends by this time')),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=30)),
+                ('interval_minutes', models.PositiveSmallIntegerField(blank=True, help_text='Minutes between slot starts (defaults to the slot length)', null=True)),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('exceptions', models.JSONField(blank=True, default=list, help_text='Dates (YYYY-MM-DD) on which the template does not apply')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(limit_choices_to={'profile__role': 'DOCTOR'}, on_delete=django.db.models.deletion.CASCADE, related_name='availability_templates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'availability_template',
+                'ordering': ['doctor', 'valid_from'],
+                'indexes': [models.Index(fields=['doctor', 'is_active'], name='availabilit_doctor__173eb2_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0005_availabilitytemplate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, help_text='When the appointment reminder was queued (see scheduling.reminders)', null=True),
+        ),
+    ]
@@ -1,6 +1,6 @@
 """
 Scheduling Models for HMS.
-Contains AvailabilitySlot and Booking models with proper constraints.
+Contains AvailabilitySlot, AvailabilityTemplate and Booking models with proper constraints.
 """
 
 from django.db import models
@@ -29,6 +29,10 @@ class AvailabilitySlot(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     is_booked = models.BooleanField(default=False, db_index=True)
+    is_blocked = models.BooleanField(
+        default=False,
+        help_text="Overlaps a busy event in the doctor's Google Calendar"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -75,6 +79,73 @@ class AvailabilitySlot(models.Model):
         return slot_datetime < datetime.now()
 
 
+class AvailabilityTemplate(models.Model):
+    """
+    A doctor's recurring weekly availability.
+    
+    Free slots are computed from templates at query time (see
+    scheduling.templates); an AvailabilitySlot row is only materialised when
+    a booking claims an occurrence or when it falls within the rolling
+    horizon maintained by the materialize_availability command.
+    """
+    
+    doctor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='availability_templates',
+        limit_choices_to={'profile__role': 'DOCTOR'}
+    )
+    weekdays = models.JSONField(
+        default=list,
+        help_text="Days of the week, 0=Monday ... 6=Sunday"
+    )
+    start_time = models.TimeField(help_text="Start of the daily window")
+    end_time = models.TimeField(help_text="End of the daily window; the last slot ends by this time")
+    slot_minutes = models.PositiveSmallIntegerField(default=30)
+    interval_minutes = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text="Minutes between slot starts (defaults to the slot length)"
+    )
+    valid_from = models.DateField()
+    valid_until = models.DateField(null=True, blank=True)
+    exceptions = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Dates (YYYY-MM-DD) on which the template does not apply"
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'availability_template'
+        ordering = ['doctor', 'valid_from']
+        indexes = [
+            models.Index(fields=['doctor', 'is_active']),
+        ]
+    
+    def __str__(self):
+        days = ','.join(str(d) for d in self.weekdays)
+        return f"{self.doctor.get_full_name()} - [{days}] {self.start_time}-{self.end_time}"
+    
+    def clean(self):
+        """Validate template data."""
+        if self.end_time <= self.start_time:
+            raise ValidationError({
+                'end_time': 'End time must be after start time.'
+            })
+        
+        if self.valid_until and self.valid_until < self.valid_from:
+            raise ValidationError({
+                'valid_until': 'Validity must end after it starts.'
+            })
+        
+        if not self.weekdays or any(d not in range(7) for d in self.weekdays):
+            raise ValidationError({
+                'weekdays': 'Use days of the week from 0 (Monday) to 6 (Sunday).'
+            })
+
+
 class Booking(models.Model):
     """
     Represents a confirmed appointment between a patient and doctor.
@@ -108,6 +179,11 @@ class Booking(models.Model):
         blank=True, 
         help_text="Google Calendar Event ID"
     )
+    reminder_sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the appointment reminder was queued (see scheduling.reminders)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -0,0 +1,119 @@
+"""
+Overlap detection for availability slots.
+
+A doctor cannot hold two slots whose times intersect. OverlapChecker loads
+the doctor's intervals for the affected days in one query and keeps, per
+day, the union of occupied time as disjoint intervals sorted by start. A
+new slot then only has to be compared with its predecessor, found by
+bisection, so checking is O(log n) per slot. Accepted slots are added to
+the same structure, which is how members of a bulk or recurrence batch are
+checked against each other.
+
+Intervals are half-open, so 09:00-09:30 and 09:30-10:00 do not overlap.
+
+The check and the insert that follows it must run in one transaction after
+lock_doctor(), otherwise a concurrent request for the same doctor can insert
+an overlapping slot in between.
+"""
+
+from bisect import bisect_left, bisect_right
+
+from accounts.models import UserProfile
+from .models import AvailabilitySlot
+
+
+def seconds_of(tm):
+    return tm.hour * 3600 + tm.minute * 60 + tm.second
+
+
+def _format(seconds):
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+
+def lock_doctor(doctor):
+    """
+    Serialise slot creation for a doctor until the current transaction ends
+    by locking the doctor's profile row. SQLite has no row locks, but lets
+    only one transaction write at a time.
+    """
+    list(UserProfile.objects.select_for_update().filter(user_id=doctor.id).values_list('id', flat=True))
+
+
+class DaySchedule:
+    """Occupied time on one day as disjoint [start, end) intervals in seconds."""
+
+    __slots__ = ('starts', 'ends')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def conflict(self, start, end):
+        """Return the occupied (start, end) that [start, end) intersects, or None."""
+        # Blocks are disjoint and sorted, so only the last block starting
+        # before `end` can reach past `start`
+        i = bisect_left(self.starts, end) - 1
+        if i >= 0 and self.ends[i] > start:
+            return self.starts[i], self.ends[i]
+        return None
+
+    def add(self, start, end):
+        """Add [start, end), merging with any blocks it touches."""
+        lo = bisect_left(self.ends, start)
+        hi = bisect_right(self.starts, end)
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+
+class OverlapChecker:
+    """
+    Check new slots for one doctor against existing slots and each other.
+
+    Usage:
+        checker = OverlapChecker(doctor, first_day, last_day)
+        problem = checker.claim(day, start_time, end_time)
+    """
+
+    def __init__(self, doctor, first_day, last_day=None):
+        self.days = {}
+        # start times already taken, to keep the "Already exists" message
+        self.taken = set()
+
+        rows = AvailabilitySlot.objects.filter(
+            doctor=doctor,
+            date__range=(first_day, last_day or first_day),
+        ).values_list('date', 'start_time', 'end_time')
+
+        for day, start_time, end_time in rows:
+            self.taken.add((day, start_time))
+            self._day(day).add(seconds_of(start_time), seconds_of(end_time))
+
+    def _day(self, day):
+        schedule = self.days.get(day)
+        if schedule is None:
+            schedule = self.days[day] = DaySchedule()
+        return schedule
+
+    def check(self, day, start_time, end_time):
+        """Return why the slot would overlap, or None."""
+        if (day, start_time) in self.taken:
+            return f"Already exists at {start_time}"
+
+        schedule = self.days.get(day)
+        if schedule is None:
+            return None
+        hit = schedule.conflict(seconds_of(start_time), seconds_of(end_time))
+        if hit is not None:
+            return f"Overlaps other slots between {_format(hit[0])} and {_format(hit[1])}"
+        return None
+
+    def claim(self, day, start_time, end_time):
+        """check(), then reserve the time if it is free."""
+        problem = self.check(day, start_time, end_time)
+        if problem is None:
+            self.taken.add((day, start_time))
+            self._day(day).add(seconds_of(start_time), seconds_of(end_time))
+        return problem
@@ -0,0 +1,116 @@
+"""
+Keyset (cursor) pagination for slot and booking listings.
+
+Rows are ordered by (date, start_time, id) and a page is "the next N rows
+after the last key of the previous page", so each page is an index range
+scan whose cost does not grow with the table, and rows created or booked
+between requests cannot shift or repeat pages the way OFFSET can.
+
+The response body stays a plain list, as before. The cursor for the next
+page is returned in the `X-Next-Cursor` header and as a `Link: <...>;
+rel="next"` header; clients pass it back as `?cursor=`. Page size is
+`?page_size=` (default LIST_PAGE_SIZE, at most LIST_MAX_PAGE_SIZE).
+
+Virtual slots from availability templates have string ids; they sort after
+real slots with the same date and start time.
+"""
+
+from django.conf import settings
+from django.db.models import Q
+from datetime import date, time
+from itertools import islice
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def sort_key(slot_date, start_time, slot_id):
+    """Total order over real (int id) and virtual (str id) rows."""
+    return (slot_date, start_time, isinstance(slot_id, str), slot_id)
+
+
+def slot_key(slot):
+    return sort_key(slot.date, slot.start_time, slot.id)
+
+
+def encode_cursor(key):
+    slot_date, start_time, _, slot_id = key
+    raw = json.dumps([slot_date.isoformat(), start_time.isoformat(), slot_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the sort key encoded in a cursor. Raises InvalidCursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        slot_date, start_time, slot_id = json.loads(raw)
+        if not isinstance(slot_id, (int, str)):
+            raise TypeError(slot_id)
+        return sort_key(date.fromisoformat(slot_date), time.fromisoformat(start_time), slot_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def after(key, prefix=''):
+    """
+    Filter for rows strictly after a sort key.
+
+    Args:
+        key: Sort key from decode_cursor
+        prefix: Lookup prefix for the date/start_time fields (e.g. 'slot__')
+    """
+    slot_date, start_time, virtual, slot_id = key
+    later = (
+        Q(**{f'{prefix}date__gt': slot_date}) |
+        Q(**{f'{prefix}date': slot_date, f'{prefix}start_time__gt': start_time})
+    )
+    if virtual:
+        # Real rows at the same time sort before a virtual one
+        return later
+    return later | Q(**{f'{prefix}date': slot_date, f'{prefix}start_time': start_time, 'id__gt': slot_id})
+
+
+class KeysetPaginator:
+    """Reads ?cursor= and ?page_size= and writes the next-page headers."""
+
+    def __init__(self, request):
+        self.request = request
+        max_size = getattr(settings, 'LIST_MAX_PAGE_SIZE', 1000)
+        try:
+            size = int(request.query_params.get('page_size', getattr(settings, 'LIST_PAGE_SIZE', 500)))
+        except ValueError:
+            raise InvalidCursor('page_size must be a number.')
+        self.page_size = min(max(size, 1), max_size)
+
+        cursor = request.query_params.get('cursor')
+        self.key = decode_cursor(cursor) if cursor else None
+        self.next_key = None
+
+    @property
+    def limit(self):
+        """Rows to fetch: one more than a page, to know if there is a next page."""
+        return self.page_size + 1
+
+    def page(self, rows, key):
+        """
+        Cut the page from an iterable of rows ordered by `key` and already
+        filtered to start after self.key.
+        """
+        rows = list(islice(rows, self.limit))
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_key = key(rows[-1])
+        return rows
+
+    def add_headers(self, response):
+        if self.next_key is not None:
+            cursor = encode_cursor(self.next_key)
+            query = self.request.query_params.copy()
+            query['cursor'] = cursor
+            url = self.request.build_absolute_uri(f"{self.request.path}?{query.urlencode()}")
+            response['X-Next-Cursor'] = cursor
+            response['Link'] = f'<{url}>; rel="next"'
+        return response
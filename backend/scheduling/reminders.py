@@ -0,0 +1,151 @@
+"""
+Appointment reminders.
+
+`manage.py send_reminders` (run from cron, e.g. every 15 minutes) finds
+bookings whose slot starts within the next REMINDER_WINDOW_HOURS and that
+have not been reminded yet, and queues one APPOINTMENT_REMINDER email per
+patient listing those appointments. The emails go through the outbox, so
+the email worker sends them to the email service in BATCH requests.
+
+Bookings are streamed with .iterator(), ordered by patient, and handled in
+chunks of about REMINDER_CHUNK_SIZE bookings, so memory does not grow with
+the number of bookings. Each chunk is claimed by stamping reminder_sent_at
+with a conditional UPDATE, in the same transaction that queues its emails:
+re-runs and overlapping runs never remind a booking twice, and a run that
+fails part way leaves the rest for the next one.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta, timezone as dt_timezone
+from itertools import groupby
+from operator import itemgetter
+import logging
+
+from integrations.outbox import enqueue_many, email_message
+from .models import Booking
+from .rows import full_name
+
+logger = logging.getLogger(__name__)
+
+REMINDER_ACTION = 'APPOINTMENT_REMINDER'
+
+REMINDER_VALUES = (
+    'id', 'patient_id', 'patient__email',
+    'patient__first_name', 'patient__last_name', 'patient__username',
+    'doctor__first_name', 'doctor__last_name', 'doctor__username',
+    'doctor__profile__specialization',
+    'slot__date', 'slot__start_time',
+)
+
+patient_of = itemgetter(1)
+
+
+def starts_between(start, end):
+    """Filter for bookings whose slot starts after `start` and no later than `end` (UTC)."""
+    first, last = start.date(), end.date()
+    if first == last:
+        return Q(slot__date=first, slot__start_time__gt=start.time(), slot__start_time__lte=end.time())
+    return (
+        Q(slot__date=first, slot__start_time__gt=start.time()) |
+        Q(slot__date__gt=first, slot__date__lt=last) |
+        Q(slot__date=last, slot__start_time__lte=end.time())
+    )
+
+
+def due(now=None, hours=None):
+    """Bookings to remind now, as REMINDER_VALUES rows ordered by patient."""
+    now = now or timezone.now()
+    hours = hours or getattr(settings, 'REMINDER_WINDOW_HOURS', 24)
+    # Slot dates and times are UTC
+    start = now.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    end = start + timedelta(hours=hours)
+
+    return Booking.objects.filter(
+        starts_between(start, end),
+        reminder_sent_at__isnull=True,
+    ).exclude(
+        patient__email=''
+    ).order_by(
+        'patient_id', 'slot__date', 'slot__start_time', 'id'
+    ).values_list(*REMINDER_VALUES)
+
+
+def reminder_message(rows):
+    """Outbox entry for one patient's reminder, from that patient's rows."""
+    first = rows[0]
+    return email_message(
+        action=REMINDER_ACTION,
+        recipient=first[2],
+        data={
+            'patient_name': full_name(first[3], first[4], first[5]),
+            'appointments': [
+                {
+                    'doctor': full_name(row[6], row[7], row[8]),
+                    'specialization': row[9],
+                    'date': str(row[10]),
+                    'time': str(row[11]),
+                }
+                for row in rows
+            ],
+        }
+    )
+
+
+def _queue(rows):
+    """Claim a chunk of rows and queue their reminders. Returns (bookings, emails) queued."""
+    ids = [row[0] for row in rows]
+    stamp = timezone.now()
+
+    with transaction.atomic():
+        Booking.objects.filter(id__in=ids, reminder_sent_at__isnull=True).update(reminder_sent_at=stamp)
+        # Another run may have claimed some of them first
+        claimed = set(Booking.objects.filter(id__in=ids, reminder_sent_at=stamp).values_list('id', flat=True))
+
+        claimed_rows = [row for row in rows if row[0] in claimed]
+        messages = [reminder_message(list(group)) for _, group in groupby(claimed_rows, key=patient_of)]
+        enqueue_many(messages)
+
+    return len(claimed), len(messages)
+
+
+def send_reminders(now=None, hours=None, chunk_size=None, dry_run=False):
+    """
+    Queue reminders for bookings starting within the next `hours`.
+
+    Args:
+        now: Current time (default: timezone.now())
+        hours: Reminder window (default: REMINDER_WINDOW_HOURS)
+        chunk_size: Bookings claimed per transaction (default: REMINDER_CHUNK_SIZE)
+        dry_run: Count without claiming or queueing anything
+
+    Returns:
+        dict: {'bookings': n, 'emails': n}
+    """
+    chunk_size = chunk_size or getattr(settings, 'REMINDER_CHUNK_SIZE', 500)
+    rows = due(now, hours).iterator(chunk_size=chunk_size)
+
+    stats = {'bookings': 0, 'emails': 0}
+    chunk = []
+
+    def flush():
+        if dry_run:
+            bookings, emails = len(chunk), len({patient_of(row) for row in chunk})
+        else:
+            bookings, emails = _queue(chunk)
+        stats['bookings'] += bookings
+        stats['emails'] += emails
+        chunk.clear()
+
+    # Chunks end on a patient boundary, so each patient gets one email
+    for _, group in groupby(rows, key=patient_of):
+        chunk.extend(group)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    logger.info(f"Appointment reminders{' (dry run)' if dry_run else ''}: {stats}")
+    return stats
@@ -0,0 +1,145 @@
+"""
+Lean read path for slot and booking lists.
+
+List endpoints fetch plain `.values()` rows instead of model instances and
+format them here instead of going through SlotSerializer/BookingSerializer.
+The output is byte-for-byte what the serializers produce (same keys, key
+order and value formats); only the per-row work is smaller:
+    - names come from joined columns instead of related instances,
+    - "now" is read once per request for is_past/is_upcoming,
+    - duration_minutes is memoised per (start_time, end_time) pair.
+
+`manage.py benchmark_serializers` checks the equivalence and measures both
+paths. When adding a field to SlotSerializer or BookingSerializer, add it
+here too.
+"""
+
+from django.utils import timezone
+from datetime import datetime
+
+from .pagination import sort_key
+
+SLOT_VALUES = (
+    'id', 'doctor_id', 'doctor__first_name', 'doctor__last_name', 'doctor__username',
+    'date', 'start_time', 'end_time', 'is_booked', 'is_blocked', 'created_at',
+)
+
+BOOKING_VALUES = (
+    'id',
+    'patient_id', 'patient__first_name', 'patient__last_name', 'patient__username',
+    'doctor_id', 'doctor__first_name', 'doctor__last_name', 'doctor__username',
+    'slot__id', 'slot__doctor_id', 'slot__doctor__first_name', 'slot__doctor__last_name',
+    'slot__doctor__username', 'slot__date', 'slot__start_time', 'slot__end_time',
+    'slot__is_booked', 'slot__is_blocked', 'slot__created_at',
+    'notes', 'created_at',
+)
+
+
+def full_name(first_name, last_name, username):
+    """User.get_full_name() or username, from columns."""
+    return f"{first_name} {last_name}".strip() or username
+
+
+def slot_row(slot):
+    """SLOT_VALUES-shaped row for a slot instance (e.g. a virtual template slot)."""
+    return {
+        'id': slot.id,
+        'doctor_id': slot.doctor_id,
+        'doctor__first_name': slot.doctor.first_name,
+        'doctor__last_name': slot.doctor.last_name,
+        'doctor__username': slot.doctor.username,
+        'date': slot.date,
+        'start_time': slot.start_time,
+        'end_time': slot.end_time,
+        'is_booked': slot.is_booked,
+        'is_blocked': slot.is_blocked,
+        'created_at': slot.created_at,
+    }
+
+
+def slot_row_key(row):
+    return sort_key(row['date'], row['start_time'], row['id'])
+
+
+def booking_row_key(row):
+    return sort_key(row['slot__date'], row['slot__start_time'], row['id'])
+
+
+class RowFormatter:
+    """Formats rows for one request."""
+
+    def __init__(self):
+        now = datetime.now()
+        self.today, self.time_now = now.date(), now.time()
+        self.tz = timezone.get_current_timezone()
+        self._durations = {}
+
+    def datetime(self, value):
+        # Same as serializers.DateTimeField with the ISO 8601 format
+        value = value.astimezone(self.tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    def duration(self, day, start_time, end_time):
+        key = (start_time, end_time)
+        minutes = self._durations.get(key)
+        if minutes is None:
+            start = datetime.combine(day, start_time)
+            end = datetime.combine(day, end_time)
+            minutes = self._durations[key] = int((end - start).total_seconds() / 60)
+        return minutes
+
+    def is_past(self, day, start_time):
+        return day < self.today or (day == self.today and start_time < self.time_now)
+
+    def slot(self, row, prefix='', doctor_prefix='doctor'):
+        """Format a slot row; prefix/doctor_prefix select joined columns."""
+        day = row[prefix + 'date']
+        start_time = row[prefix + 'start_time']
+        end_time = row[prefix + 'end_time']
+        return {
+            'id': row[prefix + 'id'],
+            'doctor': row[prefix + 'doctor_id'],
+            'doctor_name': full_name(
+                row[f'{doctor_prefix}__first_name'],
+                row[f'{doctor_prefix}__last_name'],
+                row[f'{doctor_prefix}__username'],
+            ),
+            'date': day.isoformat(),
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat(),
+            'is_booked': row[prefix + 'is_booked'],
+            'is_blocked': row[prefix + 'is_blocked'],
+            'duration_minutes': self.duration(day, start_time, end_time),
+            'is_past': self.is_past(day, start_time),
+            'created_at': self.datetime(row[prefix + 'created_at']),
+        }
+
+    def slots(self, rows):
+        return [self.slot(row) for row in rows]
+
+    def booking(self, row):
+        day = row['slot__date']
+        start_time = row['slot__start_time']
+        return {
+            'id': row['id'],
+            'patient': row['patient_id'],
+            'patient_name': full_name(
+                row['patient__first_name'], row['patient__last_name'], row['patient__username']
+            ),
+            'doctor': row['doctor_id'],
+            'doctor_name': full_name(
+                row['doctor__first_name'], row['doctor__last_name'], row['doctor__username']
+            ),
+            'slot': row['slot__id'],
+            'slot_details': self.slot(row, prefix='slot__', doctor_prefix='slot__doctor'),
+            'notes': row['notes'],
+            'appointment_date': day.isoformat(),
+            'appointment_time': start_time.isoformat(),
+            'is_upcoming': not self.is_past(day, start_time),
+            'created_at': self.datetime(row['created_at']),
+        }
+
+    def bookings(self, rows):
+        return [self.booking(row) for row in rows]
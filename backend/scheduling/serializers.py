@@ -4,13 +4,16 @@ Serializers for scheduling app.
 
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import AvailabilitySlot, Booking
+from .models import AvailabilitySlot, AvailabilityTemplate, Booking
+from .templates import parse_virtual_id
 from datetime import date, datetime
 
 
 class SlotSerializer(serializers.ModelSerializer):
     """Serializer for AvailabilitySlot model."""
     
+    # Virtual slots from availability templates have string ids ("tpl-...")
+    id = serializers.ReadOnlyField()
     doctor_name = serializers.SerializerMethodField()
     duration_minutes = serializers.ReadOnlyField()
     is_past = serializers.ReadOnlyField()
@@ -19,9 +22,9 @@ class SlotSerializer(serializers.ModelSerializer):
         model = AvailabilitySlot
         fields = [
             'id', 'doctor', 'doctor_name', 'date', 'start_time', 
-            'end_time', 'is_booked', 'duration_minutes', 'is_past', 'created_at'
+            'end_time', 'is_booked', 'is_blocked', 'duration_minutes', 'is_past', 'created_at'
         ]
-        read_only_fields = ['id', 'doctor', 'is_booked', 'created_at']
+        read_only_fields = ['id', 'doctor', 'is_booked', 'is_blocked', 'created_at']
     
     def get_doctor_name(self, obj):
         return obj.doctor.get_full_name() or obj.doctor.username
@@ -63,15 +66,51 @@ class SlotCreateSerializer(serializers.Serializer):
         return attrs
 
 
+class RecurrenceSerializer(serializers.Serializer):
+    """Weekly rule, e.g. Mon-Fri 09:00-17:00 every 20 minutes for 12 weeks."""
+    
+    start_date = serializers.DateField(required=False)
+    weeks = serializers.IntegerField(min_value=1, max_value=52)
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6),  # 0=Monday
+        min_length=1,
+        max_length=7
+    )
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    slot_minutes = serializers.IntegerField(min_value=15, max_value=240)
+    interval_minutes = serializers.IntegerField(min_value=5, max_value=240, required=False)
+    
+    def validate_start_date(self, value):
+        if value < date.today():
+            raise serializers.ValidationError("Cannot create slots in the past.")
+        return value
+    
+    def validate(self, attrs):
+        attrs.setdefault('start_date', date.today())
+        if attrs['end_time'] <= attrs['start_time']:
+            raise serializers.ValidationError({
+                'end_time': 'End time must be after start time.'
+            })
+        return attrs
+
+
 class BulkSlotCreateSerializer(serializers.Serializer):
-    """Serializer for creating multiple slots at once."""
+    """
+    Serializer for creating multiple slots at once.
     
-    date = serializers.DateField()
+    Either `date` + `slots` (explicit start/end times on one day) or
+    `recurrence` (see RecurrenceSerializer).
+    """
+    
+    date = serializers.DateField(required=False)
     slots = serializers.ListField(
         child=serializers.DictField(),
         min_length=1,
-        max_length=20
+        max_length=200,
+        required=False
     )
+    recurrence = RecurrenceSerializer(required=False)
     
     def validate_date(self, value):
         if value < date.today():
@@ -85,6 +124,59 @@ class BulkSlotCreateSerializer(serializers.Serializer):
                     f"Slot {i+1} must have start_time and end_time."
                 )
         return value
+    
+    def validate(self, attrs):
+        if 'recurrence' in attrs:
+            if 'slots' in attrs:
+                raise serializers.ValidationError("Provide either slots or recurrence, not both.")
+        elif 'date' not in attrs or 'slots' not in attrs:
+            raise serializers.ValidationError("Provide date and slots, or a recurrence rule.")
+        return attrs
+
+
+class AvailabilityTemplateSerializer(serializers.ModelSerializer):
+    """Serializer for AvailabilityTemplate model."""
+    
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6),  # 0=Monday
+        min_length=1,
+        max_length=7
+    )
+    exceptions = serializers.ListField(child=serializers.DateField(), required=False)
+    slot_minutes = serializers.IntegerField(min_value=15, max_value=240)
+    interval_minutes = serializers.IntegerField(min_value=5, max_value=240, required=False, allow_null=True)
+    
+    class Meta:
+        model = AvailabilityTemplate
+        fields = [
+            'id', 'doctor', 'weekdays', 'start_time', 'end_time', 'slot_minutes',
+            'interval_minutes', 'valid_from', 'valid_until', 'exceptions', 'is_active', 'created_at'
+        ]
+        read_only_fields = ['id', 'doctor', 'created_at']
+    
+    def validate_weekdays(self, value):
+        return sorted(set(value))
+    
+    def validate_exceptions(self, value):
+        # Stored as ISO strings so occurrences can be skipped with a set lookup
+        return sorted({day.isoformat() for day in value})
+    
+    def validate(self, attrs):
+        start_time = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if start_time and end_time and end_time <= start_time:
+            raise serializers.ValidationError({
+                'end_time': 'End time must be after start time.'
+            })
+        
+        valid_from = attrs.get('valid_from', getattr(self.instance, 'valid_from', None))
+        valid_until = attrs.get('valid_until', getattr(self.instance, 'valid_until', None))
+        if valid_from and valid_until and valid_until < valid_from:
+            raise serializers.ValidationError({
+                'valid_until': 'Validity must end after it starts.'
+            })
+        
+        return attrs
 
 
 class BookingSerializer(serializers.ModelSerializer):
@@ -116,22 +208,18 @@ class BookingSerializer(serializers.ModelSerializer):
 class BookingCreateSerializer(serializers.Serializer):
     """Serializer for creating a booking."""
     
-    slot_id = serializers.IntegerField()
+    # An AvailabilitySlot id, or a virtual template slot id ("tpl-...")
+    slot_id = serializers.CharField(max_length=64)
     notes = serializers.CharField(required=False, allow_blank=True, max_length=500)
     
     def validate_slot_id(self, value):
-        try:
-            slot = AvailabilitySlot.objects.get(id=value)
-        except AvailabilitySlot.DoesNotExist:
-            raise serializers.ValidationError("Slot not found.")
-        
-        if slot.is_booked:
-            raise serializers.ValidationError("This slot is already booked.")
-        
-        if slot.is_past:
-            raise serializers.ValidationError("Cannot book a slot in the past.")
-        
-        return value
+        # Existence, availability and past-ness are checked by the booking
+        # engine's conditional UPDATE, so no read is needed here.
+        if value.isdigit() and int(value) > 0:
+            return int(value)
+        if parse_virtual_id(value):
+            return value
+        raise serializers.ValidationError("Slot not found.")
 
 
 class DoctorSlotsSerializer(serializers.Serializer):
@@ -0,0 +1,56 @@
+"""
+Custom signals for the scheduling app.
+
+Model signals (post_save/post_delete) do not fire for queryset.update() or
+bulk_create(), so code paths that change slots in bulk send slots_changed
+explicitly.
+"""
+
+from django.dispatch import Signal
+
+# Sent after slots were created, booked, blocked or deleted in bulk.
+# Arguments: doctor_ids (iterable of doctor user ids),
+#            slot_ids (optional iterable of the slot ids that changed)
+slots_changed = Signal()
+
+
+# ==================== RECEIVERS ====================
+# Keep the availability index in step with the database. Updates are applied
+# on commit so a rolled-back transaction never reaches the index.
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import UserProfile
+from .availability_index import availability_index
+from .models import AvailabilitySlot, Booking
+
+
+@receiver(post_save, sender=AvailabilitySlot)
+def index_slot(sender, instance, **kwargs):
+    transaction.on_commit(lambda: availability_index.add_slots([instance]))
+
+
+@receiver(post_delete, sender=AvailabilitySlot)
+def unindex_slot(sender, instance, **kwargs):
+    transaction.on_commit(lambda: availability_index.remove_slots([instance]))
+
+
+@receiver(post_save, sender=Booking)
+def index_booking(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: availability_index.set_available(instance.slot_id, False, instance.doctor_id))
+
+
+@receiver(slots_changed)
+def reindex_doctors(sender, doctor_ids, **kwargs):
+    transaction.on_commit(lambda: availability_index.refresh_doctors(doctor_ids))
+
+
+@receiver(post_save, sender=UserProfile)
+def index_specialization(sender, instance, **kwargs):
+    if instance.is_doctor:
+        transaction.on_commit(
+            lambda: availability_index.set_specialization(instance.user_id, instance.specialization)
+        )
@@ -0,0 +1,320 @@
+"""
+Lazy availability from recurring templates.
+
+An AvailabilityTemplate describes a weekly pattern; its occurrences are
+computed at query time and returned as unsaved AvailabilitySlot instances
+whose id is a string like "tpl-12-20250106-0900". An occurrence is hidden
+when it overlaps one of the doctor's concrete slots (including the one it
+was materialised as) or a busy event from the doctor's Google Calendar.
+
+Concrete rows are created only:
+    - when a booking claims an occurrence (materialize_occurrence), or
+    - within the rolling horizon kept by `manage.py materialize_availability`
+      (materialize), so the index, the iCal feed and Google blocking see them.
+
+Editing or deleting a template does not touch slots already materialised.
+"""
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from collections import defaultdict
+import logging
+import re
+
+from .models import AvailabilitySlot, AvailabilityTemplate
+from .overlap import DaySchedule, seconds_of
+from .bulk import create_slots, expand_recurrence
+
+logger = logging.getLogger(__name__)
+
+VIRTUAL_ID = re.compile(r'^tpl-(\d+)-(\d{8})-(\d{4})$')
+DAY_SECONDS = 24 * 60 * 60
+VIRTUAL_WINDOW_DAYS = 7  # First window expanded by iter_virtual_slots()
+
+
+def virtual_id(template_id, day, start_time):
+    return f"tpl-{template_id}-{day:%Y%m%d}-{start_time:%H%M}"
+
+
+def parse_virtual_id(value):
+    """Return (template_id, date, start_time) for a virtual slot id, or None."""
+    match = VIRTUAL_ID.match(str(value))
+    if not match:
+        return None
+    try:
+        day = datetime.strptime(match.group(2), '%Y%m%d').date()
+        start_time = datetime.strptime(match.group(3), '%H%M').time()
+    except ValueError:
+        return None
+    return int(match.group(1)), day, start_time
+
+
+def lookahead_end(date_from):
+    """Default last day for lazy listing when the caller gives no date_to."""
+    return date_from + timedelta(days=getattr(settings, 'AVAILABILITY_TEMPLATE_LOOKAHEAD_DAYS', 90))
+
+
+def occurrences(template, date_from, date_to):
+    """Yield (date, start_time, end_time) for a template within [date_from, date_to]."""
+    first = max(template.valid_from, date_from)
+    last = min(template.valid_until, date_to) if template.valid_until else date_to
+    if last < first:
+        return
+
+    exceptions = set(template.exceptions or [])
+    weeks = (last - first).days // 7 + 1
+    for _, day, start_time, end_time in expand_recurrence(
+        start_date=first,
+        weeks=weeks,
+        weekdays=template.weekdays,
+        start_time=template.start_time,
+        end_time=template.end_time,
+        slot_minutes=template.slot_minutes,
+        interval_minutes=template.interval_minutes,
+    ):
+        if day > last:
+            break
+        if day.isoformat() not in exceptions:
+            yield day, start_time, end_time
+
+
+def _active_templates(date_from, date_to, doctor_ids=None):
+    templates = AvailabilityTemplate.objects.filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gte=date_from),
+        is_active=True,
+        valid_from__lte=date_to,
+    )
+    if doctor_ids is not None:
+        templates = templates.filter(doctor_id__in=doctor_ids)
+    return templates
+
+
+class Occupancy:
+    """
+    Per (doctor_id, date), the time taken by concrete slots and Google busy
+    events, as DaySchedules.
+
+    The two queries are ordered by time and read as they are needed:
+    through(day) fills the schedules up to `day`, so a caller that walks the
+    window in order and stops early only reads the rows it walked past.
+    """
+
+    def __init__(self, doctor_ids, date_from, date_to, include_slots=True):
+        from integrations.models import GoogleBusyEvent
+
+        self.date_from, self.date_to = date_from, date_to
+        self.schedules = defaultdict(DaySchedule)
+
+        if include_slots:
+            self._slots = AvailabilitySlot.objects.filter(
+                doctor_id__in=doctor_ids,
+                date__range=(date_from, date_to),
+            ).order_by('date').values_list('doctor_id', 'date', 'start_time', 'end_time').iterator()
+        else:
+            self._slots = iter(())
+
+        # Slot times are UTC (see ics.format_dt), busy events are aware datetimes
+        self._busy = GoogleBusyEvent.objects.filter(
+            doctor_id__in=doctor_ids,
+            start__lt=datetime.combine(date_to + timedelta(days=1), time.min, dt_timezone.utc),
+            end__gt=datetime.combine(date_from, time.min, dt_timezone.utc),
+        ).order_by('start').values_list('doctor_id', 'start', 'end').iterator()
+
+        self._next_slot = self._next_busy = None
+        self._started = False
+
+    def through(self, last_day):
+        """The schedules, complete for every day up to `last_day`."""
+        if not self._started:
+            self._next_slot = next(self._slots, None)
+            self._next_busy = next(self._busy, None)
+            self._started = True
+
+        while self._next_slot is not None and self._next_slot[1] <= last_day:
+            doctor_id, day, start_time, end_time = self._next_slot
+            self.schedules[doctor_id, day].add(seconds_of(start_time), seconds_of(end_time))
+            self._next_slot = next(self._slots, None)
+
+        # Every event that starts before the end of last_day
+        until = datetime.combine(last_day + timedelta(days=1), time.min, dt_timezone.utc)
+        while self._next_busy is not None and self._next_busy[1] < until:
+            self._add_busy(*self._next_busy)
+            self._next_busy = next(self._busy, None)
+
+        return self.schedules
+
+    def _add_busy(self, doctor_id, start, end):
+        start, end = start.astimezone(dt_timezone.utc), end.astimezone(dt_timezone.utc)
+        day = max(start.date(), self.date_from)
+        while day <= min(end.date(), self.date_to):
+            day_start = datetime.combine(day, time.min, dt_timezone.utc)
+            self.schedules[doctor_id, day].add(
+                max(0, int((start - day_start).total_seconds())),
+                min(DAY_SECONDS, int((end - day_start).total_seconds())),
+            )
+            day += timedelta(days=1)
+
+
+def occupied(doctor_ids, date_from, date_to, include_slots=True):
+    """Occupancy over the whole window, as {(doctor_id, date): DaySchedule}. Two queries."""
+    return Occupancy(doctor_ids, date_from, date_to, include_slots).through(date_to)
+
+
+def _expand(templates, date_from, date_to, schedules):
+    """Free occurrences of `templates` within [date_from, date_to], sorted."""
+    now = datetime.now()
+    slots = []
+    for template in templates:
+        for day, start_time, end_time in occurrences(template, date_from, date_to):
+            if datetime.combine(day, start_time) < now:
+                continue
+            schedule = schedules.get((template.doctor_id, day))
+            if schedule and schedule.conflict(seconds_of(start_time), seconds_of(end_time)):
+                continue
+            slots.append(AvailabilitySlot(
+                id=virtual_id(template.id, day, start_time),
+                doctor=template.doctor,
+                date=day,
+                start_time=start_time,
+                end_time=end_time,
+                created_at=template.created_at,
+            ))
+
+    slots.sort(key=lambda slot: (slot.date, slot.start_time, slot.id))
+    return slots
+
+
+def virtual_slots(date_from, date_to, doctor_ids=None):
+    """
+    Free, not yet materialised template occurrences, ordered by date and time.
+
+    Args:
+        date_from, date_to: Date window (inclusive)
+        doctor_ids: Only these doctors (default: all)
+
+    Returns:
+        list of unsaved AvailabilitySlot with string ids and doctor loaded
+    """
+    templates = list(_active_templates(date_from, date_to, doctor_ids).select_related('doctor'))
+    if not templates:
+        return []
+    return _expand(templates, date_from, date_to, occupied({t.doctor_id for t in templates}, date_from, date_to))
+
+
+def iter_virtual_slots(date_from, date_to, doctor_ids=None):
+    """
+    Like virtual_slots(), but lazy: occurrences are expanded a window of days
+    at a time (VIRTUAL_WINDOW_DAYS, doubling each time) and occupancy is read
+    only as far as the windows reach, so a caller that stops after one page
+    pays for the days that page covers. Three queries.
+    """
+    templates = list(_active_templates(date_from, date_to, doctor_ids).select_related('doctor'))
+    if not templates:
+        return
+
+    occupancy = Occupancy({t.doctor_id for t in templates}, date_from, date_to)
+    window = VIRTUAL_WINDOW_DAYS
+    day = date_from
+    while templates and day <= date_to:
+        last = min(day + timedelta(days=window - 1), date_to)
+        active = [
+            template for template in templates
+            if template.valid_from <= last and (template.valid_until is None or template.valid_until >= day)
+        ]
+        if active:
+            yield from _expand(active, day, last, occupancy.through(last))
+        templates = [
+            template for template in templates
+            if template.valid_until is None or template.valid_until > last
+        ]
+        day = last + timedelta(days=1)
+        window *= 2
+
+
+def materialize_occurrence(slot_id):
+    """
+    Create (or find) the concrete slot for a virtual slot id.
+
+    Returns:
+        int: AvailabilitySlot id, or None if slot_id is not a current occurrence
+    """
+    parsed = parse_virtual_id(slot_id)
+    if parsed is None:
+        return None
+    template_id, day, start_time = parsed
+
+    template = _active_templates(day, day).filter(id=template_id).first()
+    if template is None:
+        return None
+    end_time = next((end for d, start, end in occurrences(template, day, day) if start == start_time), None)
+    if end_time is None:
+        return None
+
+    existing = AvailabilitySlot.objects.filter(
+        doctor_id=template.doctor_id, date=day
+    ).values_list('id', 'start_time', 'end_time')
+    schedule = DaySchedule()
+    for concrete_id, concrete_start, concrete_end in existing:
+        if concrete_start == start_time:
+            # Already materialised; the booking engine decides if it is free
+            return concrete_id if concrete_end == end_time else None
+        schedule.add(seconds_of(concrete_start), seconds_of(concrete_end))
+    if schedule.conflict(seconds_of(start_time), seconds_of(end_time)):
+        return None
+
+    # Busy in Google Calendar: materialise blocked so the claim fails normally
+    busy = occupied([template.doctor_id], day, day, include_slots=False).get((template.doctor_id, day))
+    blocked = bool(busy and busy.conflict(seconds_of(start_time), seconds_of(end_time)))
+
+    AvailabilitySlot.objects.bulk_create([AvailabilitySlot(
+        doctor_id=template.doctor_id,
+        date=day,
+        start_time=start_time,
+        end_time=end_time,
+        is_blocked=blocked,
+    )], ignore_conflicts=True)
+    concrete_id = AvailabilitySlot.objects.filter(
+        doctor_id=template.doctor_id, date=day, start_time=start_time
+    ).values_list('id', flat=True).first()
+
+    from .signals import slots_changed
+    slots_changed.send(sender=AvailabilityTemplate, doctor_ids=[template.doctor_id], slot_ids=[concrete_id])
+    return concrete_id
+
+
+def materialize(days=None, doctor_ids=None):
+    """
+    Create concrete slots for template occurrences in the next `days` days.
+
+    Returns:
+        dict: {'doctors': n, 'created': n}
+    """
+    days = days or getattr(settings, 'AVAILABILITY_TEMPLATE_HORIZON_DAYS', 14)
+    date_from = timezone.now().date()
+    date_to = date_from + timedelta(days=days)
+
+    templates = list(_active_templates(date_from, date_to, doctor_ids).select_related('doctor'))
+    busy = occupied({t.doctor_id for t in templates}, date_from, date_to, include_slots=False)
+
+    by_doctor = defaultdict(list)
+    for template in templates:
+        by_doctor[template.doctor].append(template)
+
+    stats = {'doctors': len(by_doctor), 'created': 0}
+    for doctor, doctor_templates in by_doctor.items():
+        candidates = []
+        for template in doctor_templates:
+            for day, start_time, end_time in occurrences(template, date_from, date_to):
+                schedule = busy.get((doctor.id, day))
+                if schedule and schedule.conflict(seconds_of(start_time), seconds_of(end_time)):
+                    continue
+                candidates.append((virtual_id(template.id, day, start_time), day, start_time, end_time))
+
+        # create_slots skips past, existing and overlapping occurrences
+        created, _ = create_slots(doctor, candidates)
+        stats['created'] += len(created)
+
+    logger.info(f"Materialised availability templates: {stats}")
+    return stats
@@ -0,0 +1,410 @@
+"""
+Tests for the scheduling app.
+"""
+
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import UserProfile
+from core.metrics import is_query
+from . import availability_index as index_module
+from . import bulk, templates
+from .overlap import DaySchedule
+from .availability_index import CHANGE_KEY, GENERATION_KEY, AvailabilityIndex, availability_index
+from .booking import (
+    BOOKING_QUERY_BUDGET, SlotAlreadyBooked, SlotInPast, SlotNotFound, _diagnose, book_slot,
+)
+from .models import AvailabilitySlot, AvailabilityTemplate, Booking
+
+
+def make_user(username, role, **profile):
+    user = User.objects.create_user(
+        username=username, email=f'{username}@example.com', password='pw12345678',
+        first_name=username.title(), last_name='Test',
+    )
+    UserProfile.objects.create(user=user, role=role, **profile)
+    return user
+
+
+class BookSlotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_user('doctor', 'DOCTOR', specialization='Cardiology')
+        cls.patient = make_user('patient', 'PATIENT')
+        cls.other_patient = make_user('other', 'PATIENT')
+        cls.tomorrow = date.today() + timedelta(days=1)
+
+    def slot(self, day=None, hour=9, **fields):
+        slot = AvailabilitySlot.objects.create(
+            doctor=self.doctor, date=self.tomorrow,
+            start_time=time(hour), end_time=time(hour, 30), **fields
+        )
+        if day is not None:
+            # The model refuses to save slots in the past
+            AvailabilitySlot.objects.filter(id=slot.id).update(date=day)
+        return slot
+
+    def book(self, patient, slot_id, notes=''):
+        # As in BookingListCreateView: book_slot() joins the caller's transaction
+        with transaction.atomic():
+            return book_slot(patient, slot_id, notes)
+
+    def test_books_free_slot(self):
+        slot = self.slot()
+
+        with CaptureQueriesContext(connection) as queries:
+            booking = self.book(self.patient, slot.id, 'Checkup')
+
+        statements = [query['sql'] for query in queries.captured_queries if is_query(query['sql'])]
+        self.assertLessEqual(len(statements), BOOKING_QUERY_BUDGET)
+        self.assertEqual((booking.patient, booking.doctor, booking.notes), (self.patient, self.doctor, 'Checkup'))
+        slot.refresh_from_db()
+        self.assertTrue(slot.is_booked)
+
+    def test_double_booking(self):
+        slot = self.slot()
+        self.book(self.patient, slot.id)
+
+        with self.assertRaises(SlotAlreadyBooked):
+            self.book(self.other_patient, slot.id)
+        self.assertEqual(Booking.objects.filter(slot=slot).count(), 1)
+
+    def test_blocked_slot(self):
+        slot = self.slot(is_blocked=True)
+
+        with self.assertRaises(SlotAlreadyBooked):
+            self.book(self.patient, slot.id)
+        slot.refresh_from_db()
+        self.assertFalse(slot.is_booked)
+
+    def test_past_slot(self):
+        slot = self.slot(day=date.today() - timedelta(days=1))
+
+        with self.assertRaises(SlotInPast) as raised:
+            self.book(self.patient, slot.id)
+        self.assertEqual(raised.exception.message, 'Cannot book a slot in the past.')
+        self.assertFalse(Booking.objects.exists())
+
+    def test_unknown_slot(self):
+        with self.assertRaises(SlotNotFound):
+            self.book(self.patient, 123456)
+        with self.assertRaises(SlotNotFound):
+            self.book(self.patient, 'tpl-999-20300101-0900')
+
+    def test_diagnose_messages(self):
+        booked = self.slot(hour=9, is_booked=True)
+        blocked = self.slot(hour=10, is_blocked=True)
+        past = self.slot(day=date.today() - timedelta(days=1), hour=11)
+
+        self.assertEqual(_diagnose(booked.id).message, 'Slot is no longer available.')
+        self.assertIsInstance(_diagnose(blocked.id), SlotAlreadyBooked)
+        self.assertEqual(_diagnose(past.id).message, 'Cannot book a slot in the past.')
+        self.assertEqual(_diagnose(123456).message, 'Slot not found.')
+
+    def test_booking_endpoint_reports_conflicts(self):
+        from rest_framework.test import APIClient
+
+        slot = self.slot()
+        self.book(self.other_patient, slot.id)
+        client = APIClient()
+        client.force_login(self.patient)
+
+        response = client.post('/api/bookings/', {'slot_id': slot.id}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {'error': 'Slot is no longer available.'})
+
+
+class AvailabilityIndexTests(TestCase):
+    """
+    `index` plays another worker process: it only learns about changes
+    through the shared cache, while the signals drive availability_index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cardiologist = make_user('cardio', 'DOCTOR', specialization='Cardiology')
+        cls.dermatologist = make_user('derma', 'DOCTOR', specialization='Dermatology')
+        cls.patient = make_user('patient', 'PATIENT')
+        cls.tomorrow = date.today() + timedelta(days=1)
+
+    def setUp(self):
+        cache.clear()
+        availability_index._loaded = False
+        self.index = AvailabilityIndex()
+
+    def slot(self, doctor, day=None, hour=9, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return AvailabilitySlot.objects.create(
+                doctor=doctor, date=day or self.tomorrow,
+                start_time=time(hour), end_time=time(hour, 30), **fields
+            )
+
+    def free_ids(self, index=None, **search):
+        search.setdefault('date_to', date.today() + timedelta(days=400))
+        return [slot_id for _, _, _, slot_id in (index or self.index).first_free(20, **search)]
+
+    def test_first_free(self):
+        derma = self.slot(self.dermatologist, hour=10)
+        cardio = self.slot(self.cardiologist, hour=9)
+        later = self.slot(self.cardiologist, day=self.tomorrow + timedelta(days=1))
+        self.slot(self.cardiologist, hour=8, is_blocked=True)
+
+        self.assertEqual(self.free_ids(), [cardio.id, derma.id, later.id])
+        self.assertEqual(self.free_ids(specialization='CARDIOLOGY'), [cardio.id, later.id])
+        self.assertEqual(self.free_ids(doctor_ids=[self.dermatologist.id]), [derma.id])
+        self.assertEqual(self.free_ids(time_from=time(9, 30)), [derma.id])
+        self.assertEqual(self.free_ids(after=datetime.combine(self.tomorrow, time(9, 30))), [derma.id, later.id])
+        self.assertTrue(self.index.is_free(self.cardiologist.id, datetime.combine(self.tomorrow, time(9, 15))))
+        self.assertFalse(self.index.is_free(self.cardiologist.id, datetime.combine(self.tomorrow, time(8, 15))))
+
+    def test_book_and_unbook(self):
+        slot = self.slot(self.cardiologist)
+        availability_index.load()
+
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            booking = book_slot(self.patient, slot.id)
+        self.assertEqual(self.free_ids(availability_index), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+            slot.is_booked = False
+            slot.save()
+        self.assertEqual(self.free_ids(availability_index), [slot.id])
+
+    def test_foreign_changes_are_applied_incrementally(self):
+        self.index.load()
+        slot = self.slot(self.cardiologist)
+
+        with mock.patch.object(self.index, 'load', side_effect=AssertionError('full reload')):
+            with self.assertNumQueries(1):
+                self.assertEqual(self.free_ids(), [slot.id])
+
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                book_slot(self.patient, slot.id)
+            self.assertEqual(self.free_ids(), [])
+
+            profile = self.cardiologist.profile
+            profile.specialization = 'Neurology'
+            with self.captureOnCommitCallbacks(execute=True):
+                profile.save()
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                Booking.objects.filter(slot=slot).delete()
+                slot.save()  # is_booked=False again
+            self.assertEqual(self.free_ids(specialization='neurology'), [slot.id])
+            self.assertEqual(self.free_ids(specialization='cardiology'), [])
+
+        self.assertEqual(self.index._generation, cache.get(GENERATION_KEY))
+
+    @override_settings(AVAILABILITY_INDEX_MIN_RELOAD_SECONDS=0)
+    def test_missing_change_record_reloads(self):
+        self.index.load()
+        slot = self.slot(self.cardiologist)
+        cache.delete(CHANGE_KEY.format(cache.get(GENERATION_KEY)))
+
+        with mock.patch.object(self.index, 'load', wraps=self.index.load) as load:
+            self.assertEqual(self.free_ids(), [slot.id])
+        load.assert_called_once()
+
+    def test_day_rollover(self):
+        today = self.slot(self.cardiologist, hour=23)
+        AvailabilitySlot.objects.filter(id=today.id).update(date=date.today())
+        beyond = self.slot(self.cardiologist, day=date.today() + timedelta(days=self.index.horizon_days + 1))
+        self.index.load()
+        self.assertIn(today.id, self.index._slots)
+        self.assertNotIn(beyond.id, self.index._slots)
+
+        class Tomorrow(date):
+            @classmethod
+            def today(cls):
+                return date.today() + timedelta(days=1)
+
+        with mock.patch.object(index_module, 'date', Tomorrow):
+            self.assertEqual(self.free_ids(after=datetime.combine(self.tomorrow, time.min)), [beyond.id])
+        self.assertNotIn(today.id, self.index._slots)
+        self.assertEqual(self.index._dates[0], self.tomorrow + timedelta(days=self.index.horizon_days))
+
+
+class BulkCreateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_user('doctor', 'DOCTOR')
+        cls.tomorrow = date.today() + timedelta(days=1)
+
+    def candidate(self, start, end, day=None):
+        return (f'{time(*start):%H:%M}', day or self.tomorrow, time(*start), time(*end))
+
+    def test_overlaps_with_existing_and_each_other(self):
+        AvailabilitySlot.objects.create(doctor=self.doctor, date=self.tomorrow, start_time=time(9), end_time=time(10))
+
+        created, errors = bulk.create_slots(self.doctor, [
+            self.candidate((9, 30), (10, 0)),  # inside the existing slot
+            self.candidate((9, 0), (9, 15)),  # same start as the existing slot
+            self.candidate((10, 0), (10, 30)),  # touches it: allowed
+            self.candidate((10, 15), (10, 45)),  # overlaps the previous candidate
+            self.candidate((10, 30), (11, 0)),
+            self.candidate((8, 0), (8, 30), day=date.today() - timedelta(days=1)),
+        ])
+
+        self.assertEqual([(s.start_time, s.end_time) for s in created], [(time(10), time(10, 30)), (time(10, 30), time(11))])
+        self.assertEqual(errors, [
+            '08:00: Cannot create slots in the past.',
+            '09:30: Overlaps other slots between 09:00 and 10:00',
+            '09:00: Already exists at 09:00:00',
+            '10:15: Overlaps other slots between 09:00 and 10:30',
+        ])
+
+    def test_concurrent_inserts_are_skipped(self):
+        before = AvailabilitySlot.objects.create(doctor=self.doctor, date=self.tomorrow, start_time=time(12), end_time=time(13))
+
+        class RacingChecker(bulk.OverlapChecker):
+            """Another writer takes 09:00 right after the overlap check read the day."""
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                AvailabilitySlot.objects.bulk_create([AvailabilitySlot(
+                    doctor=self.doctor_, date=self.day, start_time=time(9), end_time=time(9, 45)
+                )])
+
+        RacingChecker.doctor_, RacingChecker.day = self.doctor, self.tomorrow
+        with mock.patch.object(bulk, 'OverlapChecker', RacingChecker):
+            created, errors = bulk.create_slots(self.doctor, [
+                self.candidate((9, 0), (9, 30)), self.candidate((10, 0), (10, 30)),
+            ])
+
+        # Read back by created_at: neither the racing row nor the older slot is ours
+        self.assertEqual([s.start_time for s in created], [time(10)])
+        self.assertNotIn(before, created)
+        self.assertEqual(errors, ['1 slot(s) were created concurrently by another request and skipped.'])
+        self.assertEqual(AvailabilitySlot.objects.get(date=self.tomorrow, start_time=time(9)).end_time, time(9, 45))
+
+    def test_locks_the_doctor(self):
+        with mock.patch.object(bulk, 'lock_doctor') as lock_doctor:
+            bulk.create_slots(self.doctor, [self.candidate((9, 0), (9, 30))])
+        lock_doctor.assert_called_once_with(self.doctor)
+
+
+class DayScheduleTests(SimpleTestCase):
+
+    def schedule(self, *blocks):
+        schedule = DaySchedule()
+        for start, end in blocks:
+            schedule.add(start, end)
+        return schedule
+
+    def blocks(self, schedule):
+        return list(zip(schedule.starts, schedule.ends))
+
+    def test_overlapping_ranges_merge(self):
+        schedule = self.schedule((100, 200), (150, 300), (50, 120))
+        self.assertEqual(self.blocks(schedule), [(50, 300)])
+
+        schedule.add(10, 400)  # swallows everything
+        self.assertEqual(self.blocks(schedule), [(10, 400)])
+
+    def test_adjacent_ranges_merge_but_do_not_conflict(self):
+        schedule = self.schedule((100, 200), (300, 400))
+
+        self.assertIsNone(schedule.conflict(200, 300))
+        self.assertIsNone(schedule.conflict(0, 100))
+        self.assertIsNone(schedule.conflict(400, 500))
+
+        schedule.add(200, 300)
+        self.assertEqual(self.blocks(schedule), [(100, 400)])
+
+    def test_disjoint_ranges_stay_sorted(self):
+        schedule = self.schedule((500, 600), (100, 200), (300, 400))
+        self.assertEqual(self.blocks(schedule), [(100, 200), (300, 400), (500, 600)])
+
+        # Bridges the first two only
+        schedule.add(150, 350)
+        self.assertEqual(self.blocks(schedule), [(100, 400), (500, 600)])
+
+    def test_conflict(self):
+        schedule = self.schedule((100, 200), (300, 400))
+
+        self.assertEqual(schedule.conflict(150, 160), (100, 200))
+        self.assertEqual(schedule.conflict(50, 101), (100, 200))
+        self.assertEqual(schedule.conflict(199, 250), (100, 200))
+        self.assertEqual(schedule.conflict(250, 350), (300, 400))
+        # Spans a whole block: the last block starting before the end is reported
+        self.assertEqual(schedule.conflict(0, 500), (300, 400))
+        self.assertIsNone(schedule.conflict(210, 290))
+        self.assertIsNone(DaySchedule().conflict(0, 100))
+
+
+class TemplateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = make_user('doctor', 'DOCTOR')
+        today = date.today()
+        cls.monday = today + timedelta(days=7 - today.weekday())
+        cls.template = AvailabilityTemplate.objects.create(
+            doctor=cls.doctor, weekdays=[0, 2], start_time=time(9), end_time=time(10), slot_minutes=30,
+            valid_from=cls.monday, valid_until=cls.monday + timedelta(days=20),
+            exceptions=[(cls.monday + timedelta(days=9)).isoformat()],
+        )
+
+    def expected(self, date_from, date_to):
+        """Mondays and Wednesdays of the template's three weeks, minus the exception."""
+        days = [
+            self.monday + timedelta(days=week * 7 + weekday)
+            for week in range(3) for weekday in (0, 2)
+        ]
+        return [
+            (day, start, end) for day in days if date_from <= day <= date_to and day != self.monday + timedelta(days=9)
+            for start, end in ((time(9), time(9, 30)), (time(9, 30), time(10)))
+        ]
+
+    def test_occurrences_across_the_horizon(self):
+        date_from, date_to = date.today(), self.monday + timedelta(days=60)
+        self.assertEqual(list(templates.occurrences(self.template, date_from, date_to)), self.expected(date_from, date_to))
+
+        # Clipped to a window inside the template's validity
+        date_from, date_to = self.monday + timedelta(days=2), self.monday + timedelta(days=14)
+        self.assertEqual(list(templates.occurrences(self.template, date_from, date_to)), self.expected(date_from, date_to))
+
+    def test_lazy_expansion_matches_eager(self):
+        AvailabilitySlot.objects.create(doctor=self.doctor, date=self.monday, start_time=time(9), end_time=time(9, 30))
+        date_from, date_to = date.today(), self.monday + timedelta(days=60)
+
+        eager = templates.virtual_slots(date_from, date_to)
+        lazy = list(templates.iter_virtual_slots(date_from, date_to))
+
+        self.assertEqual([slot.id for slot in lazy], [slot.id for slot in eager])
+        self.assertEqual(
+            [(slot.date, slot.start_time, slot.end_time) for slot in eager],
+            self.expected(date_from, date_to)[1:],  # the concrete slot hides the first occurrence
+        )
+        self.assertEqual(eager[0].id, templates.virtual_id(self.template.id, self.monday, time(9, 30)))
+
+    def test_materialize_is_idempotent(self):
+        days = (self.monday - date.today()).days + 30
+        expected = self.expected(date.today(), date.today() + timedelta(days=days))
+
+        self.assertEqual(templates.materialize(days), {'doctors': 1, 'created': len(expected)})
+        self.assertEqual(templates.materialize(days), {'doctors': 1, 'created': 0})
+
+        rows = AvailabilitySlot.objects.filter(doctor=self.doctor).order_by('date', 'start_time')
+        self.assertEqual(list(rows.values_list('date', 'start_time', 'end_time')), expected)
+        self.assertEqual(templates.virtual_slots(date.today(), date.today() + timedelta(days=days)), [])
+
+    def test_materialize_occurrence_is_idempotent(self):
+        slot_id = templates.virtual_id(self.template.id, self.monday, time(9, 30))
+
+        concrete_id = templates.materialize_occurrence(slot_id)
+        self.assertEqual(templates.materialize_occurrence(slot_id), concrete_id)
+        self.assertEqual(AvailabilitySlot.objects.filter(doctor=self.doctor).count(), 1)
+
+        # The exception date has no occurrence
+        self.assertIsNone(templates.materialize_occurrence(
+            templates.virtual_id(self.template.id, self.monday + timedelta(days=9), time(9))
+        ))
@@ -9,17 +9,27 @@ from .views import (
     SlotDetailView,
     BookingListCreateView,
     BookingDetailView,
+    DoctorDigestView,
     DoctorAvailableSlotsView,
+    NextAvailableSlotsView,
+    TemplateListCreateView,
+    TemplateDetailView,
 )
 
 urlpatterns = [
     # Slots
     path('slots/', SlotListCreateView.as_view(), name='slot_list_create'),
+    path('slots/next-available/', NextAvailableSlotsView.as_view(), name='next_available_slots'),
     path('slots/bulk/', BulkSlotCreateView.as_view(), name='bulk_slot_create'),
     path('slots/<int:pk>/', SlotDetailView.as_view(), name='slot_detail'),
     
+    # Recurring availability templates
+    path('templates/', TemplateListCreateView.as_view(), name='template_list_create'),
+    path('templates/<int:pk>/', TemplateDetailView.as_view(), name='template_detail'),
+    
     # Bookings
     path('bookings/', BookingListCreateView.as_view(), name='booking_list_create'),
+    path('bookings/digest/', DoctorDigestView.as_view(), name='doctor_digest'),
     path('bookings/<int:pk>/', BookingDetailView.as_view(), name='booking_detail'),
     
     # Doctor's available slots (for patients)
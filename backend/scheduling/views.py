@@ -7,23 +7,34 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db import transaction, OperationalError
+from django.db import transaction
 from django.contrib.auth.models import User
-from datetime import date, timedelta
+from django.conf import settings
+from datetime import date, datetime, timedelta
+from heapq import merge
 import logging
 
-from .models import AvailabilitySlot, Booking
+from .models import AvailabilitySlot, AvailabilityTemplate, Booking
 from .serializers import (
     SlotSerializer, 
     SlotCreateSerializer,
     BulkSlotCreateSerializer,
+    AvailabilityTemplateSerializer,
     BookingSerializer,
     BookingCreateSerializer,
 )
+from .booking import book_slot, BookingError, SlotNotFound, SlotInPast
+from .availability_index import availability_index
+from .overlap import OverlapChecker, lock_doctor
+from .bulk import create_slots, expand_recurrence, explicit_candidates, BulkSlotError
+from .templates import virtual_slots, iter_virtual_slots, lookahead_end
+from .rows import SLOT_VALUES, BOOKING_VALUES, RowFormatter, slot_row, slot_row_key, booking_row_key
+from .pagination import KeysetPaginator, InvalidCursor, after, slot_key
+from .signals import slots_changed
+from .digest import get_digest
 from accounts.permissions import IsDoctor, IsPatient
-from accounts.permissions import IsDoctor, IsPatient
-from services.email_client import send_email
-from services.google_calendar import GoogleCalendarService
+from core.renderers import LIST_RENDERERS
+from integrations.outbox import enqueue_many, email_message, calendar_event_message
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +48,8 @@ class SlotListCreateView(APIView):
     """
     
     permission_classes = [IsAuthenticated]
+    # JSON by default; columnar JSON or MessagePack by Accept header
+    renderer_classes = LIST_RENDERERS
     
     def get(self, request):
         user = request.user
@@ -47,13 +60,35 @@ class SlotListCreateView(APIView):
         date_to = request.query_params.get('date_to')
         show_booked = request.query_params.get('show_booked', 'false').lower() == 'true'
         
+        try:
+            paginator = KeysetPaginator(request)
+            date_from = date.fromisoformat(date_from) if date_from else None
+            date_to = date.fromisoformat(date_to) if date_to else None
+        except InvalidCursor:
+            return Response(
+                {'error': 'Invalid cursor or page_size.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date. Use YYYY-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        max_days = getattr(settings, 'SLOT_LIST_MAX_DAYS', 366)
+        if date_to and (date_to - (date_from or date.today())).days > max_days:
+            return Response(
+                {'error': f'Date range cannot exceed {max_days} days.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         # Base queryset
         if user.profile.is_doctor:
             # Doctors see their own slots
             queryset = AvailabilitySlot.objects.filter(doctor=user)
         else:
             # Patients see all available slots from all doctors
-            queryset = AvailabilitySlot.objects.filter(is_booked=False)
+            queryset = AvailabilitySlot.objects.filter(is_booked=False, is_blocked=False)
             
             if doctor_id:
                 queryset = queryset.filter(doctor_id=doctor_id)
@@ -72,10 +107,31 @@ class SlotListCreateView(APIView):
         if user.profile.is_doctor and not show_booked:
             queryset = queryset.filter(is_booked=False)
         
-        queryset = queryset.select_related('doctor', 'doctor__profile')
-        serializer = SlotSerializer(queryset, many=True)
+        # Keyset pagination on (date, start_time, id)
+        queryset = queryset.order_by('date', 'start_time', 'id')
+        if paginator.key:
+            queryset = queryset.filter(after(paginator.key))
+        
+        # Add free slots from availability templates that have no row yet
+        window_from = max(date_from or date.today(), date.today())
+        window_to = date_to or lookahead_end(window_from)
+        if user.profile.is_doctor:
+            doctor_ids = [user.id]
+        else:
+            doctor_ids = [doctor_id] if doctor_id else None
+        # Expanded lazily from the cursor on, so only the days this page
+        # reaches are computed
+        virtual_from = max(window_from, paginator.key[0]) if paginator.key else window_from
+        virtual = (
+            slot_row(slot) for slot in iter_virtual_slots(virtual_from, window_to, doctor_ids)
+            if paginator.key is None or slot_key(slot) > paginator.key
+        )
+        
+        # Lean read path: .values() rows formatted like SlotSerializer
+        rows = merge(queryset.values(*SLOT_VALUES)[:paginator.limit], virtual, key=slot_row_key)
+        slots = paginator.page(rows, slot_row_key)
         
-        return Response(serializer.data)
+        return paginator.add_headers(Response(RowFormatter().slots(slots)))
     
     def post(self, request):
         # Check if user is a doctor
@@ -92,27 +148,32 @@ class SlotListCreateView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check for overlapping slots
+        # Check for overlapping slots, holding the doctor's lock until the insert commits
         data = serializer.validated_data
-        existing = AvailabilitySlot.objects.filter(
-            doctor=request.user,
-            date=data['date'],
-            start_time=data['start_time']
-        ).exists()
-        
-        if existing:
-            return Response(
-                {'error': 'A slot already exists at this time.'},
-                status=status.HTTP_409_CONFLICT
+        with transaction.atomic():
+            lock_doctor(request.user)
+            checker = OverlapChecker(request.user, data['date'])
+            
+            if (data['date'], data['start_time']) in checker.taken:
+                return Response(
+                    {'error': 'A slot already exists at this time.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            
+            problem = checker.check(data['date'], data['start_time'], data['end_time'])
+            if problem:
+                return Response(
+                    {'error': f'{problem}.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            
+            slot = AvailabilitySlot.objects.create(
+                doctor=request.user,
+                date=data['date'],
+                start_time=data['start_time'],
+                end_time=data['end_time']
             )
         
-        slot = AvailabilitySlot.objects.create(
-            doctor=request.user,
-            date=data['date'],
-            start_time=data['start_time'],
-            end_time=data['end_time']
-        )
-        
         logger.info(f"Slot created: {slot}")
         
         return Response(
@@ -122,7 +183,12 @@ class SlotListCreateView(APIView):
 
 
 class BulkSlotCreateView(APIView):
-    """Create multiple slots at once (doctors only)."""
+    """
+    Create multiple slots at once (doctors only).
+    
+    Accepts explicit slots for one date or a weekly recurrence rule; see
+    scheduling.bulk for the set-based engine.
+    """
     
     permission_classes = [IsAuthenticated, IsDoctor]
     
@@ -133,39 +199,23 @@ class BulkSlotCreateView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         data = serializer.validated_data
-        created_slots = []
-        errors = []
-        
-        for i, slot_data in enumerate(data['slots']):
-            try:
-                # Parse time strings
-                from datetime import datetime
-                start_time = datetime.strptime(slot_data['start_time'], '%H:%M').time()
-                end_time = datetime.strptime(slot_data['end_time'], '%H:%M').time()
-                
-                # Check for existing slot
-                if AvailabilitySlot.objects.filter(
-                    doctor=request.user,
-                    date=data['date'],
-                    start_time=start_time
-                ).exists():
-                    errors.append(f"Slot {i+1}: Already exists at {start_time}")
-                    continue
-                
-                slot = AvailabilitySlot.objects.create(
-                    doctor=request.user,
-                    date=data['date'],
-                    start_time=start_time,
-                    end_time=end_time
-                )
-                created_slots.append(slot)
-                
-            except Exception as e:
-                errors.append(f"Slot {i+1}: {str(e)}")
+        
+        if 'recurrence' in data:
+            candidates, errors = expand_recurrence(**data['recurrence']), []
+        else:
+            candidates, errors = explicit_candidates(data['date'], data['slots'])
+        
+        try:
+            created_slots, skipped = create_slots(request.user, candidates)
+        except BulkSlotError as e:
+            return Response(
+                {'error': e.message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({
             'created': SlotSerializer(created_slots, many=True).data,
-            'errors': errors
+            'errors': errors + skipped
         }, status=status.HTTP_201_CREATED if created_slots else status.HTTP_400_BAD_REQUEST)
 
 
@@ -216,15 +266,105 @@ class SlotDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+# ==================== TEMPLATE VIEWS ====================
+
+class TemplateListCreateView(APIView):
+    """
+    GET: List the doctor's availability templates
+    POST: Create a weekly availability template
+    
+    Occurrences show up in the slot lists straight away; see
+    scheduling.templates for when they become real slots.
+    """
+    
+    permission_classes = [IsAuthenticated, IsDoctor]
+    
+    def get(self, request):
+        templates = AvailabilityTemplate.objects.filter(doctor=request.user)
+        return Response(AvailabilityTemplateSerializer(templates, many=True).data)
+    
+    def post(self, request):
+        serializer = AvailabilityTemplateSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        template = serializer.save(doctor=request.user)
+        slots_changed.send(sender=AvailabilityTemplate, doctor_ids=[request.user.id])
+        logger.info(f"Availability template created: {template}")
+        
+        return Response(
+            AvailabilityTemplateSerializer(template).data,
+            status=status.HTTP_201_CREATED
+        )
+
+
+class TemplateDetailView(APIView):
+    """Get, update (e.g. add exceptions), or delete an availability template."""
+    
+    permission_classes = [IsAuthenticated, IsDoctor]
+    
+    def get_object(self, pk, user):
+        try:
+            return AvailabilityTemplate.objects.get(pk=pk, doctor=user)
+        except AvailabilityTemplate.DoesNotExist:
+            return None
+    
+    def get(self, request, pk):
+        template = self.get_object(pk, request.user)
+        if not template:
+            return Response(
+                {'error': 'Template not found.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response(AvailabilityTemplateSerializer(template).data)
+    
+    def patch(self, request, pk):
+        template = self.get_object(pk, request.user)
+        if not template:
+            return Response(
+                {'error': 'Template not found.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        serializer = AvailabilityTemplateSerializer(template, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        template = serializer.save()
+        slots_changed.send(sender=AvailabilityTemplate, doctor_ids=[request.user.id])
+        
+        return Response(AvailabilityTemplateSerializer(template).data)
+    
+    def delete(self, request, pk):
+        template = self.get_object(pk, request.user)
+        if not template:
+            return Response(
+                {'error': 'Template not found.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # Slots already materialised from the template are kept
+        template.delete()
+        slots_changed.send(sender=AvailabilityTemplate, doctor_ids=[request.user.id])
+        logger.info(f"Availability template deleted: {pk} by {request.user.username}")
+        
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 # ==================== BOOKING VIEWS ====================
 
 class BookingListCreateView(APIView):
     """
-    GET: List bookings (doctors and patients see their own)
+    GET: List bookings (doctors and patients see their own) by appointment
+         time, keyset-paginated; see scheduling.pagination
     POST: Create a booking (patients only) - TRANSACTION SAFE
     """
     
     permission_classes = [IsAuthenticated]
+    # JSON by default; columnar JSON or MessagePack by Accept header
+    renderer_classes = LIST_RENDERERS
     
     def get(self, request):
         user = request.user
@@ -234,24 +374,33 @@ class BookingListCreateView(APIView):
         else:
             queryset = Booking.objects.filter(patient=user)
         
+        try:
+            paginator = KeysetPaginator(request)
+        except InvalidCursor:
+            return Response(
+                {'error': 'Invalid cursor or page_size.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         # Filter by upcoming/past
         show_past = request.query_params.get('show_past', 'false').lower() == 'true'
         if not show_past:
             queryset = queryset.filter(slot__date__gte=date.today())
         
-        queryset = queryset.select_related(
-            'patient', 'patient__profile',
-            'doctor', 'doctor__profile',
-            'slot'
-        ).order_by('slot__date', 'slot__start_time')
+        # Keyset pagination on (slot date, slot start time, booking id)
+        queryset = queryset.order_by('slot__date', 'slot__start_time', 'id')
+        if paginator.key:
+            queryset = queryset.filter(after(paginator.key, prefix='slot__'))
         
-        serializer = BookingSerializer(queryset, many=True)
-        return Response(serializer.data)
+        # Lean read path: .values() rows formatted like BookingSerializer
+        bookings = paginator.page(queryset.values(*BOOKING_VALUES)[:paginator.limit], booking_row_key)
+        return paginator.add_headers(Response(RowFormatter().bookings(bookings)))
     
     def post(self, request):
         """
-        CRITICAL: Transaction-safe booking with row locking.
+        CRITICAL: Transaction-safe booking via compare-and-set.
         Prevents race conditions and double-booking.
+        See scheduling.booking for the query budget; the outbox adds one INSERT.
         """
         
         # Only patients can book
@@ -271,80 +420,39 @@ class BookingListCreateView(APIView):
         
         try:
             with transaction.atomic():
-                # Row-level locking to prevent race conditions
-                # nowait=True means it will fail immediately if locked (no waiting)
-                try:
-                    slot = AvailabilitySlot.objects.select_for_update(nowait=True).get(
-                        id=slot_id,
-                        is_booked=False
-                    )
-                except AvailabilitySlot.DoesNotExist:
-                    return Response(
-                        {'error': 'Slot is no longer available.'},
-                        status=status.HTTP_409_CONFLICT
-                    )
-                
-                # Double-check slot state (defense in depth)
-                if slot.is_booked:
-                    return Response(
-                        {'error': 'Slot was just booked by someone else.'},
-                        status=status.HTTP_409_CONFLICT
-                    )
-                
-                if slot.is_past:
-                    return Response(
-                        {'error': 'Cannot book a slot in the past.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+                booking = book_slot(request.user, slot_id, notes)
+                slot = booking.slot
                 
-                # Mark slot as booked
-                slot.is_booked = True
-                slot.save()
-                
-                # Create booking
-                booking = Booking.objects.create(
-                    patient=request.user,
-                    doctor=slot.doctor,
-                    slot=slot,
-                    notes=notes
-                )
-                
-                logger.info(
-                    f"Booking created: {booking.id} - "
-                    f"{request.user.username} with Dr. {slot.doctor.username} "
-                    f"on {slot.date} at {slot.start_time}"
-                )
-        
-        except OperationalError as e:
-            # Row lock was not available (concurrent booking attempt)
-            logger.warning(f"Concurrent booking attempt for slot {slot_id}: {e}")
+                # Side effects are delivered by the outbox worker after commit
+                enqueue_many([
+                    email_message(
+                        action='BOOKING_CONFIRMATION',
+                        recipient=request.user.email,
+                        data={
+                            'patient_name': request.user.get_full_name() or request.user.username,
+                            'doctor': slot.doctor.get_full_name() or slot.doctor.username,
+                            'date': str(slot.date),
+                            'time': str(slot.start_time),
+                        }
+                    ),
+                    calendar_event_message(booking),
+                ])
+        except SlotNotFound as e:
             return Response(
-                {'error': 'Slot is currently being booked. Please try again.'},
-                status=status.HTTP_409_CONFLICT
+                {'slot_id': [e.message]},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # === Post-booking operations (outside transaction) ===
-        
-        # Send confirmation email
-        try:
-            send_email(
-                action='BOOKING_CONFIRMATION',
-                recipient=request.user.email,
-                data={
-                    'patient_name': request.user.get_full_name() or request.user.username,
-                    'doctor': slot.doctor.get_full_name() or slot.doctor.username,
-                    'date': str(slot.date),
-                    'time': str(slot.start_time),
-                }
+        except SlotInPast as e:
+            return Response(
+                {'error': e.message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except BookingError as e:
+            logger.warning(f"Booking conflict for slot {slot_id}: {e.message}")
+            return Response(
+                {'error': e.message},
+                status=status.HTTP_409_CONFLICT
             )
-        except Exception as e:
-            logger.error(f"Failed to send booking confirmation email: {e}")
-            
-        # Create Google Calendar Event
-        try:
-            GoogleCalendarService.create_event(booking)
-        except Exception as e:
-            logger.error(f"Failed to create Google Calendar event: {e}")
         
         return Response(
             BookingSerializer(booking).data,
@@ -358,11 +466,15 @@ class BookingDetailView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get_object(self, pk, user):
+        # Everything BookingSerializer reads, in one query
+        bookings = Booking.objects.select_related(
+            'slot__doctor', 'doctor__profile', 'patient__profile'
+        )
         try:
             if user.profile.is_doctor:
-                return Booking.objects.get(pk=pk, doctor=user)
+                return bookings.get(pk=pk, doctor=user)
             else:
-                return Booking.objects.get(pk=pk, patient=user)
+                return bookings.get(pk=pk, patient=user)
         except Booking.DoesNotExist:
             return None
     
@@ -377,14 +489,36 @@ class BookingDetailView(APIView):
         return Response(BookingSerializer(booking).data)
 
 
+class DoctorDigestView(APIView):
+    """
+    A doctor's schedule for one day (default: tomorrow), as in the nightly
+    digest email. Served from cache until the doctor's bookings change.
+    """
+    
+    permission_classes = [IsAuthenticated, IsDoctor]
+    
+    def get(self, request):
+        try:
+            day = date.fromisoformat(request.query_params.get('date', str(date.today() + timedelta(days=1))))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date. Use YYYY-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(get_digest(request.user, day))
+
+
 class DoctorAvailableSlotsView(APIView):
     """Get available slots for a specific doctor (for patients)."""
     
     permission_classes = [IsAuthenticated, IsPatient]
+    # JSON by default; columnar JSON or MessagePack by Accept header
+    renderer_classes = LIST_RENDERERS
     
     def get(self, request, doctor_id):
         try:
-            doctor = User.objects.get(id=doctor_id, profile__role='DOCTOR')
+            doctor = User.objects.select_related('profile').get(id=doctor_id, profile__role='DOCTOR')
         except User.DoesNotExist:
             return Response(
                 {'error': 'Doctor not found.'},
@@ -392,17 +526,26 @@ class DoctorAvailableSlotsView(APIView):
             )
         
         # Get date range from query params
-        date_from = request.query_params.get('date_from', str(date.today()))
-        date_to = request.query_params.get('date_to', str(date.today() + timedelta(days=30)))
+        try:
+            date_from = date.fromisoformat(request.query_params.get('date_from', str(date.today())))
+            date_to = date.fromisoformat(request.query_params.get('date_to', str(date.today() + timedelta(days=30))))
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date. Use YYYY-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         slots = AvailabilitySlot.objects.filter(
             doctor=doctor,
             is_booked=False,
+            is_blocked=False,
             date__gte=date_from,
             date__lte=date_to
-        ).order_by('date', 'start_time')
+        ).order_by('date', 'start_time', 'id')
         
-        serializer = SlotSerializer(slots, many=True)
+        # Add free slots from availability templates that have no row yet
+        virtual = [slot_row(slot) for slot in virtual_slots(max(date_from, date.today()), date_to, [doctor.id])]
+        rows = merge(slots.values(*SLOT_VALUES), virtual, key=slot_row_key)
         
         return Response({
             'doctor': {
@@ -410,5 +553,78 @@ class DoctorAvailableSlotsView(APIView):
                 'name': doctor.get_full_name() or doctor.username,
                 'specialization': doctor.profile.specialization
             },
-            'slots': serializer.data
+            'slots': RowFormatter().slots(rows)
+        })
+
+
+class NextAvailableSlotsView(APIView):
+    """
+    The earliest free slots across all doctors, in one round trip.
+    
+    Query params:
+        specialization: Only doctors with this specialization
+        date_from, date_to: Date window (YYYY-MM-DD)
+        time_from, time_to: Time-of-day window for the slot start (HH:MM)
+        limit: Number of slots (default 10, max NEXT_AVAILABLE_MAX_LIMIT)
+    
+    Candidates come from the availability index and are confirmed with a
+    single query, so the database work does not depend on how many doctors
+    there are.
+    """
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        params = request.query_params
+        max_limit = getattr(settings, 'NEXT_AVAILABLE_MAX_LIMIT', 50)
+        
+        try:
+            limit = min(max(int(params.get('limit', 10)), 1), max_limit)
+            date_from = self.parse(params.get('date_from'), '%Y-%m-%d', datetime.date)
+            date_to = self.parse(params.get('date_to'), '%Y-%m-%d', datetime.date)
+            time_from = self.parse(params.get('time_from'), '%H:%M', datetime.time)
+            time_to = self.parse(params.get('time_to'), '%H:%M', datetime.time)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid limit, date (YYYY-MM-DD) or time (HH:MM).'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        now = datetime.now()
+        after = max(now, datetime.combine(date_from, datetime.min.time())) if date_from else now
+        search = dict(
+            after=after,
+            specialization=params.get('specialization', '').strip() or None,
+            date_to=date_to,
+            time_from=time_from,
+            time_to=time_to,
+        )
+        
+        slots, stale = self.confirm(availability_index.first_free(limit * 2, **search))
+        if len(slots) < limit and stale:
+            # Another process changed these doctors and the index has not
+            # caught up yet: reload them and look once more
+            availability_index.refresh_doctors(stale)
+            slots, stale = self.confirm(availability_index.first_free(limit * 2, **search))
+        
+        return Response({
+            'count': min(len(slots), limit),
+            'slots': SlotSerializer(slots[:limit], many=True).data
         })
+    
+    @staticmethod
+    def parse(value, fmt, convert):
+        return convert(datetime.strptime(value, fmt)) if value else None
+    
+    @staticmethod
+    def confirm(candidates):
+        """Return (candidate slots still free in index order, doctor ids of stale candidates)."""
+        found = AvailabilitySlot.objects.filter(
+            id__in=[slot_id for _, _, _, slot_id in candidates],
+            is_booked=False,
+            is_blocked=False,
+        ).select_related('doctor').in_bulk()
+        
+        slots = [found[slot_id] for _, _, _, slot_id in candidates if slot_id in found]
+        stale = {doctor_id for _, _, doctor_id, slot_id in candidates if slot_id not in found}
+        return slots, stale
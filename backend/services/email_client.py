@@ -1,15 +1,154 @@
 """
 Email Client Service.
 HTTP client for the serverless email Lambda function.
+
+All calls share one requests.Session per process, so connections to the
+email endpoint are kept alive and pooled (EMAIL_HTTP_POOL_SIZE, sized for
+the outbox worker's email threads). Only failures to connect are retried
+here, by urllib3 with jittered exponential backoff: the request never
+reached the service, so sending it again cannot duplicate an email. A 5xx
+or a read timeout may come after some or all emails of a BATCH went out,
+so those are left to the outbox, which retries per message with its own
+backoff.
+
+A circuit breaker guards the endpoint: after
+EMAIL_CIRCUIT_FAILURE_THRESHOLD consecutive failures, calls fail with
+CircuitOpen immediately for EMAIL_CIRCUIT_RESET_SECONDS, after which one
+trial call is let through to close the circuit again. The outbox does not
+count those as delivery attempts.
+
+Application code should not call the service from a request thread: use
+enqueue_email() inside the transaction that caused the email. The outbox
+worker (run_email_worker / run_outbox_worker) delivers queued emails with
+send_email_batch(), many per request to the service's BATCH action.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
 import logging
+import random
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
+class JitteredRetry(Retry):
+    """Retry with "full jitter": a random delay up to the exponential backoff."""
+    
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff else 0
+
+
+class CircuitOpen(Exception):
+    """The circuit breaker refused the call; nothing was sent."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    
+    closed    -> calls go through; `threshold` failures in a row open it
+    open      -> calls are refused until `reset_seconds` have passed
+    half-open -> one trial call goes through; success closes the circuit,
+                 failure opens it again
+    """
+    
+    def __init__(self, threshold=5, reset_seconds=30):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self.rejected = 0
+    
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if self._trial or time.monotonic() - self._opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+    
+    def allow(self):
+        """Whether a call may go through now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._trial = True
+                return True
+            self.rejected += 1
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                if self._opened_at is None or self._trial:
+                    logger.warning(
+                        f"Email service circuit opened after {self._failures} consecutive failure(s)"
+                    )
+                self._opened_at = time.monotonic()
+                self._trial = False
+    
+    def stats(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self._failures,
+            'rejected': self.rejected,
+        }
+
+
+_session = None
+_session_lock = threading.Lock()
+
+circuit_breaker = CircuitBreaker(
+    threshold=getattr(settings, 'EMAIL_CIRCUIT_FAILURE_THRESHOLD', 5),
+    reset_seconds=getattr(settings, 'EMAIL_CIRCUIT_RESET_SECONDS', 30),
+)
+
+
+def get_session():
+    """The process-wide pooled session for the email endpoint."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retries = getattr(settings, 'EMAIL_HTTP_RETRIES', 2)
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=getattr(settings, 'EMAIL_HTTP_POOL_SIZE', 10),
+                    max_retries=JitteredRetry(
+                        total=retries,
+                        connect=retries,
+                        # The request may have been processed: no retries
+                        # on read errors, 5xx or anything else
+                        read=0,
+                        status=0,
+                        other=0,
+                        allowed_methods=frozenset({'POST'}),
+                        backoff_factor=getattr(settings, 'EMAIL_HTTP_BACKOFF_SECONDS', 0.5),
+                        raise_on_status=False,
+                    ),
+                )
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
 def send_email(action, recipient, data=None):
     """
     Send an email via the serverless Lambda function.
@@ -23,6 +162,7 @@ def send_email(action, recipient, data=None):
         bool: True if email was sent successfully
     
     Raises:
+        CircuitOpen: If the circuit breaker is open (nothing was sent)
         Exception: If the email service is unavailable or returns an error
     """
     email_service_url = getattr(settings, 'EMAIL_SERVICE_URL', None)
@@ -31,6 +171,10 @@ def send_email(action, recipient, data=None):
         logger.warning("EMAIL_SERVICE_URL not configured, skipping email")
         return False
     
+    if not circuit_breaker.allow():
+        logger.warning(f"Email service circuit open, not sending {action} to {recipient}")
+        raise CircuitOpen('Email service circuit open')
+    
     payload = {
         'action': action,
         'recipient': recipient,
@@ -38,12 +182,21 @@ def send_email(action, recipient, data=None):
     }
     
     try:
-        response = requests.post(
+        response = get_session().post(
             email_service_url,
             json=payload,
-            timeout=10  # 10 second timeout
+            timeout=(
+                getattr(settings, 'EMAIL_HTTP_CONNECT_TIMEOUT', 3),
+                getattr(settings, 'EMAIL_HTTP_TIMEOUT', 10)
+            )
         )
         
+        if response.status_code >= 500:
+            circuit_breaker.record_failure()
+        else:
+            # The service is up even if it rejected this message
+            circuit_breaker.record_success()
+        
         if response.status_code == 200:
             logger.info(f"Email sent successfully: {action} to {recipient}")
             return True
@@ -54,10 +207,12 @@ def send_email(action, recipient, data=None):
             return False
             
     except requests.exceptions.Timeout:
+        circuit_breaker.record_failure()
         logger.error(f"Email service timeout for action {action}")
         raise
         
     except requests.exceptions.ConnectionError:
+        circuit_breaker.record_failure()
         logger.warning(
             f"Could not connect to email service at {email_service_url}. "
             "Is serverless-offline running?"
@@ -66,10 +221,87 @@ def send_email(action, recipient, data=None):
         return False
         
     except Exception as e:
+        circuit_breaker.record_failure()
         logger.error(f"Email service error: {e}")
         raise
 
 
+def enqueue_email(action, recipient, data=None):
+    """
+    Queue an email for the email worker. Call inside the transaction that
+    caused it; it is sent only if that transaction commits.
+    
+    Args:
+        action: Email action type (SIGNUP_WELCOME, BOOKING_CONFIRMATION)
+        recipient: Email address to send to
+        data: Additional data for the email template
+    
+    Returns:
+        OutboxMessage: The queued message (its status records delivery)
+    """
+    from integrations.outbox import enqueue, email_message
+    
+    return enqueue(*email_message(action, recipient, data))
+
+
+def send_email_batch(messages):
+    """
+    Send several emails with one request to the email service's BATCH action.
+    
+    Args:
+        messages: List of {action, recipient, data} dicts
+    
+    Returns:
+        list: One entry per message, in order: None if it was sent,
+              otherwise the error message, or a CircuitOpen if the
+              circuit breaker refused the request
+    """
+    email_service_url = getattr(settings, 'EMAIL_SERVICE_URL', None)
+    
+    if not email_service_url:
+        logger.warning("EMAIL_SERVICE_URL not configured, skipping email")
+        return ['EMAIL_SERVICE_URL not configured'] * len(messages)
+    
+    if not circuit_breaker.allow():
+        logger.warning(f"Email service circuit open, not sending {len(messages)} email(s)")
+        return [CircuitOpen('Email service circuit open')] * len(messages)
+    
+    try:
+        response = get_session().post(
+            email_service_url,
+            json={'action': 'BATCH', 'items': messages},
+            timeout=(
+                getattr(settings, 'EMAIL_HTTP_CONNECT_TIMEOUT', 3),
+                getattr(settings, 'EMAIL_BATCH_HTTP_TIMEOUT', 30)
+            )
+        )
+    except requests.exceptions.RequestException as e:
+        circuit_breaker.record_failure()
+        logger.warning(f"Email service batch request failed: {e}")
+        return [f"Email service unavailable: {e}"] * len(messages)
+    
+    if response.status_code >= 500:
+        circuit_breaker.record_failure()
+    else:
+        circuit_breaker.record_success()
+    
+    if response.status_code != 200:
+        logger.error(
+            f"Email service returned error: {response.status_code} - {response.text}"
+        )
+        return [f"Email service returned {response.status_code}"] * len(messages)
+    
+    errors = ['Missing from email service response'] * len(messages)
+    for result in response.json().get('results', []):
+        index = result.get('index')
+        if isinstance(index, int) and 0 <= index < len(messages):
+            errors[index] = None if result.get('success') else (result.get('error') or 'Not sent')
+    
+    sent = errors.count(None)
+    logger.info(f"Email batch sent: {sent}/{len(messages)}")
+    return errors
+
+
 def send_welcome_email(user):
     """
     Send a welcome email to a newly registered user.
@@ -1,15 +1,134 @@
 import logging
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from itertools import accumulate
+import threading
 from django.conf import settings
+from google.auth.exceptions import RefreshError
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
+import httplib2
 import json
 
 logger = logging.getLogger(__name__)
 
+_local = threading.local()
+
+
+BATCH_LIMIT = 50  # Calendar API maximum requests per batch
+
+
+@lru_cache(maxsize=None)
+def _discovery_document():
+    """
+    Calendar v3 discovery document, loaded once from the copy bundled with googleapiclient.
+    
+    GOOGLE_API_ROOT_URL replaces the API host (including the batch endpoint),
+    e.g. to point at a local fake server.
+    """
+    document = json.loads(get_static_doc('calendar', 'v3'))
+    root_url = getattr(settings, 'GOOGLE_API_ROOT_URL', None)
+    if root_url:
+        document['rootUrl'] = root_url
+    return document
+
+
+def _transport():
+    """One keep-alive HTTP transport per worker thread (httplib2 is not thread-safe)."""
+    http = getattr(_local, 'http', None)
+    if http is None:
+        http = _local.http = httplib2.Http(timeout=getattr(settings, 'GOOGLE_HTTP_TIMEOUT', 10))
+    return http
+
+
+class CalendarClient:
+    """
+    A doctor's Calendar API client.
+    
+    Holds the doctor's Credentials, so the access token obtained on first use
+    is reused until it expires, and the pre-built events() resource.
+    """
+    
+    def __init__(self, refresh_token, credentials):
+        self.refresh_token = refresh_token
+        self.credentials = credentials
+        self.service = build_from_document(_discovery_document(), http=self.http)
+        self.events = self.service.events()
+    
+    @property
+    def http(self):
+        return AuthorizedHttp(self.credentials, http=_transport())
+    
+    def execute(self, request):
+        """Execute an API request on the current thread's transport."""
+        return request.execute(http=self.http)
+
+
+class CalendarClientCache:
+    """Per-doctor LRU cache of CalendarClient instances, with hit/miss counters."""
+    
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, user_id, refresh_token, factory):
+        """Return the cached client for user_id, building it with factory() on a miss."""
+        with self._lock:
+            client = self._clients.get(user_id)
+            # A reconnected calendar comes with a new refresh token
+            if client is not None and client.refresh_token == refresh_token:
+                self._clients.move_to_end(user_id)
+                self.hits += 1
+                return client
+            self.misses += 1
+        
+        client = factory()
+        if client is None:
+            return None
+        
+        with self._lock:
+            self._clients[user_id] = client
+            self._clients.move_to_end(user_id)
+            while len(self._clients) > self.maxsize:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+        return client
+    
+    def invalidate(self, user_id):
+        with self._lock:
+            self._clients.pop(user_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self.hits = self.misses = self.evictions = 0
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._clients),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
 class GoogleCalendarService:
     SCOPES = ['https://www.googleapis.com/auth/calendar.events']
+    TOKEN_URI = 'https://oauth2.googleapis.com/token'
+    
+    clients = CalendarClientCache(getattr(settings, 'GOOGLE_CLIENT_CACHE_SIZE', 256))
     
     @staticmethod
     def get_flow(redirect_uri=None):
@@ -21,7 +140,7 @@ class GoogleCalendarService:
                         "client_id": settings.GOOGLE_CLIENT_ID,
                         "client_secret": settings.GOOGLE_CLIENT_SECRET,
                         "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                        "token_uri": "https://oauth2.googleapis.com/token",
+                        "token_uri": getattr(settings, 'GOOGLE_TOKEN_URI', GoogleCalendarService.TOKEN_URI),
                     }
                 },
                 scopes=GoogleCalendarService.SCOPES,
@@ -41,7 +160,7 @@ class GoogleCalendarService:
             creds = Credentials(
                 None,  # Access token (will be refreshed)
                 refresh_token=user.profile.google_refresh_token,
-                token_uri="https://oauth2.googleapis.com/token",
+                token_uri=getattr(settings, 'GOOGLE_TOKEN_URI', GoogleCalendarService.TOKEN_URI),
                 client_id=settings.GOOGLE_CLIENT_ID,
                 client_secret=settings.GOOGLE_CLIENT_SECRET,
                 scopes=GoogleCalendarService.SCOPES
@@ -52,18 +171,23 @@ class GoogleCalendarService:
             return None
 
     @staticmethod
-    def create_event(booking):
-        """Create a calendar event for a booking."""
-        doctor = booking.doctor
-        
-        creds = GoogleCalendarService.get_credentials(doctor)
-        if not creds:
-            logger.info(f"Doctor {doctor.username} does not have Google Calendar connected.")
+    def get_client(user):
+        """Get the cached Calendar client for user, or None if not connected."""
+        if not hasattr(user, 'profile') or not user.profile.google_refresh_token:
             return None
-            
-        service = build('calendar', 'v3', credentials=creds)
         
-        event_data = {
+        def factory():
+            creds = GoogleCalendarService.get_credentials(user)
+            return CalendarClient(user.profile.google_refresh_token, creds) if creds else None
+        
+        return GoogleCalendarService.clients.get(
+            user.id, user.profile.google_refresh_token, factory
+        )
+
+    @staticmethod
+    def event_body(booking):
+        """Calendar event resource for a booking."""
+        return {
             'summary': f"Appointment with {booking.patient.get_full_name() or booking.patient.username}",
             'description': f"Notes: {booking.notes}",
             'start': {
@@ -80,22 +204,63 @@ class GoogleCalendarService:
             'reminders': {
                 'useDefault': True,
             },
+            # Lets pull_busy_times() recognise events HMS created itself
+            'extendedProperties': {
+                'private': {'hms_booking_id': str(booking.id)},
+            },
         }
+
+    @staticmethod
+    def insert_event(booking):
+        """
+        Create a calendar event for a booking and save its ID.
+        
+        Returns:
+            str: The event ID, or None if the doctor has no calendar connected
+        
+        Raises:
+            HttpError, RefreshError: The insert failed; the outbox retries it
+        """
+        doctor = booking.doctor
+        
+        client = GoogleCalendarService.get_client(doctor)
+        if not client:
+            logger.info(f"Doctor {doctor.username} does not have Google Calendar connected.")
+            return None
+        
+        event_data = GoogleCalendarService.event_body(booking)
         
         try:
-            event = service.events().insert(calendarId='primary', body=event_data).execute()
-            logger.info(f"Google Calendar event created: {event.get('id')}")
-            
-            # Save event ID to booking
-            booking.google_event_id = event.get('id')
-            booking.save(update_fields=['google_event_id'])
-            
-            return event.get('id')
+            event = client.execute(client.events.insert(calendarId='primary', body=event_data))
+        except RefreshError:
+            # Refresh token revoked or expired; drop the cached client
+            GoogleCalendarService.clients.invalidate(doctor.id)
+            raise
+        
+        if not event.get('id'):
+            raise ValueError(f"Google Calendar returned no event id for booking {booking.id}")
+        logger.info(f"Google Calendar event created: {event['id']}")
+        
+        # Save event ID to booking
+        booking.google_event_id = event['id']
+        booking.save(update_fields=['google_event_id'])
+        
+        return event['id']
+
+    @staticmethod
+    def create_event(booking):
+        """Create a calendar event for a booking. Logs failures and returns None."""
+        try:
+            return GoogleCalendarService.insert_event(booking)
             
         except HttpError as error:
             logger.error(f"An error occurred creating Google Calendar event: {error}")
             return None
             
+        except RefreshError as error:
+            logger.error(f"Google credentials rejected for {booking.doctor.username}: {error}")
+            return None
+            
     @staticmethod
     def delete_event(booking):
         """Delete a calendar event."""
@@ -103,14 +268,12 @@ class GoogleCalendarService:
             return
             
         doctor = booking.doctor
-        creds = GoogleCalendarService.get_credentials(doctor)
-        if not creds:
+        client = GoogleCalendarService.get_client(doctor)
+        if not client:
             return
-            
-        service = build('calendar', 'v3', credentials=creds)
         
         try:
-            service.events().delete(calendarId='primary', eventId=booking.google_event_id).execute()
+            client.execute(client.events.delete(calendarId='primary', eventId=booking.google_event_id))
             logger.info(f"Google Calendar event deleted: {booking.google_event_id}")
             
             booking.google_event_id = ''
@@ -118,3 +281,249 @@ class GoogleCalendarService:
             
         except HttpError as error:
             logger.error(f"An error occurred deleting Google Calendar event: {error}")
+            
+        except RefreshError as error:
+            GoogleCalendarService.clients.invalidate(doctor.id)
+            logger.error(f"Google credentials rejected for {doctor.username}: {error}")
+
+    @staticmethod
+    def sync_pending_bookings(doctor=None, batch_size=BATCH_LIMIT):
+        """
+        Push every booking without a google_event_id to its doctor's calendar.
+        
+        Bookings are grouped per doctor and sent through the Calendar batch
+        endpoint, up to 50 inserts per HTTP request. Returned event IDs are
+        written back with a single bulk_update.
+        
+        Args:
+            doctor: Optional User to restrict the sync to one doctor
+            batch_size: Inserts per batch request (capped at 50)
+        
+        Returns:
+            dict: {doctors, created, failed}
+        """
+        from itertools import groupby
+        from scheduling.models import Booking
+        
+        batch_size = max(1, min(batch_size, BATCH_LIMIT))
+        
+        pending = Booking.objects.filter(
+            google_event_id='',
+        ).exclude(
+            doctor__profile__google_refresh_token='',
+        ).select_related(
+            'doctor', 'doctor__profile', 'patient', 'slot'
+        ).order_by('doctor_id', 'id')
+        
+        if doctor is not None:
+            pending = pending.filter(doctor=doctor)
+        
+        synced = []
+        stats = {'doctors': 0, 'created': 0, 'failed': 0}
+        
+        for _, group in groupby(pending.iterator(chunk_size=500), key=lambda b: b.doctor_id):
+            bookings = list(group)
+            client = GoogleCalendarService.get_client(bookings[0].doctor)
+            if not client:
+                continue
+            
+            stats['doctors'] += 1
+            by_id = {str(b.id): b for b in bookings}
+            
+            def callback(request_id, event, exception):
+                if exception is not None:
+                    stats['failed'] += 1
+                    logger.error(f"Batch insert failed for booking {request_id}: {exception}")
+                    return
+                booking = by_id[request_id]
+                booking.google_event_id = event.get('id', '')
+                synced.append(booking)
+            
+            for start in range(0, len(bookings), batch_size):
+                batch = client.service.new_batch_http_request(callback=callback)
+                for booking in bookings[start:start + batch_size]:
+                    batch.add(
+                        client.events.insert(
+                            calendarId='primary',
+                            body=GoogleCalendarService.event_body(booking)
+                        ),
+                        request_id=str(booking.id)
+                    )
+                try:
+                    batch.execute(http=client.http)
+                except HttpError as error:
+                    stats['failed'] += len(bookings[start:start + batch_size])
+                    logger.error(f"Batch request failed for Dr. {bookings[0].doctor.username}: {error}")
+                except RefreshError as error:
+                    # Every remaining batch for this doctor would fail the same way
+                    stats['failed'] += len(bookings) - start
+                    GoogleCalendarService.clients.invalidate(bookings[0].doctor_id)
+                    logger.error(f"Google credentials rejected for Dr. {bookings[0].doctor.username}: {error}")
+                    break
+        
+        if synced:
+            Booking.objects.bulk_update(synced, ['google_event_id'], batch_size=500)
+        stats['created'] = len(synced)
+        
+        logger.info(
+            f"Google Calendar sync: {stats['created']} event(s) created for "
+            f"{stats['doctors']} doctor(s), {stats['failed']} failed"
+        )
+        return stats
+
+    @staticmethod
+    def _busy_interval(event):
+        """(start, end) in UTC for an event that blocks time, or None."""
+        if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+            return None
+        if event.get('extendedProperties', {}).get('private', {}).get('hms_booking_id'):
+            return None
+        
+        def parse(edge):
+            if 'dateTime' in edge:
+                return datetime.fromisoformat(edge['dateTime']).astimezone(dt_timezone.utc)
+            # All-day event
+            return datetime.combine(datetime.fromisoformat(edge['date']).date(), time.min, dt_timezone.utc)
+        
+        try:
+            return parse(event['start']), parse(event['end'])
+        except (KeyError, ValueError):
+            return None
+
+    @staticmethod
+    def _list_changes(client, sync_token):
+        """
+        Page through events.list. Returns (events, next_sync_token).
+        
+        With a sync token only events changed since that token are returned;
+        without one, events ending before GOOGLE_SYNC_PAST_DAYS ago are skipped.
+        Raises HttpError 410 when Google has invalidated the token.
+        """
+        events = []
+        params = {'calendarId': 'primary', 'singleEvents': True, 'maxResults': 250}
+        if sync_token:
+            params['syncToken'] = sync_token
+        else:
+            # Full sync: skip past events (and their expanded recurring
+            # instances). Sync token requests cannot take timeMin.
+            margin = timedelta(days=getattr(settings, 'GOOGLE_SYNC_PAST_DAYS', 1))
+            params['timeMin'] = (datetime.now(dt_timezone.utc) - margin).isoformat()
+        
+        page_token = None
+        while True:
+            response = client.execute(client.events.list(pageToken=page_token, **params))
+            events.extend(response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return events, response.get('nextSyncToken', '')
+
+    @staticmethod
+    def pull_busy_times(doctor):
+        """
+        Incrementally pull a doctor's busy time and block overlapping slots.
+        
+        Uses the nextSyncToken stored on the doctor's profile so only changed
+        events are fetched. A full resync happens only on the first pull or
+        when Google invalidates the token (HTTP 410).
+        
+        Returns:
+            dict: {full, changed, blocked, unblocked}, or None if not connected
+        """
+        from integrations.models import GoogleBusyEvent
+        from scheduling.models import AvailabilitySlot
+        from scheduling.signals import slots_changed
+        from django.db import transaction
+        from django.utils import timezone
+        
+        client = GoogleCalendarService.get_client(doctor)
+        if not client:
+            return None
+        
+        profile = doctor.profile
+        full = not profile.google_sync_token
+        
+        try:
+            try:
+                events, next_token = GoogleCalendarService._list_changes(client, profile.google_sync_token)
+            except HttpError as error:
+                if full or error.resp.status != 410:
+                    raise
+                logger.info(f"Sync token for Dr. {doctor.username} expired, running full resync")
+                full = True
+                events, next_token = GoogleCalendarService._list_changes(client, '')
+        except HttpError as error:
+            logger.error(f"Failed to pull Google Calendar for Dr. {doctor.username}: {error}")
+            return None
+        except RefreshError as error:
+            GoogleCalendarService.clients.invalidate(doctor.id)
+            logger.error(f"Google credentials rejected for {doctor.username}: {error}")
+            return None
+        
+        now = timezone.now()
+        changed_ids = {e['id'] for e in events if 'id' in e}
+        busy = []
+        for event in events:
+            interval = GoogleCalendarService._busy_interval(event)
+            if interval and interval[1] > now:
+                busy.append(GoogleBusyEvent(
+                    doctor=doctor, event_id=event['id'], start=interval[0], end=interval[1]
+                ))
+        
+        with transaction.atomic():
+            existing = GoogleBusyEvent.objects.filter(doctor=doctor)
+            if not full:
+                existing = existing.filter(event_id__in=changed_ids)
+            
+            # Time that may change state: where changed events were and are now
+            affected = [(b.start, b.end) for b in existing] + [(b.start, b.end) for b in busy]
+            existing.delete()
+            GoogleBusyEvent.objects.bulk_create(busy)
+            
+            slots = AvailabilitySlot.objects.filter(doctor=doctor, date__gte=now.date())
+            if not full:
+                if not affected:
+                    slots = slots.none()
+                else:
+                    slots = slots.filter(
+                        date__gte=min(start for start, _ in affected).date(),
+                        date__lte=max(end for _, end in affected).date(),
+                    )
+            
+            rows = list(slots.values_list('id', 'date', 'start_time', 'end_time', 'is_blocked'))
+            blocked, unblocked = [], []
+            if rows:
+                blocks = sorted(GoogleBusyEvent.objects.filter(
+                    doctor=doctor,
+                    start__lt=datetime.combine(max(r[1] for r in rows), time.max, dt_timezone.utc),
+                    end__gt=datetime.combine(min(r[1] for r in rows), time.min, dt_timezone.utc),
+                ).values_list('start', 'end'))
+                
+                # Sorted sweep: a slot overlaps a block iff some block starting
+                # before the slot ends also ends after the slot starts.
+                starts = [b_start for b_start, _ in blocks]
+                max_end = list(accumulate((b_end for _, b_end in blocks), max))
+                
+                for slot_id, day, start_time, end_time, is_blocked in rows:
+                    start = datetime.combine(day, start_time, dt_timezone.utc)
+                    end = datetime.combine(day, end_time, dt_timezone.utc)
+                    k = bisect_left(starts, end)
+                    overlaps = k > 0 and max_end[k - 1] > start
+                    if overlaps and not is_blocked:
+                        blocked.append(slot_id)
+                    elif is_blocked and not overlaps:
+                        unblocked.append(slot_id)
+            
+            if blocked:
+                AvailabilitySlot.objects.filter(id__in=blocked).update(is_blocked=True)
+            if unblocked:
+                AvailabilitySlot.objects.filter(id__in=unblocked).update(is_blocked=False)
+            
+            profile.google_sync_token = next_token
+            profile.save(update_fields=['google_sync_token'])
+        
+        if blocked or unblocked:
+            slots_changed.send(sender=GoogleCalendarService, doctor_ids=[doctor.id])
+        
+        stats = {'full': full, 'changed': len(changed_ids), 'blocked': len(blocked), 'unblocked': len(unblocked)}
+        logger.info(f"Google Calendar pull for Dr. {doctor.username}: {stats}")
+        return stats
@@ -0,0 +1,281 @@
+"""
+Tests for the Google Calendar service and the email client.
+
+FakeGoogle stands in for Google (GOOGLE_API_ROOT_URL and GOOGLE_TOKEN_URI):
+it answers event inserts, alone or as parts of a batch request, with 200 or,
+for selected bookings, an error, and records the query of every event list. integrations.tests reuses it for the outbox.
+"""
+
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import re
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from accounts.models import UserProfile
+from scheduling.models import AvailabilitySlot, Booking
+from services import email_client, google_calendar
+from services.google_calendar import GoogleCalendarService
+
+
+class FakeGoogle(BaseHTTPRequestHandler):
+    """
+    Token, events.list, events.insert and batch endpoints. Inserts for
+    bookings in `failing` get `failing_status`; token refreshes fail unless
+    `token_status` is 200; events.list answers 410 to `expired_token`.
+    """
+
+    failing = set()
+    failing_status = 403
+    token_status = 200
+    expired_token = 'expired'
+    batches = 0
+    inserted = []
+    listed = []
+    event_ids = itertools.count(1)
+
+    @classmethod
+    def reset(cls):
+        cls.failing = set()
+        cls.failing_status = 403
+        cls.token_status = 200
+        cls.batches = 0
+        cls.inserted = []
+        cls.listed = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json'):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not self.path.startswith('/calendar/v3/calendars/primary/events'):
+            return self._send(404, '{}')
+
+        query = parse_qs(urlsplit(self.path).query)
+        FakeGoogle.listed.append(query)
+        if query.get('syncToken') == [FakeGoogle.expired_token]:
+            return self._send(410, json.dumps({'error': {'code': 410, 'message': 'Sync token expired'}}))
+        self._send(200, json.dumps({'items': [], 'nextSyncToken': f'sync{len(FakeGoogle.listed)}'}))
+
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+
+        if self.path.startswith('/token'):
+            if FakeGoogle.token_status != 200:
+                return self._send(FakeGoogle.token_status, json.dumps({'error': 'invalid_grant'}))
+            return self._send(200, json.dumps({'access_token': 'token', 'expires_in': 3600, 'token_type': 'Bearer'}))
+
+        if self.path.startswith('/calendar/v3/calendars/primary/events'):
+            return self._send(*self.insert(data))
+
+        if not self.path.startswith('/batch'):
+            return self._send(404, '{}')
+
+        FakeGoogle.batches += 1
+        boundary = self.headers['Content-Type'].split('boundary=')[1].strip('"')
+        parts = []
+        for part in data.split(f'--{boundary}')[1:-1]:
+            content_id = re.search(r'Content-ID: <([^>]+)>', part).group(1)
+            code, body = self.insert(part)
+            status = '200 OK' if code == 200 else f'{code} Error'
+
+            parts.append(
+                f'--batch_response\r\nContent-Type: application/http\r\n'
+                f'Content-ID: <response-{content_id}>\r\n\r\n'
+                f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                f'Content-Length: {len(body)}\r\n\r\n{body}\r\n'
+            )
+        self._send(200, ''.join(parts) + '--batch_response--\r\n', 'multipart/mixed; boundary=batch_response')
+
+    def insert(self, request):
+        """(status, body) for one events.insert request."""
+        booking_id = int(re.search(r'"hms_booking_id": "(\d+)"', request).group(1))
+        if booking_id in FakeGoogle.failing:
+            return FakeGoogle.failing_status, json.dumps(
+                {'error': {'code': FakeGoogle.failing_status, 'message': 'Rejected'}}
+            )
+        FakeGoogle.inserted.append(booking_id)
+        return 200, json.dumps({'id': f'ev{next(FakeGoogle.event_ids)}'})
+
+
+class FakeGoogleMixin:
+    """Runs FakeGoogle for the test case and points the Google settings at it."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGoogle)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        root_url = f'http://127.0.0.1:{cls.server.server_address[1]}/'
+
+        cls.settings_override = override_settings(
+            GOOGLE_API_ROOT_URL=root_url,
+            GOOGLE_TOKEN_URI=f'{root_url}token',
+            GOOGLE_CLIENT_ID='client-id',
+            GOOGLE_CLIENT_SECRET='client-secret',
+        )
+        cls.settings_override.enable()
+        google_calendar._discovery_document.cache_clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.settings_override.disable()
+        google_calendar._discovery_document.cache_clear()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        FakeGoogle.reset()
+        GoogleCalendarService.clients.clear()
+
+
+class SyncPendingBookingsTests(FakeGoogleMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.doctor = self.make_user('doctor', 'DOCTOR', google_refresh_token='refresh-token')
+        self.unconnected = self.make_user('unconnected', 'DOCTOR')
+        patient = self.make_user('patient', 'PATIENT')
+
+        self.bookings = [self.book(self.doctor, patient, hour) for hour in range(8, 14)]
+        self.unconnected_booking = self.book(self.unconnected, patient, 8)
+
+    def make_user(self, username, role, **profile):
+        user = User.objects.create_user(username=username, email=f'{username}@example.com', password='pw12345678')
+        UserProfile.objects.create(user=user, role=role, **profile)
+        return user
+
+    def book(self, doctor, patient, hour):
+        slot = AvailabilitySlot.objects.create(
+            doctor=doctor, date=date.today() + timedelta(days=1),
+            start_time=time(hour), end_time=time(hour, 30), is_booked=True
+        )
+        return Booking.objects.create(patient=patient, doctor=doctor, slot=slot)
+
+    def event_ids(self):
+        return dict(Booking.objects.values_list('id', 'google_event_id'))
+
+    def test_mixed_batch_response(self):
+        failed = {self.bookings[1].id, self.bookings[4].id}
+        FakeGoogle.failing = failed
+
+        stats = GoogleCalendarService.sync_pending_bookings(batch_size=4)
+
+        self.assertEqual(stats, {'doctors': 1, 'created': 4, 'failed': 2})
+        self.assertEqual(FakeGoogle.batches, 2)
+        event_ids = self.event_ids()
+        for booking in self.bookings:
+            if booking.id in failed:
+                self.assertEqual(event_ids[booking.id], '')
+            else:
+                self.assertTrue(event_ids[booking.id].startswith('ev'))
+        self.assertEqual(event_ids[self.unconnected_booking.id], '')
+        self.assertEqual(len(set(event_ids.values()) - {''}), 4)
+
+    def test_failed_inserts_are_retried(self):
+        FakeGoogle.failing = {self.bookings[0].id}
+        FakeGoogle.failing_status = 400
+        GoogleCalendarService.sync_pending_bookings()
+
+        FakeGoogle.failing = set()
+        FakeGoogle.inserted = []
+        stats = GoogleCalendarService.sync_pending_bookings()
+
+        # Only the booking that failed is sent again
+        self.assertEqual(FakeGoogle.inserted, [self.bookings[0].id])
+        self.assertEqual(stats, {'doctors': 1, 'created': 1, 'failed': 0})
+        self.assertNotIn('', [self.event_ids()[booking.id] for booking in self.bookings])
+
+
+class PullBusyTimesTests(FakeGoogleMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.doctor = User.objects.create_user(username='doctor', password='pw12345678')
+        UserProfile.objects.create(user=self.doctor, role='DOCTOR', google_refresh_token='refresh-token')
+
+    def pull(self, sync_token):
+        self.doctor.profile.google_sync_token = sync_token
+        self.doctor.profile.save(update_fields=['google_sync_token'])
+        return GoogleCalendarService.pull_busy_times(self.doctor)
+
+    def test_full_sync_starts_at_time_min(self):
+        self.assertTrue(self.pull('')['full'])
+
+        query = FakeGoogle.listed[0]
+        self.assertNotIn('syncToken', query)
+        time_min = datetime.fromisoformat(query['timeMin'][0])
+        self.assertLess(abs(time_min - (datetime.now(dt_timezone.utc) - timedelta(days=1))), timedelta(minutes=1))
+
+    def test_incremental_sync_has_no_time_min(self):
+        self.assertFalse(self.pull('token')['full'])
+
+        self.assertEqual(FakeGoogle.listed[0]['syncToken'], ['token'])
+        self.assertNotIn('timeMin', FakeGoogle.listed[0])
+
+    def test_expired_token_resync_starts_at_time_min(self):
+        self.assertTrue(self.pull(FakeGoogle.expired_token)['full'])
+
+        self.assertEqual(len(FakeGoogle.listed), 2)
+        self.assertNotIn('timeMin', FakeGoogle.listed[0])
+        self.assertIn('timeMin', FakeGoogle.listed[1])
+        self.assertNotIn('syncToken', FakeGoogle.listed[1])
+
+
+class FailingEmailService(BaseHTTPRequestHandler):
+    """Answers every request with 503 and counts them."""
+
+    requests = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        FailingEmailService.requests += 1
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@override_settings(EMAIL_HTTP_RETRIES=2, EMAIL_HTTP_BACKOFF_SECONDS=0)
+class EmailRetryTests(TestCase):
+
+    def setUp(self):
+        email_client._session = None
+        FailingEmailService.requests = 0
+        self.addCleanup(email_client.circuit_breaker.record_success)
+        self.addCleanup(setattr, email_client, '_session', None)
+
+    def test_server_errors_are_not_retried(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FailingEmailService)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        with override_settings(EMAIL_SERVICE_URL=f'http://127.0.0.1:{server.server_address[1]}/'):
+            errors = email_client.send_email_batch([{'action': 'SIGNUP_WELCOME', 'recipient': 'a@example.com'}])
+
+        self.assertEqual(errors, ['Email service returned 503'])
+        self.assertEqual(FailingEmailService.requests, 1)
+
+    def test_connection_errors_are_retried(self):
+        retry = email_client.get_session().get_adapter('http://').max_retries
+
+        self.assertEqual((retry.connect, retry.read, retry.status, retry.other), (2, 0, 0, 0))
+        self.assertFalse(retry.status_forcelist)
@@ -20,7 +20,9 @@ export default function DoctorDashboard() {
     const [activeTab, setActiveTab] = useState('slots');
     const [slots, setSlots] = useState([]);
     const [bookings, setBookings] = useState([]);
+    const [bookingsCursor, setBookingsCursor] = useState(null);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [error, setError] = useState(null);
 
     // Slot creation state
@@ -37,18 +39,25 @@ export default function DoctorDashboard() {
 
     useEffect(() => {
         loadData();
-    }, [activeTab]);
+    }, [activeTab, currentWeek]);
 
     const loadData = async () => {
         setLoading(true);
         setError(null);
         try {
             if (activeTab === 'slots') {
-                const data = await slotService.getSlots({ show_booked: 'true' });
-                setSlots(data);
+                // Only the week on screen; a week of slots fits in one page
+                const { rows } = await slotService.getSlots({
+                    show_booked: 'true',
+                    date_from: format(currentWeek, 'yyyy-MM-dd'),
+                    date_to: format(addDays(currentWeek, 6), 'yyyy-MM-dd'),
+                    page_size: 1000
+                });
+                setSlots(rows);
             } else {
-                const data = await bookingService.getBookings();
-                setBookings(data);
+                const { rows, nextCursor } = await bookingService.getBookings();
+                setBookings(rows);
+                setBookingsCursor(nextCursor);
             }
         } catch (err) {
             setError('Failed to load data');
@@ -58,6 +67,19 @@ export default function DoctorDashboard() {
         }
     };
 
+    const loadMoreBookings = async () => {
+        setLoadingMore(true);
+        try {
+            const { rows, nextCursor } = await bookingService.getBookings({ cursor: bookingsCursor });
+            setBookings([...bookings, ...rows]);
+            setBookingsCursor(nextCursor);
+        } catch (err) {
+            setError('Failed to load more appointments');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleCreateSlot = async (e) => {
         e.preventDefault();
         setCreateLoading(true);
@@ -120,7 +142,7 @@ export default function DoctorDashboard() {
             <div className="grid grid-cols-1 md:grid-cols-4 gap-4 mb-8">
                 <StatCard
                     icon={<Calendar className="w-6 h-6" />}
-                    label="Total Slots"
+                    label="Slots This Week"
                     value={totalSlots}
                     color="primary"
                 />
@@ -266,6 +288,17 @@ export default function DoctorDashboard() {
                             {bookings.map((booking) => (
                                 <BookingCard key={booking.id} booking={booking} />
                             ))}
+                            {bookingsCursor && (
+                                <button
+                                    onClick={loadMoreBookings}
+                                    disabled={loadingMore}
+                                    className="btn-secondary w-full"
+                                >
+                                    {loadingMore ? (
+                                        <><Loader2 className="w-4 h-4 animate-spin mr-2" /> Loading...</>
+                                    ) : 'Load more'}
+                                </button>
+                            )}
                         </div>
                     )}
                 </div>
@@ -20,7 +20,9 @@ export default function PatientDashboard() {
     const [activeTab, setActiveTab] = useState('doctors');
     const [doctors, setDoctors] = useState([]);
     const [bookings, setBookings] = useState([]);
+    const [bookingsCursor, setBookingsCursor] = useState(null);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [error, setError] = useState(null);
     const [searchQuery, setSearchQuery] = useState('');
 
@@ -45,8 +47,9 @@ export default function PatientDashboard() {
                 const data = await doctorService.getDoctors();
                 setDoctors(data);
             } else {
-                const data = await bookingService.getBookings();
-                setBookings(data);
+                const { rows, nextCursor } = await bookingService.getBookings();
+                setBookings(rows);
+                setBookingsCursor(nextCursor);
             }
         } catch (err) {
             setError('Failed to load data');
@@ -56,6 +59,19 @@ export default function PatientDashboard() {
         }
     };
 
+    const loadMoreBookings = async () => {
+        setLoadingMore(true);
+        try {
+            const { rows, nextCursor } = await bookingService.getBookings({ cursor: bookingsCursor });
+            setBookings([...bookings, ...rows]);
+            setBookingsCursor(nextCursor);
+        } catch (err) {
+            setError('Failed to load more appointments');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleSelectDoctor = async (doctor) => {
         setSelectedDoctor(doctor);
         setLoadingSlots(true);
@@ -155,7 +171,7 @@ export default function PatientDashboard() {
                 <StatCard
                     icon={<Star className="w-6 h-6" />}
                     label="Total Bookings"
-                    value={bookings.length}
+                    value={bookingsCursor ? `${bookings.length}+` : bookings.length}
                     color="navy"
                 />
             </div>
@@ -234,6 +250,17 @@ export default function PatientDashboard() {
                             {bookings.map((booking) => (
                                 <PatientBookingCard key={booking.id} booking={booking} />
                             ))}
+                            {bookingsCursor && (
+                                <button
+                                    onClick={loadMoreBookings}
+                                    disabled={loadingMore}
+                                    className="btn-secondary w-full"
+                                >
+                                    {loadingMore ? (
+                                        <><Loader2 className="w-4 h-4 animate-spin mr-2" /> Loading...</>
+                                    ) : 'Load more'}
+                                </button>
+                            )}
                         </div>
                     )}
                 </div>
@@ -1,13 +1,19 @@
 import api from './api';
 
+// Slot and booking lists are cursor-paginated: each call returns one page as
+// { rows, nextCursor }. Pass nextCursor back as `cursor` to load the next one;
+// it is null on the last page.
+const getPage = async (url, params = {}) => {
+    const response = await api.get(url, { params });
+    return { rows: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+};
+
 // ==================== Slot Services ====================
 
 export const slotService = {
-    // Get all slots (doctors see their own, patients see available)
-    getSlots: async (params = {}) => {
-        const response = await api.get('/slots/', { params });
-        return response.data;
-    },
+    // Get a page of slots (doctors see their own, patients see available),
+    // e.g. { date_from, date_to, show_booked, page_size, cursor }
+    getSlots: async (params = {}) => getPage('/slots/', params),
 
     // Create a new slot (doctor only)
     createSlot: async (slotData) => {
@@ -21,11 +27,24 @@ export const slotService = {
         return response.data;
     },
 
+    // Create slots from a weekly rule, e.g.
+    // { weeks: 12, weekdays: [0, 1, 2, 3, 4], start_time: '09:00', end_time: '17:00', slot_minutes: 20 }
+    createRecurringSlots: async (recurrence) => {
+        const response = await api.post('/slots/bulk/', { recurrence });
+        return response.data;
+    },
+
     // Delete a slot (doctor only)
     deleteSlot: async (slotId) => {
         await api.delete(`/slots/${slotId}/`);
     },
 
+    // Earliest free slots across doctors, e.g. { specialization, time_from, limit }
+    getNextAvailable: async (params = {}) => {
+        const response = await api.get('/slots/next-available/', { params });
+        return response.data;
+    },
+
     // Get available slots for a specific doctor (patient only)
     getDoctorSlots: async (doctorId, params = {}) => {
         const response = await api.get(`/doctors/${doctorId}/slots/`, { params });
@@ -33,15 +52,36 @@ export const slotService = {
     },
 };
 
-// ==================== Booking Services ====================
+// ==================== Availability Template Services ====================
 
-export const bookingService = {
-    // Get all bookings
-    getBookings: async (params = {}) => {
-        const response = await api.get('/bookings/', { params });
+export const templateService = {
+    // Weekly templates (doctor only); occurrences appear in slot lists with ids like "tpl-..."
+    getTemplates: async () => {
+        const response = await api.get('/templates/');
+        return response.data;
+    },
+
+    createTemplate: async (templateData) => {
+        const response = await api.post('/templates/', templateData);
         return response.data;
     },
 
+    updateTemplate: async (templateId, templateData) => {
+        const response = await api.patch(`/templates/${templateId}/`, templateData);
+        return response.data;
+    },
+
+    deleteTemplate: async (templateId) => {
+        await api.delete(`/templates/${templateId}/`);
+    },
+};
+
+// ==================== Booking Services ====================
+
+export const bookingService = {
+    // Get a page of bookings, ordered by appointment time, e.g. { show_past, cursor }
+    getBookings: async (params = {}) => getPage('/bookings/', params),
+
     // Create a booking (patient only)
     createBooking: async (slotId, notes = '') => {
         const response = await api.post('/bookings/', { slot_id: slotId, notes });
@@ -53,15 +93,35 @@ export const bookingService = {
         const response = await api.get(`/bookings/${bookingId}/`);
         return response.data;
     },
+
+    // Get a doctor's schedule for a day (default tomorrow), as in the digest email
+    getDigest: async (date) => {
+        const response = await api.get('/bookings/digest/', { params: date ? { date } : {} });
+        return response.data;
+    },
 };
 
 // ==================== Doctor Services ====================
 
 export const doctorService = {
-    // Get list of all doctors (patient only)
-    getDoctors: async () => {
-        const response = await api.get('/auth/doctors/');
-        return response.data;
+    // Get doctors (patient only), e.g. { specialization, q, page, page_size }.
+    // Without `page`, follows the Link header and returns every match.
+    getDoctors: async (params = {}) => {
+        if (params.page) {
+            const response = await api.get('/auth/doctors/', { params });
+            return response.data;
+        }
+
+        const doctors = [];
+        let page = 1;
+        let more = true;
+        while (more) {
+            const response = await api.get('/auth/doctors/', { params: { page_size: 500, ...params, page } });
+            doctors.push(...response.data);
+            more = Boolean(response.headers.link);
+            page += 1;
+        }
+        return doctors;
     },
 };
 
@@ -0,0 +1,184 @@
+"""
+Benchmark the email Lambda handler locally.
+
+Measures:
+    - cold start: importing the handler in a fresh interpreter, plus the
+      first invocation, as a new Lambda container would
+    - warm invocations: one message per request, and BATCH requests with
+      identical and with distinct messages
+
+SMTP is replaced by a no-op server, so the numbers are the handler's own
+overhead (parsing, templates, MIME encoding), not network time.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --runs 20 --invocations 2000
+    python benchmark.py --handler /path/to/other/handler.py   # compare a revision
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+BOOKING = {
+    'action': 'BOOKING_CONFIRMATION',
+    'recipient': 'patient@example.com',
+    'data': {
+        'patient_name': 'Jane Doe',
+        'doctor': 'John Smith',
+        'specialization': 'Cardiology',
+        'date': '2025-01-06',
+        'time': '09:00:00',
+        'notes': 'Follow-up',
+    },
+}
+
+COLD_START = """
+import sys, time, json
+sys.path.insert(0, {here!r})
+from benchmark import NullSMTP
+sys.path.insert(0, {directory!r})
+started = time.perf_counter()
+import {module} as handler
+imported = time.perf_counter()
+handler.smtplib.SMTP = NullSMTP
+response = handler.send_email({{'body': json.dumps({event!r})}}, None)
+assert response['statusCode'] == 200, response
+print(json.dumps([imported - started, time.perf_counter() - imported]))
+"""
+
+
+class NullSMTP:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def noop(self):
+        return (250, b'OK')
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        return {}
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def environment():
+    env = dict(os.environ)
+    env.setdefault('SMTP_USER', 'benchmark@example.com')
+    env.setdefault('SMTP_PASS', 'benchmark')
+    # Skip .env lookup as a deployed Lambda would
+    env.setdefault('AWS_LAMBDA_FUNCTION_NAME', 'benchmark')
+    return env
+
+
+def load_handler(path):
+    spec = importlib.util.spec_from_file_location('benchmarked_handler', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.smtplib.SMTP = NullSMTP
+    return module
+
+
+def cold_start(path, runs):
+    directory, filename = os.path.split(os.path.abspath(path))
+    script = COLD_START.format(directory=directory, module=filename[:-3], event=BOOKING, here=HERE)
+    imports, firsts = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, '-c', script], env=environment(),
+            capture_output=True, text=True, check=True
+        ).stdout
+        imported, first = json.loads(out.strip().splitlines()[-1])
+        imports.append(imported)
+        firsts.append(first)
+    return imports, firsts
+
+
+def booking(i):
+    """A booking confirmation that differs from booking(j) for i != j."""
+    return {
+        **BOOKING,
+        'recipient': f'patient{i}@example.com',
+        'data': {**BOOKING['data'], 'patient_name': f'Patient {i}'},
+    }
+
+
+def timed(handler, events):
+    """Invoke the handler once per event; returns the time of each invocation."""
+    bodies = [{'body': json.dumps(event)} for event in events]
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for body in bodies:
+            started = time.perf_counter()
+            response = handler.send_email(body, None)
+            samples.append(time.perf_counter() - started)
+            assert response['statusCode'] == 200, response
+    return samples
+
+
+def report(label, samples, per=1):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) > 1 else samples[0]
+    print(
+        f"{label:<36} median {statistics.median(samples) / per * 1000:8.3f} ms"
+        f"   p95 {p95 / per * 1000:8.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--handler', default=os.path.join(HERE, 'handler.py'))
+    parser.add_argument('--runs', type=int, default=10, help='Cold starts to measure')
+    parser.add_argument('--invocations', type=int, default=500, help='Warm invocations to measure')
+    parser.add_argument('--batch-size', type=int, default=25)
+    args = parser.parse_args()
+
+    os.environ.update(environment())
+    print(f"Handler: {args.handler}")
+
+    imports, firsts = cold_start(args.handler, args.runs)
+    report('cold start: import', imports)
+    report('cold start: first invocation', firsts)
+
+    handler = load_handler(args.handler)
+    report('warm: single message', timed(handler, [booking(i) for i in range(args.invocations)]))
+
+    if not hasattr(handler, 'send_batch'):
+        return
+    batches = max(1, args.invocations // args.batch_size)
+    size = args.batch_size
+    identical = [{'action': 'BATCH', 'items': [BOOKING] * size} for _ in range(batches)]
+    distinct = [
+        {'action': 'BATCH', 'items': [booking(b * size + i) for i in range(size)]}
+        for b in range(batches)
+    ]
+    report('warm: batch, identical (per message)', timed(handler, identical), size)
+    report('warm: batch, distinct (per message)', timed(handler, distinct), size)
+
+
+if __name__ == '__main__':
+    main()
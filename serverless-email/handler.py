@@ -5,6 +5,18 @@ Handles sending transactional emails via SMTP.
 Actions:
     - SIGNUP_WELCOME: Welcome email for new users
     - BOOKING_CONFIRMATION: Booking confirmation for patients
+    - APPOINTMENT_REMINDER: A patient's appointments in the next day
+    - DOCTOR_DAILY_DIGEST: A doctor's schedule for the next day
+    - BATCH: Several of the above in one request, sent over one SMTP connection
+
+The authenticated SMTP connection is kept in a module global, so warm
+invocations of the same Lambda container reuse it (checked with NOOP
+before use) instead of connecting, running STARTTLS and logging in again.
+
+Cold start is kept short: templates are compiled once at import and only
+the requested one is rendered, and the environment (including .env, for
+local development only) is read once, on first use. `python benchmark.py`
+measures cold start and per-invocation time.
 """
 
 import json
@@ -13,54 +25,199 @@ import os
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from dotenv import load_dotenv
+from functools import lru_cache
+from string import Template
+import time
 
-# Load environment variables from .env file (for local development)
-load_dotenv()
+BATCH_ACTION = 'BATCH'
 
+# Reused across warm invocations; see get_smtp_connection()
+_smtp = None
+_smtp_last_used = 0.0
+_smtp_stats = {'connects': 0, 'reuses': 0}
 
-def get_email_template(action, data):
+# A connection used this recently is not re-checked with NOOP
+SMTP_IDLE_CHECK_SECONDS = 5
+
+# API Gateway answers 503 after about 29 seconds, whatever the Lambda timeout
+API_GATEWAY_TIMEOUT_MS = 29000
+
+
+class EmailTemplate:
     """
-    Get email subject and body based on action type.
+    An email compiled once at module load.
+
+    subject/body_text/body_html are string.Template sources; `context`
+    turns the request data into the values they substitute, including the
+    optional lines and blocks that depend on the data.
+    """
+
+    def __init__(self, subject, body_text, body_html, context):
+        self.subject = Template(subject)
+        self.body_text = Template(body_text.strip())
+        self.body_html = Template(body_html)
+        self.context = context
+
+    def render(self, data):
+        values = self.context(data)
+        values['year'] = datetime.now().year
+        return {
+            'subject': self.subject.substitute(values),
+            'body_text': self.body_text.substitute(values),
+            'body_html': self.body_html.substitute(values),
+        }
+
+
+def _signup_welcome_context(data):
+    is_doctor = data.get('role') == 'DOCTOR'
+    return {
+        'name': data.get('name', 'there'),
+        'role': data.get('role', 'user'),
+        'intro': 'As a Doctor, you can:' if is_doctor else 'As a Patient, you can:',
+        'item_1': '- Create and manage your availability slots' if is_doctor else '- Browse doctors and their specializations',
+        'item_2': '- View your upcoming appointments' if is_doctor else '- Book appointments with available doctors',
+        'heading': 'What you can do as a Doctor:' if is_doctor else 'What you can do as a Patient:',
+        'feature_1': '📅 Create and manage your availability slots' if is_doctor else '🔍 Browse doctors and their specializations',
+        'feature_2': '👥 View your upcoming appointments with patients' if is_doctor else '📋 Book appointments with available doctors',
+    }
+
+
+_BOOKING_NOTES_HTML = Template('''
+            <div class="detail">
+                <span class="detail-icon">📝</span>
+                <div class="detail-text">
+                    <div class="detail-label">Your Notes</div>
+                    <div class="detail-value">${notes}</div>
+                </div>
+            </div>
+            ''')
+
+
+def _booking_confirmation_context(data):
+    specialization = data.get('specialization')
+    notes = data.get('notes')
+    return {
+        'patient_name': data.get('patient_name', 'there'),
+        'doctor': data.get('doctor', 'Doctor'),
+        'doctor_or_na': data.get('doctor', 'N/A'),
+        'date': data.get('date', 'N/A'),
+        'time': data.get('time', 'N/A'),
+        'specialization_line': '🏷️ Specialization: ' + specialization if specialization else '',
+        'notes_line': '📝 Notes: ' + notes if notes else '',
+        'specialization_html': '<div style="color: #666; font-size: 14px;">' + data.get('specialization', '') + '</div>' if specialization else '',
+        'notes_html': _BOOKING_NOTES_HTML.substitute(notes=notes) if notes else '',
+    }
+
+
+_REMINDER_ROW_TEXT = Template('📅 ${date} at ${time} with Dr. ${doctor}${specialization}')
+
+_REMINDER_ROW_HTML = Template('''
+            <div class="detail">
+                <span class="detail-icon">📅</span>
+                <div class="detail-text">
+                    <div class="detail-label">${date} at ${time}</div>
+                    <div class="detail-value">Dr. ${doctor}</div>
+                    ${specialization}
+                </div>
+            </div>
+''')
+
+
+def _appointment_reminder_context(data):
+    appointments = data.get('appointments') or []
+    if len(appointments) == 1:
+        first = appointments[0]
+        summary = f"Reminder: appointment with Dr. {first.get('doctor', 'Doctor')} on {first.get('date', 'N/A')}"
+    else:
+        summary = f"Reminder: you have {len(appointments)} upcoming appointments"
     
-    Args:
-        action: Email action type
-        data: Template data
+    rows_text, rows_html = [], []
+    for appointment in appointments:
+        values = {
+            'date': appointment.get('date', 'N/A'),
+            'time': appointment.get('time', 'N/A'),
+            'doctor': appointment.get('doctor', 'N/A'),
+        }
+        specialization = appointment.get('specialization')
+        rows_text.append(_REMINDER_ROW_TEXT.substitute(
+            values, specialization=f' ({specialization})' if specialization else ''
+        ))
+        rows_html.append(_REMINDER_ROW_HTML.substitute(
+            values,
+            specialization='<div style="color: #666; font-size: 14px;">' + specialization + '</div>' if specialization else ''
+        ))
     
-    Returns:
-        dict: {subject, body_text, body_html}
-    """
-    templates = {
-        'SIGNUP_WELCOME': {
-            'subject': 'Welcome to Hospital Management System! 🏥',
-            'body_text': f"""
-Hello {data.get('name', 'there')}!
+    return {
+        'summary': summary,
+        'patient_name': data.get('patient_name', 'there'),
+        'appointments_text': '\n'.join(rows_text),
+        'appointments_html': ''.join(rows_html),
+    }
+
+
+_DIGEST_ROW_TEXT = Template('⏰ ${time}  ${patient_name}${notes}')
+
+_DIGEST_ROW_HTML = Template('''
+                <tr>
+                    <td style="padding: 8px; border-bottom: 1px solid #eee; white-space: nowrap;"><strong>${time}</strong></td>
+                    <td style="padding: 8px; border-bottom: 1px solid #eee;">${patient_name}${notes}</td>
+                </tr>''')
+
+
+def _doctor_daily_digest_context(data):
+    appointments = data.get('appointments') or []
+    rows_text, rows_html = [], []
+    for appointment in appointments:
+        values = {
+            'time': str(appointment.get('time', 'N/A'))[:5],
+            'patient_name': appointment.get('patient_name', 'N/A'),
+        }
+        notes = appointment.get('notes')
+        rows_text.append(_DIGEST_ROW_TEXT.substitute(values, notes=f' - {notes}' if notes else ''))
+        rows_html.append(_DIGEST_ROW_HTML.substitute(
+            values, notes=f'<div style="color: #666; font-size: 14px;">{notes}</div>' if notes else ''
+        ))
+    
+    return {
+        'doctor_name': data.get('doctor_name', 'Doctor'),
+        'date': data.get('date', 'N/A'),
+        'count': len(appointments),
+        'appointments_text': '\n'.join(rows_text) or 'No appointments.',
+        'appointments_html': ''.join(rows_html),
+    }
+
+
+TEMPLATES = {
+    'SIGNUP_WELCOME': EmailTemplate(
+        subject='Welcome to Hospital Management System! 🏥',
+        body_text="""
+Hello ${name}!
 
 Welcome to the Hospital Management System (HMS). Your account has been created successfully.
 
-You've registered as a {data.get('role', 'user')}.
+You've registered as a ${role}.
 
-{'As a Doctor, you can:' if data.get('role') == 'DOCTOR' else 'As a Patient, you can:'}
-{'- Create and manage your availability slots' if data.get('role') == 'DOCTOR' else '- Browse doctors and their specializations'}
-{'- View your upcoming appointments' if data.get('role') == 'DOCTOR' else '- Book appointments with available doctors'}
+${intro}
+${item_1}
+${item_2}
 - Connect your Google Calendar for automatic event sync
 
 Get started now by logging into your dashboard!
 
 Best regards,
 The HMS Team
-            """.strip(),
-            'body_html': f"""
+""",
+        body_html="""
 <!DOCTYPE html>
 <html>
 <head>
     <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-        .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-        .feature {{ margin: 15px 0; padding: 10px; background: white; border-left: 4px solid #667eea; }}
-        .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }
+        .feature { margin: 15px 0; padding: 10px; background: white; border-left: 4px solid #667eea; }
+        .footer { text-align: center; margin-top: 20px; color: #666; font-size: 12px; }
     </style>
 </head>
 <body>
@@ -69,16 +226,16 @@ The HMS Team
             <h1>🏥 Welcome to HMS!</h1>
         </div>
         <div class="content">
-            <p>Hello <strong>{data.get('name', 'there')}</strong>!</p>
-            <p>Your account has been created successfully as a <strong>{data.get('role', 'user')}</strong>.</p>
+            <p>Hello <strong>${name}</strong>!</p>
+            <p>Your account has been created successfully as a <strong>${role}</strong>.</p>
             
-            <h3>{'What you can do as a Doctor:' if data.get('role') == 'DOCTOR' else 'What you can do as a Patient:'}</h3>
+            <h3>${heading}</h3>
             
             <div class="feature">
-                {'📅 Create and manage your availability slots' if data.get('role') == 'DOCTOR' else '🔍 Browse doctors and their specializations'}
+                ${feature_1}
             </div>
             <div class="feature">
-                {'👥 View your upcoming appointments with patients' if data.get('role') == 'DOCTOR' else '📋 Book appointments with available doctors'}
+                ${feature_2}
             </div>
             <div class="feature">
                 🔗 Connect your Google Calendar for automatic event sync
@@ -91,26 +248,27 @@ The HMS Team
             </p>
         </div>
         <div class="footer">
-            <p>© {datetime.now().year} Hospital Management System</p>
+            <p>© ${year} Hospital Management System</p>
         </div>
     </div>
 </body>
 </html>
-            """
-        },
-        
-        'BOOKING_CONFIRMATION': {
-            'subject': f"Appointment Confirmed with Dr. {data.get('doctor', 'Doctor')} ✅",
-            'body_text': f"""
-Hello {data.get('patient_name', 'there')}!
+            """,
+        context=_signup_welcome_context,
+    ),
+
+    'BOOKING_CONFIRMATION': EmailTemplate(
+        subject='Appointment Confirmed with Dr. ${doctor} ✅',
+        body_text="""
+Hello ${patient_name}!
 
 Your appointment has been confirmed!
 
-📅 Date: {data.get('date', 'N/A')}
-⏰ Time: {data.get('time', 'N/A')}
-👨‍⚕️ Doctor: Dr. {data.get('doctor', 'N/A')}
-{'🏷️ Specialization: ' + data.get('specialization') if data.get('specialization') else ''}
-{'📝 Notes: ' + data.get('notes') if data.get('notes') else ''}
+📅 Date: ${date}
+⏰ Time: ${time}
+👨‍⚕️ Doctor: Dr. ${doctor_or_na}
+${specialization_line}
+${notes_line}
 
 Please arrive 10 minutes before your scheduled time.
 
@@ -118,22 +276,22 @@ If you need to cancel or reschedule, please contact us at least 24 hours in adva
 
 Best regards,
 The HMS Team
-            """.strip(),
-            'body_html': f"""
+""",
+        body_html="""
 <!DOCTYPE html>
 <html>
 <head>
     <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-        .content {{ background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }}
-        .detail {{ display: flex; margin: 15px 0; padding: 15px; background: white; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }}
-        .detail-icon {{ font-size: 24px; margin-right: 15px; }}
-        .detail-text {{ flex: 1; }}
-        .detail-label {{ color: #666; font-size: 12px; text-transform: uppercase; }}
-        .detail-value {{ font-size: 16px; font-weight: bold; }}
-        .footer {{ text-align: center; margin-top: 20px; color: #666; font-size: 12px; }}
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #11998e 0%, #38ef7d 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }
+        .detail { display: flex; margin: 15px 0; padding: 15px; background: white; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+        .detail-icon { font-size: 24px; margin-right: 15px; }
+        .detail-text { flex: 1; }
+        .detail-label { color: #666; font-size: 12px; text-transform: uppercase; }
+        .detail-value { font-size: 16px; font-weight: bold; }
+        .footer { text-align: center; margin-top: 20px; color: #666; font-size: 12px; }
     </style>
 </head>
 <body>
@@ -142,14 +300,14 @@ The HMS Team
             <h1>✅ Appointment Confirmed!</h1>
         </div>
         <div class="content">
-            <p>Hello <strong>{data.get('patient_name', 'there')}</strong>!</p>
+            <p>Hello <strong>${patient_name}</strong>!</p>
             <p>Your appointment has been successfully booked.</p>
             
             <div class="detail">
                 <span class="detail-icon">📅</span>
                 <div class="detail-text">
                     <div class="detail-label">Date</div>
-                    <div class="detail-value">{data.get('date', 'N/A')}</div>
+                    <div class="detail-value">${date}</div>
                 </div>
             </div>
             
@@ -157,7 +315,7 @@ The HMS Team
                 <span class="detail-icon">⏰</span>
                 <div class="detail-text">
                     <div class="detail-label">Time</div>
-                    <div class="detail-value">{data.get('time', 'N/A')}</div>
+                    <div class="detail-value">${time}</div>
                 </div>
             </div>
             
@@ -165,79 +323,241 @@ The HMS Team
                 <span class="detail-icon">👨‍⚕️</span>
                 <div class="detail-text">
                     <div class="detail-label">Doctor</div>
-                    <div class="detail-value">Dr. {data.get('doctor', 'N/A')}</div>
-                    {'<div style="color: #666; font-size: 14px;">' + data.get('specialization', '') + '</div>' if data.get('specialization') else ''}
+                    <div class="detail-value">Dr. ${doctor_or_na}</div>
+                    ${specialization_html}
                 </div>
             </div>
             
-            {f'''
-            <div class="detail">
-                <span class="detail-icon">📝</span>
-                <div class="detail-text">
-                    <div class="detail-label">Your Notes</div>
-                    <div class="detail-value">{data.get('notes')}</div>
-                </div>
-            </div>
-            ''' if data.get('notes') else ''}
+            ${notes_html}
             
             <p style="margin-top: 20px; padding: 15px; background: #fff3cd; border-radius: 8px; border-left: 4px solid #ffc107;">
                 ⚠️ Please arrive <strong>10 minutes</strong> before your scheduled time.
             </p>
         </div>
         <div class="footer">
-            <p>© {datetime.now().year} Hospital Management System</p>
+            <p>© ${year} Hospital Management System</p>
         </div>
     </div>
 </body>
 </html>
-            """
-        }
-    }
-    
-    return templates.get(action, {
-        'subject': 'HMS Notification',
-        'body_text': 'You have a new notification from HMS.',
-        'body_html': '<p>You have a new notification from HMS.</p>'
-    })
+            """,
+        context=_booking_confirmation_context,
+    ),
 
+    'APPOINTMENT_REMINDER': EmailTemplate(
+        subject='${summary} ⏰',
+        body_text="""
+Hello ${patient_name}!
 
-def send_smtp_email(recipient, subject, body_text, body_html=None):
+This is a reminder of your upcoming appointment(s):
+
+${appointments_text}
+
+Please arrive 10 minutes before your scheduled time.
+
+If you need to cancel or reschedule, please contact us as soon as possible.
+
+Best regards,
+The HMS Team
+""",
+        body_html="""
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #f7971e 0%, #ffd200 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }
+        .detail { display: flex; margin: 15px 0; padding: 15px; background: white; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+        .detail-icon { font-size: 24px; margin-right: 15px; }
+        .detail-text { flex: 1; }
+        .detail-label { color: #666; font-size: 12px; text-transform: uppercase; }
+        .detail-value { font-size: 16px; font-weight: bold; }
+        .footer { text-align: center; margin-top: 20px; color: #666; font-size: 12px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>⏰ Appointment Reminder</h1>
+        </div>
+        <div class="content">
+            <p>Hello <strong>${patient_name}</strong>!</p>
+            <p>This is a reminder of your upcoming appointment(s):</p>
+            ${appointments_html}
+            <p style="margin-top: 20px; padding: 15px; background: #fff3cd; border-radius: 8px; border-left: 4px solid #ffc107;">
+                ⚠️ Please arrive <strong>10 minutes</strong> before your scheduled time.
+            </p>
+        </div>
+        <div class="footer">
+            <p>© ${year} Hospital Management System</p>
+        </div>
+    </div>
+</body>
+</html>
+            """,
+        context=_appointment_reminder_context,
+    ),
+
+    'DOCTOR_DAILY_DIGEST': EmailTemplate(
+        subject='Your schedule for ${date}: ${count} appointment(s) 📋',
+        body_text="""
+Hello Dr. ${doctor_name}!
+
+Here is your schedule for ${date} (${count} appointment(s)):
+
+${appointments_text}
+
+The same schedule is on your dashboard.
+
+Best regards,
+The HMS Team
+""",
+        body_html="""
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 30px; border-radius: 0 0 10px 10px; }
+        .schedule { width: 100%; border-collapse: collapse; background: white; border-radius: 8px; }
+        .footer { text-align: center; margin-top: 20px; color: #666; font-size: 12px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>📋 Schedule for ${date}</h1>
+        </div>
+        <div class="content">
+            <p>Hello <strong>Dr. ${doctor_name}</strong>!</p>
+            <p>You have <strong>${count}</strong> appointment(s):</p>
+            <table class="schedule">${appointments_html}
+            </table>
+        </div>
+        <div class="footer">
+            <p>© ${year} Hospital Management System</p>
+        </div>
+    </div>
+</body>
+</html>
+            """,
+        context=_doctor_daily_digest_context,
+    ),
+}
+
+DEFAULT_TEMPLATE = {
+    'subject': 'HMS Notification',
+    'body_text': 'You have a new notification from HMS.',
+    'body_html': '<p>You have a new notification from HMS.</p>'
+}
+
+
+@lru_cache(maxsize=1024)
+def _render(action, data_key, year):
+    # year is part of the key only so a warm container rolls over on 1 January
+    return TEMPLATES[action].render(json.loads(data_key))
+
+
+def get_email_template(action, data):
     """
-    Send an email via SMTP.
-    
+    Get email subject and body based on action type.
+
+    Only the requested action's template is rendered. Results are memoised
+    per (action, data), so identical messages in a bulk send are rendered
+    once.
+
     Args:
-        recipient: Email address to send to
-        subject: Email subject
-        body_text: Plain text body
-        body_html: HTML body (optional)
-    
+        action: Email action type
+        data: Template data
+
     Returns:
-        bool: True if sent successfully
+        dict: {subject, body_text, body_html}
     """
-    smtp_host = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
-    smtp_port = int(os.environ.get('SMTP_PORT', 587))
-    smtp_user = os.environ.get('SMTP_USER', '')
-    smtp_pass = os.environ.get('SMTP_PASS', '')
-    from_email = os.environ.get('FROM_EMAIL', smtp_user)
+    if action not in TEMPLATES:
+        return dict(DEFAULT_TEMPLATE)
+    data_key = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return dict(_render(action, data_key, datetime.now().year))
+
+
+@lru_cache(maxsize=None)
+def smtp_config():
+    """SMTP settings, read from the environment once per container."""
+    # Load environment variables from .env file (for local development;
+    # deployed Lambdas get them from serverless.yml)
+    if os.environ.get('IS_OFFLINE') or not os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+        from dotenv import load_dotenv
+        load_dotenv()
     
-    if not smtp_user or not smtp_pass:
-        print("[EMAIL] CRITICAL: SMTP_USER or SMTP_PASS not configured!")
-        print(f"  SMTP_HOST: {smtp_host}")
-        print(f"  SMTP_PORT: {smtp_port}")
-        print(f"  FROM_EMAIL: {from_email}")
-        
-        # If we're in offline mode or local test, don't fail but return False
-        if os.environ.get('IS_OFFLINE') or os.environ.get('PYTHON_TEST'):
-            print(f"  [OFFLINE] Would send to {recipient} with subject: {subject}")
-            return True
-            
-        return False
+    smtp_user = os.environ.get('SMTP_USER', '')
+    return {
+        'host': os.environ.get('SMTP_HOST', 'smtp.gmail.com'),
+        'port': int(os.environ.get('SMTP_PORT', 587)),
+        'user': smtp_user,
+        'password': os.environ.get('SMTP_PASS', ''),
+        'from_email': os.environ.get('FROM_EMAIL', smtp_user),
+        'timeout': int(os.environ.get('SMTP_TIMEOUT', 10)),
+        'max_batch_size': int(os.environ.get('EMAIL_MAX_BATCH_SIZE', 25)),
+        'offline': bool(os.environ.get('IS_OFFLINE') or os.environ.get('PYTHON_TEST')),
+    }
+
+
+def close_smtp_connection():
+    """Drop the cached SMTP connection."""
+    global _smtp
+    if _smtp is not None:
+        try:
+            _smtp.quit()
+        except Exception:
+            pass
+        _smtp = None
+
+
+def get_smtp_connection(config):
+    """
+    Return an authenticated SMTP connection, reusing the cached one if the
+    server still answers NOOP. Within a batch the connection is busy, so the
+    check is only made after SMTP_IDLE_CHECK_SECONDS of idleness.
+    """
+    global _smtp
+    if _smtp is not None and time.monotonic() - _smtp_last_used < SMTP_IDLE_CHECK_SECONDS:
+        _smtp_stats['reuses'] += 1
+        return _smtp
+    if _smtp is not None:
+        try:
+            if _smtp.noop()[0] == 250:
+                _smtp_stats['reuses'] += 1
+                return _smtp
+        except (smtplib.SMTPException, OSError):
+            pass
+        close_smtp_connection()
     
-    # Create message
+    server = smtplib.SMTP(config['host'], config['port'], timeout=config['timeout'])
+    try:
+        server.starttls()
+        server.login(config['user'], config['password'])
+    except Exception:
+        server.close()
+        raise
+    _smtp = server
+    _smtp_stats['connects'] += 1
+    print(f"[EMAIL] Connected to {config['host']}:{config['port']}")
+    return _smtp
+
+
+@lru_cache(maxsize=256)
+def encode_message(from_email, subject, body_text, body_html=None):
+    """
+    The MIME-encoded message without its To header. Encoding (header
+    folding, base64 bodies) is most of the per-message cost, so identical
+    emails in a bulk send share one encoding.
+    """
     msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
     msg['From'] = f"HMS <{from_email}>"
-    msg['To'] = recipient
     
     # Attach plain text
     part1 = MIMEText(body_text, 'plain')
@@ -248,12 +568,74 @@ def send_smtp_email(recipient, subject, body_text, body_html=None):
         part2 = MIMEText(body_html, 'html')
         msg.attach(part2)
     
+    return msg.as_string()
+
+
+def build_message(from_email, recipient, subject, body_text, body_html=None):
+    """Build the message for one email, as a string ready for sendmail."""
+    if '\r' in recipient or '\n' in recipient:
+        raise ValueError(f'Invalid recipient {recipient!r}')
+    return f"To: {recipient}\n" + encode_message(from_email, subject, body_text, body_html)
+
+
+def deliver(config, recipient, msg):
+    """
+    Send one message over the cached connection. If the server dropped the
+    connection (idle timeout, per-connection message limit), reconnect once.
+    """
+    global _smtp_last_used
+    for attempt in range(2):
+        server = get_smtp_connection(config)
+        try:
+            server.sendmail(config['from_email'], recipient, msg)
+            _smtp_last_used = time.monotonic()
+            return
+        except smtplib.SMTPServerDisconnected:
+            close_smtp_connection()
+            if attempt:
+                raise
+
+
+def _credentials_missing(config, recipient, subject):
+    """
+    Log missing SMTP credentials. Returns True if sending should be
+    simulated (offline/local test), False if it should fail.
+    """
+    print("[EMAIL] CRITICAL: SMTP_USER or SMTP_PASS not configured!")
+    print(f"  SMTP_HOST: {config['host']}")
+    print(f"  SMTP_PORT: {config['port']}")
+    print(f"  FROM_EMAIL: {config['from_email']}")
+    
+    # If we're in offline mode or local test, don't fail but return False
+    if config['offline']:
+        print(f"  [OFFLINE] Would send to {recipient} with subject: {subject}")
+        return True
+    
+    return False
+
+
+def send_smtp_email(recipient, subject, body_text, body_html=None):
+    """
+    Send an email via SMTP.
+    
+    Args:
+        recipient: Email address to send to
+        subject: Email subject
+        body_text: Plain text body
+        body_html: HTML body (optional)
+    
+    Returns:
+        bool: True if sent successfully
+    """
+    config = smtp_config()
+    
+    if not config['user'] or not config['password']:
+        return _credentials_missing(config, recipient, subject)
+    
+    msg = build_message(config['from_email'], recipient, subject, body_text, body_html)
+    
     try:
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_pass)
-            server.sendmail(from_email, recipient, msg.as_string())
-        
+        deliver(config, recipient, msg)
         print(f"[EMAIL] Successfully sent to {recipient}")
         return True
         
@@ -262,6 +644,85 @@ def send_smtp_email(recipient, subject, body_text, body_html=None):
         raise
 
 
+def batch_deadline(context, config):
+    """
+    Monotonic time after which a batch starts no new delivery: the time left
+    before the Lambda or API Gateway times out, less one SMTP timeout for the
+    delivery in progress and a second to respond.
+    """
+    remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    budget_ms = API_GATEWAY_TIMEOUT_MS if remaining is None else min(remaining(), API_GATEWAY_TIMEOUT_MS)
+    return time.monotonic() + budget_ms / 1000 - config['timeout'] - 1
+
+
+def send_batch(items, deadline=None):
+    """
+    Send several emails over one SMTP connection.
+    
+    Args:
+        items: List of {action, recipient, data}
+        deadline: time.monotonic() value after which the remaining items are
+                  not attempted but reported as failed, so the caller retries them
+    
+    Returns:
+        list: One {index, action, recipient, success[, error]} per item
+    """
+    config = smtp_config()
+    started = time.monotonic()
+    connects = _smtp_stats['connects']
+    results = []
+    
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        action = item.get('action')
+        recipient = item.get('recipient')
+        result = {'index': index, 'action': action, 'recipient': recipient, 'success': False}
+        results.append(result)
+        
+        if deadline is not None and time.monotonic() >= deadline:
+            result['error'] = 'Not attempted: out of time'
+            continue
+        if not action or action == BATCH_ACTION:
+            result['error'] = 'Missing or invalid action'
+            continue
+        if not recipient:
+            result['error'] = 'Missing recipient'
+            continue
+        
+        try:
+            template = get_email_template(action, item.get('data') or {})
+            if not config['user'] or not config['password']:
+                result['success'] = _credentials_missing(config, recipient, template['subject'])
+                if not result['success']:
+                    result['error'] = 'SMTP not configured'
+                continue
+            
+            msg = build_message(
+                config['from_email'], recipient,
+                template['subject'], template['body_text'], template.get('body_html')
+            )
+            deliver(config, recipient, msg)
+            result['success'] = True
+            
+        except smtplib.SMTPRecipientsRefused as e:
+            result['error'] = f'Recipient refused: {e.recipients}'
+        except ValueError as e:
+            result['error'] = str(e)
+        except (smtplib.SMTPException, OSError) as e:
+            result['error'] = str(e)
+            if not isinstance(e, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+                # Connection-level failure: the next item reconnects
+                close_smtp_connection()
+    
+    sent = sum(1 for r in results if r['success'])
+    print(
+        f"[EMAIL] Batch: {sent}/{len(results)} sent, "
+        f"{_smtp_stats['connects'] - connects} new connection(s), "
+        f"{time.monotonic() - started:.2f}s"
+    )
+    return results
+
+
 def send_email(event, context):
     """
     AWS Lambda handler for sending emails.
@@ -272,6 +733,18 @@ def send_email(event, context):
         "recipient": "email@example.com",
         "data": { ... template data ... }
     }
+    
+    or, for a batch (at most EMAIL_MAX_BATCH_SIZE items):
+    {
+        "action": "BATCH",
+        "items": [{"action": ..., "recipient": ..., "data": {...}}, ...]
+    }
+    
+    A batch answers 200 with one result per item, in order:
+    {"success": <all sent>, "sent": n, "failed": n,
+     "results": [{"index", "action", "recipient", "success", "error"?}]}
+    Items left when the invocation runs short of time are not attempted and
+    come back failed, for the caller to retry.
     """
     print(f"[EMAIL] Received event")
     
@@ -297,6 +770,35 @@ def send_email(event, context):
         recipient = body.get('recipient')
         data = body.get('data', {})
         
+        if action == BATCH_ACTION:
+            items = body.get('items')
+            if not isinstance(items, list) or not items:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'error': 'Missing items parameter'})
+                }
+            max_batch_size = smtp_config()['max_batch_size']
+            if len(items) > max_batch_size:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'error': f'At most {max_batch_size} items per batch'})
+                }
+            
+            results = send_batch(items, batch_deadline(context, smtp_config()))
+            sent = sum(1 for r in results if r['success'])
+            return {
+                'statusCode': 200,
+                'headers': {'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({
+                    'success': sent == len(results),
+                    'sent': sent,
+                    'failed': len(results) - sent,
+                    'results': results
+                })
+            }
+        
         # Validate required fields
         if not action:
             return {